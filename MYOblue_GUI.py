@@ -25,16 +25,41 @@
 
 import sys
 import os
-from importlib import metadata
+import time
+import importlib.util
 import subprocess
 
-print(">>> MYOblue_GUI is launching. Please wait...")
+# Time spent per startup phase, reported with the --startup-profile flag
+class StartupProfile:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.t0 = time.perf_counter()
+        self.last = self.t0
+        self.phases = []
+    
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+        
+    def report(self):
+        if not self.enabled: return
+        print(">>> Startup profile:")
+        for phase, duration in self.phases:
+            print(f">>>   {phase:<30}{duration*1000:9.1f} ms")
+        print(f">>>   {'total':<30}{(self.last - self.t0)*1000:9.1f} ms")
 
-required = {'pyserial', 'pyqtgraph', 'PyQt5', 'numpy', 'scipy'}
+startupProfile = StartupProfile('--startup-profile' in sys.argv)
+if startupProfile.enabled: sys.argv.remove('--startup-profile')
 
-installed = {dist.metadata['Name'].lower() for dist in metadata.distributions()}
+# The spawned DSP process imports this file again as __mp_main__
+if __name__ == '__main__': print(">>> MYOblue_GUI is launching. Please wait...")
 
-missing = {pkg for pkg in required if pkg.lower() not in installed}
+# Distribution name -> top level module. find_spec only looks the module up on
+# sys.path, which is much cheaper than reading the metadata of every distribution.
+required = {'pyserial': 'serial', 'pyqtgraph': 'pyqtgraph', 'PyQt5': 'PyQt5', 'numpy': 'numpy', 'scipy': 'scipy'}
+
+missing = {pkg for pkg, module in required.items() if importlib.util.find_spec(module) is None}
 
 if missing:
     print(">>> Installing missing libraries:", missing)
@@ -52,6 +77,8 @@ if missing:
         else:
             print(f">>> \"{module}\" NOT installed successfully.")
             print(">>> Please check your internet connection or contact support: info@elemyo.com")
+    importlib.invalidate_caches()
+startupProfile.mark("dependency check")
 
 from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtCore import Qt, pyqtSignal
@@ -59,15 +86,22 @@ from PyQt5.QtCore import Qt, pyqtSignal
 import serial
 import pyqtgraph as pg
 import numpy as np
-import time
-from scipy.signal import butter, lfilter
 import serial.tools.list_ports
-from scipy.fftpack import fft
 from serial import SerialException
 from datetime import datetime
 import struct
+import threading
+import tempfile
+import shutil
 from configparser import ConfigParser
 from PyQt5.QtGui import QPen, QColor
+from myoblue_shm import SharedStream
+from myoblue_stream import StreamServer, LSLOutlet, EVENT_MARKER, EVENT_TRIGGER, EVENT_CLOCK, ALL_SENSORS
+from myoblue_dsp import DSPChain, DSPWorker, DSPFrame, DSPSettings, IncrementalSTFT, FeatureExtractor, FeatureHistory, FEATURES, FFT_POINTS, SIGNAL_DTYPE, TIME_DTYPE
+from myoblue_kernels import triggerEdges, findSync
+from myoblue_record import ColumnarRecorder, FORMATS, SYNC, recordingChannels
+import myoblue_kernels
+startupProfile.mark("import Qt, pyqtgraph, numpy")
 
 # Main window
 class GUI(QtWidgets.QMainWindow):
@@ -84,32 +118,128 @@ class GUI(QtWidgets.QMainWindow):
         self.setWindowIcon(QtGui.QIcon(os.path.join(self.BASE_DIR, 'img', 'icon.png')))
         self.delay = 0.120 # Graphics update delay
         self.pollDelay = 0.01 # Serial/file acquisition poll interval
-        self.NUM_SENSORS = 8 
-        self.cfg = ConfigParser()
-        self.cfg.optionxform = str
-        self.cfg.read(os.path.join(self.BASE_DIR, "config.ini"))
+        self.PLAYBACK_MAX_POLL = 0.25 # Longest file playback read per poll, s
+        self.MAX_STREAM_EVENTS = 1000 # Events kept for the next streamed frame
+        self.cfg = Settings(os.path.join(self.BASE_DIR, "config.ini"))
+        self.startupMessages = [] # Messages shown in the text window once it is created
+        self.SENSORS_PER_DONGLE = 8
+        self.dongles = self.cfg.getint("APPLICATION", "Dongles", fallback=1) # Count of simultaneously used receivers
+        if not 1 <= self.dongles <= 4: self.dongles = 1
+        self.NUM_SENSORS = self.SENSORS_PER_DONGLE * self.dongles # Sensor k of dongle d has number d*8 + k
         self.fs = self.cfg.getint("APPLICATION", "SampleRate_(HZ)")  # Sampling frequency in Hz
         if not (990 <= self.fs <= 1010): self.fs = 1000
         self.dt = [1/self.fs]*self.NUM_SENSORS  # Time between two signal measurements in s
         for i in range(self.NUM_SENSORS): 
-            self.dt[i] = self.cfg.getfloat(f"SENSOR{i+1}", "dt_(s)")
+            self.dt[i] = self.cfg.getfloat(f"SENSOR{i+1}", "dt_(s)", fallback=0.001)
             if not (0.00099 <= self.dt[i] <= 0.00101): self.dt[i] = 0.001
         
         self.v_time = [0.0] * self.NUM_SENSORS       
         self.pll_initialized = [False] * self.NUM_SENSORS 
         self.sensor_uptime = [0.0] * self.NUM_SENSORS
         
-        self.timeWidth = 10 # Plot window length in seconds
+        self.timeWidth = self.cfg.getfloat("APPLICATION", "PlotWindow_(s)", fallback=10) # Plot window length in seconds
+        if not 1 <= self.timeWidth <= 60: self.timeWidth = 10
+        history = self.cfg.getfloat("APPLICATION", "History_(s)", fallback=60) # Scrollable history length in seconds
+        history = max(history, self.timeWidth + 2)
+        budget = self.cfg.getfloat("APPLICATION", "MemoryBudget_(MB)", fallback=256)*2**20 # Memory budget for signal buffers in bytes
         self.dataWidth = int((self.timeWidth + 2)*self.fs) # Maximum count of plotting data points
-        self.data = Data(self.NUM_SENSORS, self.dataWidth)
+        self.historyWidth = int(history*self.fs) # Count of data points kept in history
+        
+        if Data.footprint(self.NUM_SENSORS, self.dataWidth, self.dataWidth) > budget:
+            self.timeWidth = 10
+            self.dataWidth = int((self.timeWidth + 2)*self.fs)
+            self.startupMessages.append(f"plot window does not fit into the {budget/2**20:.0f} MB memory budget, {self.timeWidth} s window is used")
+        if Data.footprint(self.NUM_SENSORS, self.dataWidth, self.historyWidth) > budget:
+            perSample = Data.footprint(self.NUM_SENSORS, 0, 1)
+            free = budget - Data.footprint(self.NUM_SENSORS, self.dataWidth, 0)
+            self.historyWidth = max(self.dataWidth, int(free // perSample))
+            self.startupMessages.append(f"history reduced to {self.historyWidth/self.fs:.0f} s to fit into the {budget/2**20:.0f} MB memory budget")
+        footprint = Data.footprint(self.NUM_SENSORS, self.dataWidth, self.historyWidth)
+        
+        # Decimated history for zooming out beyond the history buffer
+        self.pyramid = None
+        self.historyPoints = 4000 # Maximum count of points per curve drawn from history
+        if self.cfg.getboolean("APPLICATION", "HistoryPyramid", fallback=True):
+            capacity = self.cfg.getint("APPLICATION", "PyramidCapacity", fallback=36000)
+            if footprint + HistoryPyramid.footprint(self.NUM_SENSORS, capacity) > budget:
+                self.startupMessages.append(f"history pyramid does not fit into the {budget/2**20:.0f} MB memory budget and is disabled")
+            else:
+                spillDir = None
+                if self.cfg.getboolean("APPLICATION", "PyramidSpill", fallback=False):
+                    spillDir = tempfile.mkdtemp(prefix="myoblue_pyramid_")
+                self.pyramid = HistoryPyramid(self.NUM_SENSORS, capacity, spillDir=spillDir)
+                footprint += HistoryPyramid.footprint(self.NUM_SENSORS, capacity)
+                
+        self.startupMessages.append(f"plot window {self.timeWidth:g} s, history {self.historyWidth/self.fs:.0f} s, "
+                                    f"buffers {footprint/2**20:.1f} MB")
+        self.data = Data(self.NUM_SENSORS, self.dataWidth, self.historyWidth)
+        
+        # Decoded samples published to other local processes
+        self.sharedStream = None
+        if self.cfg.getboolean("APPLICATION", "SharedMemory", fallback=False):
+            name = self.cfg.get("APPLICATION", "SharedMemoryName", fallback="myoblue")
+            capacity = int(self.cfg.getfloat("APPLICATION", "SharedMemory_(s)", fallback=10)*self.fs)
+            try:
+                self.sharedStream = SharedStream(name, self.NUM_SENSORS, capacity, self.fs)
+                self.startupMessages.append(f"decoded stream is shared as \"{self.sharedStream.name}\"")
+            except OSError as e:
+                self.startupMessages.append(f"shared memory stream was not created: {e}")
+        
+        # Processed signals streamed to local clients
+        self.streamServer = None
+        self.lslOutlet = None
+        self.streamEvents = [] # Events of the current frame
+        if self.cfg.getboolean("APPLICATION", "StreamServer", fallback=False):
+            port = self.cfg.getint("APPLICATION", "StreamPort", fallback=5757)
+            try:
+                self.streamServer = StreamServer("127.0.0.1", port)
+                self.startupMessages.append(f"streaming to 127.0.0.1:{port}")
+            except OSError as e:
+                self.startupMessages.append(f"stream server was not started: {e}")
+        if self.cfg.getboolean("APPLICATION", "StreamLSL", fallback=False):
+            try:
+                self.lslOutlet = LSLOutlet(self.NUM_SENSORS, self.fs)
+                self.startupMessages.append("streaming to Lab Streaming Layer")
+            except ImportError:
+                self.startupMessages.append("Lab Streaming Layer outlet needs the pylsl library")
         self.l = [0]*self.NUM_SENSORS # Current sensor data point
-        self.FFT = np.zeros((self.NUM_SENSORS, 500), dtype=np.float32) # Fast Fourier transform data
-        
-        self.MovingAverage = MovingAverage(self.fs) 
-        self.bandstop_filter_50Hz = bandstop_filter_50Hz(self.fs)
-        self.bandstop_filter_60Hz = bandstop_filter_60Hz(self.fs)
-        self.bandpass_filter = bandpass_filter(1, self.fs/2-1, self.fs)
-        self.HP_filter = HP_filter(1, self.fs)
+        self.FFT = np.zeros((self.NUM_SENSORS, FFT_POINTS), dtype=SIGNAL_DTYPE) # Fast Fourier transform data
+        self.fftAxisUnit = np.linspace(0, 1, FFT_POINTS) # FFT frequencies of a 1 Hz sample rate
+        self.fftAxis = np.empty(FFT_POINTS)
+        self.frameBuffers = [(np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=SIGNAL_DTYPE), np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=TIME_DTYPE)) for k in range(2)]
+        self.frameSlot = 0
+        self.recordBuffers = (np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=SIGNAL_DTYPE), # Filtered, raw and time of the recorded rows
+                              np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=SIGNAL_DTYPE),
+                              np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=TIME_DTYPE))
+        spectrogramSeconds = self.cfg.getfloat("APPLICATION", "Spectrogram_(s)", fallback=20)
+        if not 1 <= spectrogramSeconds <= 600: spectrogramSeconds = 20
+        self.spectrogram = IncrementalSTFT(self.fs, spectrogramSeconds) # Spectrogram of the selected sensor
+        self.spectrogramSensor = 0
+        featureWindow = self.cfg.getfloat("APPLICATION", "FeatureWindow_(s)", fallback=1)
+        if not 0.1 <= featureWindow <= 10: featureWindow = 1
+        self.featureStep = self.cfg.getfloat("APPLICATION", "FeatureStep_(s)", fallback=0.5) # Period of the EMG features
+        if not 0.05 <= self.featureStep <= 10: self.featureStep = 0.5
+        self.features = FeatureExtractor(self.fs, featureWindow) # MNF, MDF, ZCR, WL and MAV of all sensors
+        self.featureHistory = FeatureHistory(600 / self.featureStep, self.NUM_SENSORS) # Last 10 minutes
+        self.featureDue = 0 # Time of the next features row
+        
+        self.dsp = DSPChain(self.fs, self.NUM_SENSORS) # Filters, envelope and RMS
+        useNumba = self.cfg.getboolean("APPLICATION", "Numba", fallback=True)
+        try:
+            if myoblue_kernels.useNumba(useNumba) == 'numba':
+                self.startupMessages.append("signal kernels are compiled with Numba")
+        except Exception as e:
+            useNumba = False
+            self.startupMessages.append(f"Numba kernels are not used: {e}")
+        
+        # Signal processing in a separate process
+        self.dspWorker = None
+        if self.cfg.getboolean("APPLICATION", "DSPProcess", fallback=False):
+            try:
+                self.dspWorker = DSPWorker(self.NUM_SENSORS, self.dataWidth, self.fs, useNumba)
+                self.startupMessages.append("signal processing runs in a separate process")
+            except OSError as e:
+                self.startupMessages.append(f"DSP process was not started: {e}")
         
         self.recordingFileName_BIN = '' # Recording file name
         self.recordingFileName_TXT = '' # Recording file name
@@ -118,18 +248,35 @@ class GUI(QtWidgets.QMainWindow):
         self.loadFileName = '' # Data load file name
         self.loadFile = 0 # Data load variable
         self.sliderpos = 0 # Position of data slider 
+        self.playbackClock = None # Time up to which the file was played back
         self.loadDataLen = 0 # Number of signal samples in data file
-        self.loadData = 0 # Data from load file
-        self.markers_list = []
+        self.loadChannels = 8 # Number of sensors in data file
+        self.loadData = np.zeros((0, 8), dtype=np.uint16) # Records of the playback file, memory mapped
+        self.markers = MarkerStore() # Exercise markers
+        self.markerView = None # Range and count of markers currently drawn
+        self.recordingFile_EVENTS = None # Marker event table of the recording
+        self.recordingFile_FEATURES = None # EMG features table of the recording
+        self.columnarFormat = self.cfg.get("APPLICATION", "ColumnarRecording", fallback="none").strip().lower() # Compressed columnar copy of the recording
+        if self.columnarFormat not in FORMATS: self.columnarFormat = None
+        chunkSeconds = self.cfg.getfloat("APPLICATION", "ColumnarChunk_(s)", fallback=10)
+        if not 1 <= chunkSeconds <= 600: chunkSeconds = 10
+        self.columnarChunkRows = int(chunkSeconds * self.fs)
+        self.journalSync = self.cfg.get("APPLICATION", "RecordingJournal", fallback="off").strip().lower() # Crash safe .myob journal, sync policy
+        if self.journalSync not in SYNC: self.journalSync = None
+        self.journalSyncInterval = self.cfg.getfloat("APPLICATION", "RecordingJournalSync_(s)", fallback=5)
+        if not 0.1 <= self.journalSyncInterval <= 600: self.journalSyncInterval = 5
+        self.recorders = [] # Columnar and journal recorders of the current recording
+        self.recordedSamples = 0 # Count of samples written to the recording
         
         # Accessory variables for data read from serial
         self.TIMER = 0;
         self.TIMER_temp = 0;
         self.ms_len = [0]*self.NUM_SENSORS;
-        self.msg_end = bytearray([0])
+        self.msg_end = [bytearray([0])]*self.dongles
         
         self.VDD = [0]*self.NUM_SENSORS # Battery charge array (in voltes)
         self.MSG_NUM_0 = [0]*self.NUM_SENSORS
+        self.timeCorrection = [0.0]*self.NUM_SENSORS # PLL time correction of the next burst, s
         
         # Accessory variables for EMG mask
         self.FlagEMG = [0]*self.NUM_SENSORS
@@ -145,8 +292,13 @@ class GUI(QtWidgets.QMainWindow):
         self.liveFromSerialAction.setChecked(False)
         self.liveFromSerialAction.triggered.connect(self.liveFromSerial)
         
-        self.COMports=QtWidgets.QComboBox()
-        self.COMports.setDisabled(False)
+        self.COMports = [] # Port selection, one box per dongle
+        for d in range(self.dongles):
+            self.COMports.append(QtWidgets.QComboBox())
+            self.COMports[d].setDisabled(False)
+            if self.dongles > 1: self.COMports[d].setToolTip(f"Dongle {d+1}: sensors {d*self.SENSORS_PER_DONGLE+1}-{(d+1)*self.SENSORS_PER_DONGLE}")
+            # Extra dongles stay without a port until one is selected
+            if d > 0: self.COMports[d].addItem('')
         
         self.refreshAction = QtWidgets.QAction(QtGui.QIcon(os.path.join(self.BASE_DIR, 'img', 'refresh.png')), 'Refresh screen (R)', self)
         self.refreshAction.setShortcut('r')
@@ -189,10 +341,13 @@ class GUI(QtWidgets.QMainWindow):
         self.passHighFreq.setValue(hf_value)
         self.passHighFreq.setDisabled(not self.cfg.getboolean("APPLICATION", "BandPassFilter"))  
         
+        # Playback position in samples
         self.slider = QtWidgets.QScrollBar(QtCore.Qt.Orientation.Horizontal)
         self.slider.setValue(0)
         self.slider.setFixedWidth(40)
         self.slider.setDisabled(True)
+        self.slider.valueChanged.connect(self.seek)
+        self.playbackTime = QtWidgets.QLabel('', self)
 
         self.sensorsNumberAction = QtWidgets.QLabel(' SENSORS NUMBER: ', self)
         self.sensorsNumberAction1 = QtWidgets.QLabel('     ', self)
@@ -201,7 +356,7 @@ class GUI(QtWidgets.QMainWindow):
         self.sensorsNumber.setDecimals(0)
         self.sensorsNumber.setDisabled(True)
         sensors_val = self.cfg.getint("APPLICATION", "SensorsNumber")
-        if not 1 <= sensors_val <=8: sensors_val = 8
+        if not 1 <= sensors_val <= self.NUM_SENSORS: sensors_val = self.NUM_SENSORS
         self.sensorsNumber.setValue(sensors_val) 
         
         self.rawSignalAction = QtWidgets.QCheckBox('RAW EMG', self)
@@ -218,13 +373,24 @@ class GUI(QtWidgets.QMainWindow):
         self.EnvelopeSignalAction.setChecked(self.cfg.getboolean("APPLICATION", "Envelope"))
         self.EnvelopeSignalAction1 = QtWidgets.QLabel('    ', self)
         self.EnvelopeSignalAction2 = QtWidgets.QLabel('      ', self)
-        self.envelopeSmoothingCoefficient = QtWidgets.QDoubleSpinBox()
-        self.envelopeSmoothingCoefficient.setSingleStep(0.01)
-        self.envelopeSmoothingCoefficient.setRange(0, 1)
-        smoothing_coef = self.cfg.getfloat("APPLICATION", "EnvelopeSmoothingCoefficient")
-        if not 0.0 <= smoothing_coef <= 1.0:  smoothing_coef = 0.9
-        self.envelopeSmoothingCoefficient.setValue(smoothing_coef)
-        self.envelopeSmoothingCoefficient.setDisabled(not self.cfg.getboolean("APPLICATION", "Envelope"))
+        # Envelope time constant in ms, the per sample coefficient of older config files is converted
+        if not self.cfg.has_option("APPLICATION", "EnvelopeSmoothing_(ms)") and self.cfg.has_option("APPLICATION", "EnvelopeSmoothingCoefficient"):
+            smoothing_coef = self.cfg.getfloat("APPLICATION", "EnvelopeSmoothingCoefficient")
+            smoothing = -1000 / (self.fs * np.log(smoothing_coef)) if 0.0 < smoothing_coef < 1.0 else 19.5
+            self.cfg.set("APPLICATION", "EnvelopeSmoothing_(ms)", f"{smoothing:.1f}")
+            self.cfg.remove_option("APPLICATION", "EnvelopeSmoothingCoefficient")
+            self.startupMessages.append(f"envelope smoothing coefficient {smoothing_coef:g} is converted to the {smoothing:.1f} ms time constant")
+        self.envelopeSmoothing = QtWidgets.QDoubleSpinBox()
+        self.envelopeSmoothing.setSuffix(" ms")
+        self.envelopeSmoothing.setDecimals(1)
+        self.envelopeSmoothing.setSingleStep(1)
+        self.envelopeSmoothing.setRange(1, 1000)
+        smoothing = self.cfg.getfloat("APPLICATION", "EnvelopeSmoothing_(ms)", fallback=19.5)
+        if not 1 <= smoothing <= 1000:  smoothing = 19.5
+        self.envelopeSmoothing.setValue(smoothing)
+        self.envelopeSmoothing.setDisabled(not self.cfg.getboolean("APPLICATION", "Envelope"))
+        self.envelopeGain = self.cfg.getfloat("APPLICATION", "EnvelopeGain", fallback=2) # Envelope is the smoothed rectified signal times the gain
+        if not 0.1 <= self.envelopeGain <= 100: self.envelopeGain = 2
         self.EnvelopeSignalAction.toggled.connect(self.EnvelopeSignalActionTriggered)
         
         self.RMSsignalAction = QtWidgets.QCheckBox('RMS:', self)
@@ -271,18 +437,18 @@ class GUI(QtWidgets.QMainWindow):
         toolbar.append(self.addToolBar('Tool3'))
         
         
-        widgets = [self.COMports, self.liveFromSerialAction, self.dataRecordingAction, self.refreshAction, self.pauseAction]
+        widgets = self.COMports + [self.liveFromSerialAction, self.dataRecordingAction, self.refreshAction, self.pauseAction]
         for w in widgets:
             if isinstance(w, QtWidgets.QAction): toolbar[0].addAction(w)
             elif isinstance(w, QtWidgets.QWidget): toolbar[0].addWidget(w)
             
-        widgets = [dataLoadAction, self.PlaybackAction, self.slider]
+        widgets = [dataLoadAction, self.PlaybackAction, self.slider, self.playbackTime]
         for w in widgets:
             if isinstance(w, QtWidgets.QAction): toolbar[1].addAction(w)
             elif isinstance(w, QtWidgets.QWidget): toolbar[1].addWidget(w)
         
         widgets = [self.sensorsNumberAction, self.sensorsNumber, self.rawSignalAction1, self.rawSignalAction, self.rectificationSignalAction1, self.rectificationSignalAction,
-                   self.EnvelopeSignalAction1, self.EnvelopeSignalAction, self.envelopeSmoothingCoefficient, self.EnvelopeSignalAction2,
+                   self.EnvelopeSignalAction1, self.EnvelopeSignalAction, self.envelopeSmoothing, self.EnvelopeSignalAction2,
                    self.RMSsignalAction1, self.RMSsignalAction, self.RMSinterval, self.RMSsignalAction2,
                    self.bandstopAction, self.notchActiontypeBox, self.bandpassAction2, self.bandpassAction, self.passLowFreq,
                    self.bandpassAction1, self.passHighFreq]
@@ -293,11 +459,34 @@ class GUI(QtWidgets.QMainWindow):
         
         pg.setConfigOptions(antialias=False) 
         self.pw = []
-
-        for i in range(self.NUM_SENSORS):
-            widget = CustomPlotWidget(sensors_spinbox=self.sensorsNumber)
-            self.pw.append(widget)
-            widget.setXLink(self.pw[0]) 
+        
+        # Raster painting or OpenGL (pyqtgraph draws the curves with shaders)
+        self.renderer = self.cfg.get("APPLICATION", "Renderer", fallback="raster").strip().lower()
+        if self.renderer not in ('raster', 'opengl'): self.renderer = 'raster'
+        if self.renderer == 'opengl' and not openGLAvailable():
+            self.renderer = 'raster'
+            self.startupMessages.append("OpenGL is not available, plots are painted by the CPU")
+        elif self.renderer == 'opengl':
+            self.startupMessages.append("plots are painted with OpenGL")
+
+        # One plot per sensor row or all sensors stacked in one plot
+        self.layoutMode = self.cfg.get("APPLICATION", "PlotLayout", fallback="rows").strip().lower()
+        if self.layoutMode not in ('rows', 'stacked'): self.layoutMode = 'rows'
+        if self.layoutMode == 'stacked':
+            self.canvas = StackedPlotWidget(self.NUM_SENSORS, renderer=self.renderer)
+            self.pw = self.canvas.lanes
+            self.timeView = self.canvas # Plot holding the shared time range
+            plotWidgets = [self.canvas]
+        else:
+            for i in range(self.NUM_SENSORS):
+                widget = CustomPlotWidget(sensors_spinbox=self.sensorsNumber, renderer=self.renderer)
+                self.pw.append(widget)
+                widget.setXLink(self.pw[0]) 
+            self.timeView = self.pw[0]
+            plotWidgets = self.pw
+        
+        self.maxMarkerLines = 500 # Maximum count of marker lines drawn per plot
+        self.markerOverlay = [MarkerOverlay(widget) for widget in plotWidgets]
 
         
         # Plot widget for spectral Plot
@@ -306,12 +495,51 @@ class GUI(QtWidgets.QMainWindow):
         self.pFFT = self.pwFFT.plot()
         self.pFFT.setPen(color=(100, 255, 255), width=1)
         self.pwFFT.setLabel('bottom', 'Frequency', 'Hz')
+        
+        # Spectrogram of the selected sensor
+        self.pwSpec = pg.PlotWidget(background=(13, 13, 13, 255))
+        self.pwSpec.setLabel('bottom', 'Time', 's')
+        self.pwSpec.setLabel('left', 'Frequency', 'Hz')
+        self.pwSpec.setMenuEnabled(False)
+        self.specImage = pg.ImageItem()
+        self.specImage.setColorMap(pg.colormap.get('inferno'))
+        self.specImage.setLevels((IncrementalSTFT.floor, 40))
+        self.pwSpec.addItem(self.specImage)
+        
+        self.frequencyTabs = QtWidgets.QTabWidget()
+        self.frequencyTabs.addTab(self.pwFFT, "FFT")
+        self.frequencyTabs.addTab(self.pwSpec, "Spectrogram")
+        
+        # EMG features of all sensors over time, median frequency drops with fatigue
+        self.pwFeatures = pg.PlotWidget(background=(13, 13, 13, 255))
+        self.pwFeatures.showGrid(x=True, y=True, alpha=0.3)
+        self.pwFeatures.setLabel('bottom', 'Time', 's')
+        self.featureBox = QtWidgets.QComboBox()
+        self.featureBox.addItems(["Median frequency, Hz", "Mean frequency, Hz", "Zero crossings, 1/s", "Waveform length, mkV", "Mean absolute value, mkV"])
+        self.featureBox.currentIndexChanged.connect(self.showFeatures)
+        featuresTab = QtWidgets.QWidget()
+        featuresLayout = QtWidgets.QVBoxLayout(featuresTab)
+        featuresLayout.setContentsMargins(0, 0, 0, 0)
+        featuresLayout.addWidget(self.featureBox)
+        featuresLayout.addWidget(self.pwFeatures)
+        self.frequencyTabs.addTab(featuresTab, "Fatigue")
+        self.featuresTab = featuresTab
+        sensorSelection = QtWidgets.QWidget()
+        sensorSelectionLayout = QtWidgets.QHBoxLayout(sensorSelection)
+        sensorSelectionLayout.setContentsMargins(0, 0, 0, 0)
+        sensorSelectionLayout.addWidget(self.sensorSelectedAction)
+        sensorSelectionLayout.addWidget(self.sensorSelectedActionBox)
+        self.frequencyTabs.setCornerWidget(sensorSelection)
                 
         # Histogram widget
         self.pb = [] # Histogram item array, index - sensor number
         self.pbar = pg.PlotWidget(background=(13 , 13, 13, 255))
         self.pbar.showGrid(x=True, y=True, alpha=0.3)  
         colors = [(153, 0, 0), (229, 104, 19), (221, 180, 10), (30, 180, 30), (11, 50, 51), (29, 160, 191), (30, 30, 188), (75, 13, 98)]   
+        for i in range(len(colors), self.NUM_SENSORS):
+            colors.append(pg.intColor(i, hues=self.NUM_SENSORS, minValue=120, maxValue=200).getRgb()[:3])
+        
+        self.featureCurves = [] # Feature curve of every sensor
         
         # Numbering of graphs
         backLabel = []
@@ -322,6 +550,7 @@ class GUI(QtWidgets.QMainWindow):
             self.pbar.addItem(self.pb[i])  
             numberLabel.append(QtWidgets.QLabel(" " + str(i+1) + " "))
             r, g, b = colors[i]
+            self.featureCurves.append(self.pwFeatures.plot(pen=pg.mkPen(colors[i], width=2)))
             numberLabel[i].setStyleSheet(f"font-size: 25px; background-color: rgb({r}, {g}, {b}); border-radius: 14px;")
             backLabel.append(QtWidgets.QLabel(""))
             backLabel[i].setStyleSheet("font-size: 25px; background-color: rgb(21, 21, 21);")
@@ -352,9 +581,10 @@ class GUI(QtWidgets.QMainWindow):
             self.TriggerValue.append(QtWidgets.QSpinBox())
             self.TriggerValue[i].setSingleStep(1)
             self.TriggerValue[i].setRange(0, 2500)
-            trigger_val = self.cfg.getint(f"SENSOR{i+1}", "Trigger_value")
+            trigger_val = self.cfg.getint(f"SENSOR{i+1}", "Trigger_value", fallback=100)
             if not 0 <= trigger_val <= 2500: trigger_val = 100
             self.TriggerValue[i].setValue(trigger_val)
+            self.TriggerValue[i].valueChanged.connect(lambda val, i=i: self.cfg.set(f"SENSOR{i+1}", "Trigger_value", str(val)))
             
             self.NumberEMG.append(QtWidgets.QSpinBox())
             self.NumberEMG[i].setSingleStep(1)
@@ -369,6 +599,8 @@ class GUI(QtWidgets.QMainWindow):
         self.textWindow.setReadOnly(True)
         
         self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "program launched\n")
+        for message in self.startupMessages:
+            self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + message + "\n")
         
         # Layout
         vbox = QtWidgets.QVBoxLayout()
@@ -380,32 +612,57 @@ class GUI(QtWidgets.QMainWindow):
         self.row = []
         for i in range(self.NUM_SENSORS):
             plotLayout.append(QtWidgets.QGridLayout())
-            if i % 2 == 0: plotLayout[i].addWidget(backLabel[i//2], 0, 0, 10, 1)
-            plotLayout[i].addWidget(numberLabel[i], 0, 0, 10, 1, Qt.AlignmentFlag.AlignVCenter)
-            plotLayout[i].addWidget(self.pw[i], 0, 1, 10, 50)
-            plotLayout[i].addWidget(self.ChargeLabel[i], 0, 49) 
-            plotLayout[i].addWidget(self.TriggerLabel[i], 1, 49) 
-            plotLayout[i].addWidget(self.TriggerValue[i], 1, 50)   
-            plotLayout[i].addWidget(self.NumberEMG_Lable[i], 2, 49) 
-            plotLayout[i].addWidget(self.NumberEMG[i], 2, 50) 
+            if self.layoutMode == 'stacked':
+                # Sensor widgets only, the signals are in the stacked plot
+                plotLayout[i].addWidget(numberLabel[i], 0, 0, 3, 1, Qt.AlignmentFlag.AlignVCenter)
+                plotLayout[i].addWidget(self.ChargeLabel[i], 0, 1, 1, 2) 
+                plotLayout[i].addWidget(self.TriggerLabel[i], 1, 1) 
+                plotLayout[i].addWidget(self.TriggerValue[i], 1, 2)   
+                plotLayout[i].addWidget(self.NumberEMG_Lable[i], 2, 1) 
+                plotLayout[i].addWidget(self.NumberEMG[i], 2, 2) 
+            else:
+                if i % 2 == 0: plotLayout[i].addWidget(backLabel[i//2], 0, 0, 10, 1)
+                plotLayout[i].addWidget(numberLabel[i], 0, 0, 10, 1, Qt.AlignmentFlag.AlignVCenter)
+                plotLayout[i].addWidget(self.pw[i], 0, 1, 10, 50)
+                plotLayout[i].addWidget(self.ChargeLabel[i], 0, 49) 
+                plotLayout[i].addWidget(self.TriggerLabel[i], 1, 49) 
+                plotLayout[i].addWidget(self.TriggerValue[i], 1, 50)   
+                plotLayout[i].addWidget(self.NumberEMG_Lable[i], 2, 49) 
+                plotLayout[i].addWidget(self.NumberEMG[i], 2, 50) 
             plotLayout[i].setContentsMargins(0, 0, 0, 0)    
             
             self.row.append(QtWidgets.QWidget())
             self.row[i].setLayout(plotLayout[i])
+        
+        if self.layoutMode == 'stacked':
+            sensorPanel = QtWidgets.QWidget()
+            sensorLayout = QtWidgets.QVBoxLayout(sensorPanel)
+            for row in self.row: sensorLayout.addWidget(row)
+            sensorLayout.addStretch(1)
+            sensorScroll = QtWidgets.QScrollArea()
+            sensorScroll.setWidgetResizable(True)
+            sensorScroll.setWidget(sensorPanel)
+            sensorScroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+            sensorScroll.setMinimumWidth(sensorPanel.sizeHint().width() + sensorScroll.verticalScrollBar().sizeHint().width())
             
-        splitter = QtWidgets.QSplitter(Qt.Orientation.Vertical)
-        splitter.setHandleWidth(1)
-
-        for row in self.row[:self.NUM_SENSORS]: splitter.addWidget(row)
+            splitter = QtWidgets.QSplitter(Qt.Orientation.Horizontal)
+            splitter.setHandleWidth(1)
+            splitter.addWidget(self.canvas)
+            splitter.addWidget(sensorScroll)
+            splitter.setStretchFactor(0, 1)
+            splitter.setStretchFactor(1, 0)
+        else:
+            splitter = QtWidgets.QSplitter(Qt.Orientation.Vertical)
+            splitter.setHandleWidth(1)
+    
+            for row in self.row[:self.NUM_SENSORS]: splitter.addWidget(row)
 
         layout = QtWidgets.QGridLayout()       
         layout.addWidget(splitter, 0, 0, 40, 4)
         layout.addWidget(self.pbar, 0, 4, 20, 11)
-        layout.addWidget(self.pwFFT, 20, 4, 16, 11)
+        layout.addWidget(self.frequencyTabs, 20, 4, 16, 11)
         layout.setColumnStretch(2, 2)
 
-        layout.addWidget(self.sensorSelectedAction , 20, 13, 1, 1)
-        layout.addWidget(self.sensorSelectedActionBox , 20, 14, 1, 1)  
         
         layout.addWidget(self.textWindow, 37, 4, 3, 12)  
         
@@ -415,31 +672,42 @@ class GUI(QtWidgets.QMainWindow):
         self.showMaximized()
         self.show()    
         
-        # Serial monitor
-        self.serialMonitor = SerialMonitor(self.delay)
+        # Serial monitors, one acquisition thread per dongle
+        self.serialMonitors = [SerialMonitor(self.delay, self.pollDelay) for d in range(self.dongles)]
+        for d in range(self.dongles):
+            self.COMports[d].currentTextChanged.connect(lambda port, d=d: self.COMportSelected(d, port))
         
-        existing_ports = {self.COMports.itemText(i) for i in range(self.COMports.count())}
-        
-        for port in self.serialMonitor.ports:
-            if port not in existing_ports:
-                self.COMports.addItem(port)
-                    
-        if self.serialMonitor.COM:
-            self.serialMonitor.serialConnect()
-            self.liveFromSerialAction.setChecked(True)
-            self.dataRecordingAction.setDisabled(False)
-            self.sensorsNumber.setDisabled(False)
-            self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "live from " + self.serialMonitor.COM +" \n")
-            self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
-            self.COMports.setDisabled(True)
-            self.refreshAction.setDisabled(False)
+        # Port discovery runs in the background and only reports changes. The
+        # first list comes from the first scan, live starts on it (startupPorts).
+        self.portsListed = False
+        self.portWatcher = PortWatcher()
+        self.portWatcher.portsChanged.connect(self.updatePorts)
+        self.portWatcher.start()
 
         self.sensorsNumber.valueChanged.connect(self.setSensorsNumber)        
+        self.envelopeSmoothing.valueChanged.connect(self.envelopeSmoothingChanged)
+        self.RMSinterval.valueChanged.connect(lambda val: self.cfg.set('APPLICATION', 'RMSinterval', str(val)))
+        self.passLowFreq.valueChanged.connect(lambda val: self.cfg.set("APPLICATION", "BandPassFilterLF", str(val)))
+        self.passHighFreq.valueChanged.connect(lambda val: self.cfg.set("APPLICATION", "BandPassFilterHF", str(val)))
+        
+        # PLL-adjusted sensor periods are persisted periodically, outside of the frame loop
+        self.timingPersist = QtCore.QTimer(self)
+        self.timingPersist.setInterval(10000)
+        self.timingPersist.timeout.connect(self.storeSensorTiming)
+        self.timingPersist.start()
         sensors_val = self.cfg.getint("APPLICATION", "SensorsNumber")
-        if not 1 <= sensors_val <=8: sensors_val = 8
+        if not 1 <= sensors_val <= self.NUM_SENSORS: sensors_val = self.NUM_SENSORS
         self.setSensorsNumber(sensors_val)
-        self.mainrun = MainRun(self.delay)
-        self.mainrun.bufferUpdated.connect(self.updateListening, QtCore.Qt.ConnectionType.QueuedConnection)  
+        maxFps = self.cfg.getfloat("APPLICATION", "MaxFPS", fallback=30)
+        if not 1 <= maxFps <= 60: maxFps = 30
+        self.frameScheduler = FrameScheduler(self, maxFps)
+        self.frameScheduler.frame.connect(self.updateListening)
+        
+        # History redraw after the view range changes while paused
+        self.historyTimer = QtCore.QTimer(self)
+        self.historyTimer.setSingleShot(True)
+        self.historyTimer.setInterval(100)
+        self.historyTimer.timeout.connect(self.showHistory)
         
         self.serialPoll = QtCore.QTimer(self)
         self.serialPoll.setInterval(int(self.pollDelay * 1000))
@@ -472,10 +740,18 @@ class GUI(QtWidgets.QMainWindow):
     def EnvelopeSignalActionTriggered(self):
         self.cfg.set("APPLICATION", "Envelope", str(self.EnvelopeSignalAction.isChecked()))
         if self.EnvelopeSignalAction.isChecked():
-            self.envelopeSmoothingCoefficient.setDisabled(False)
-            self.MovingAverage.MA_alpha = self.envelopeSmoothingCoefficient.value()
+            self.envelopeSmoothing.setDisabled(False)
         else:
-            self.envelopeSmoothingCoefficient.setDisabled(True)
+            self.envelopeSmoothing.setDisabled(True)
+    
+    def envelopeSmoothingChanged(self, val):
+        self.cfg.set('APPLICATION', 'EnvelopeSmoothing_(ms)', str(val))
+    
+    # Store the PLL-learned time between samples of synchronized sensors
+    def storeSensorTiming(self):
+        for i in range(self.NUM_SENSORS):
+            if self.pll_initialized[i]:
+                self.cfg.set(f"SENSOR{i+1}", "dt_(s)", str(self.dt[i]))
     
     def rawSignalActionTriggered(self):
         self.cfg.set("APPLICATION", "RAW_EMG", str(self.rawSignalAction.isChecked()))
@@ -490,60 +766,177 @@ class GUI(QtWidgets.QMainWindow):
     def liveFromSerial(self):
         if self.liveFromSerialAction.isChecked():
             self.refresh()
-            self.serialMonitor.serialConnect()
-            self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "live from " + self.serialMonitor.COM +" \n")
-            self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
+            self.serialConnect()
             self.PlaybackAction.setChecked(False)
             self.refreshAction.setDisabled(False)   
             self.pauseAction.setDisabled(False)
             self.dataRecordingAction.setDisabled(False)
-            self.COMports.setDisabled(True)
+            for box in self.COMports: box.setDisabled(True)
             self.slider.setDisabled(True)
             self.slider.setFixedWidth(40)
+            self.playbackTime.setText('')
             self.sensorsNumber.setDisabled(False)
         else:
             self.refresh()
-            self.serialMonitor.serialDisconnection()
+            self.serialDisconnection()
             self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "live stopped\n")
             self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
             self.refreshAction.setDisabled(True)   
             self.pauseAction.setDisabled(True)
             self.dataRecordingAction.setDisabled(True)
-            self.COMports.setDisabled(False)
+            for box in self.COMports: box.setDisabled(False)
             self.sensorsNumber.setDisabled(True)
+            self.updatePorts(self.portWatcher.ports)
+    
+    # Connect all dongles with a selected port
+    def serialConnect(self):
+        for d, monitor in enumerate(self.serialMonitors):
+            if monitor.COM == '': continue
+            monitor.serialConnect()
+            source = f" (sensors {d*self.SENSORS_PER_DONGLE+1}-{(d+1)*self.SENSORS_PER_DONGLE})" if self.dongles > 1 else ""
+            self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "live from " + monitor.COM + source + " \n")
+        self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
+    
+    def serialDisconnection(self):
+        for monitor in self.serialMonitors:
+            monitor.serialDisconnection()
+    
+    # Synchronize port lists with the ports reported by the watcher
+    def updatePorts(self, ports):
+        for monitor in self.serialMonitors:
+            monitor.ports = list(ports)
+        first = not self.portsListed
+        self.portsListed = True
+        if self.liveFromSerialAction.isChecked():
+            return
+        
+        available = set(ports) | {''}
+        for box in self.COMports:
+            for i in reversed(range(box.count())):
+                if box.itemText(i) not in available:
+                    # An extra dongle whose port is gone goes back to no port
+                    if i == box.currentIndex() and box.itemText(0) == '': box.setCurrentIndex(0)
+                    box.removeItem(i)
+                    
+            listed = {box.itemText(i) for i in range(box.count())}
+            for port in ports:
+                if port not in listed:
+                    box.addItem(port)
+        if first: self.startupPorts(ports)
+    
+    # Live from the first listed port, once the watcher has listed the ports
+    # after start. Other serial devices may be connected, so extra dongles are
+    # only connected to the ports selected for them.
+    def startupPorts(self, ports):
+        if self.PlaybackAction.isChecked(): return
+        for d in range(self.dongles):
+            self.serialMonitors[d].COM = ports[0] if d == 0 and ports else ''
+        if ports: self.COMports[0].setCurrentIndex(0)
+                    
+        if self.serialMonitors[0].COM:
+            self.serialConnect()
+            self.liveFromSerialAction.setChecked(True)
+            self.dataRecordingAction.setDisabled(False)
+            self.sensorsNumber.setDisabled(False)
+            for box in self.COMports: box.setDisabled(True)
+            self.refreshAction.setDisabled(False)
+    
+    def COMportSelected(self, d, port):
+        if self.liveFromSerialAction.isChecked():
+            return
+        monitor = self.serialMonitors[d]
+        if monitor.COM != port:
+            monitor.COM = port
+            monitor.connect = False
            
     # Start working
     def start(self):
-        self.mainrun.running = True
-        self.mainrun.start()
+        self.frameScheduler.start()
         self.serialPoll.start()
     
     # Pause data plotting
     def pause(self):
         if self.pauseAction.isChecked():
             self.serialPoll.stop()
+            self.showHistory()
+            self.timeView.sigXRangeChanged.connect(self.historyRangeChanged)
             self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "pause ON" + "\n")
             self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
         else:
+            try: self.timeView.sigXRangeChanged.disconnect(self.historyRangeChanged)
+            except TypeError: pass
             self.serialPoll.start()
             self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "pause OFF" + "\n")
             self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
 
+    # Show the history of the raw signal for the visible range while paused. Full
+    # resolution data is taken from the history buffer (or from the playback file)
+    # when zoomed in, and min/max buckets of the history pyramid when zoomed out.
+    def showHistory(self):
+        if not self.pauseAction.isChecked(): return
+        if not (self.rawSignalAction.isChecked() or self.rectificationSignalAction.isChecked()): return
+        num_sensors = int(self.sensorsNumber.value())
+        x0, x1 = self.timeView.viewRange()[0]
+        span = x1 - x0
+        
+        for i in range(num_sensors):
+            x, y = self.fullResolution(i, x0 - span, x1 + span)
+            if x is None and self.pyramid is not None:
+                x, y = self.pyramid.query(i, x0 - span, x1 + span, self.historyPoints, self.fs)
+            if x is None: continue
+            if self.rectificationSignalAction.isChecked(): y = np.abs(y)
+            self.pw[i].p.setData(y=y, x=x)
+    
+    def historyRangeChanged(self, *args):
+        self.historyTimer.start()
+    
+    # Full resolution raw signal in mkV between t0 and t1, if available and small enough to draw
+    def fullResolution(self, i, t0, t1):
+        if (t1 - t0) * self.fs > 10 * self.historyPoints: 
+            return None, None
+        
+        timeHistory = self.data.latest(self.data.time, i, self.l[i], self.historyWidth)
+        first = np.searchsorted(timeHistory, 0, side='right') # Skip samples that were never written
+        if first < len(timeHistory) and (timeHistory[first] <= max(t0, 0) or self.pyramid is None):
+            lo = max(first, np.searchsorted(timeHistory, t0))
+            hi = np.searchsorted(timeHistory, t1)
+            plot = self.data.latest(self.data.raw, i, self.l[i], self.historyWidth)[lo:hi]
+            x = timeHistory[lo:hi]
+        elif self.PlaybackAction.isChecked() and self.loadDataLen > 0:
+            lo = min(max(int(t0 * self.fs), 0), self.loadDataLen)
+            hi = min(max(int(t1 * self.fs), 0), self.loadDataLen)
+            if i >= self.loadChannels: return None, None
+            plot = self.loadData[lo:hi, i].astype(np.float32)
+            x = np.arange(lo, hi) / self.fs
+        else:
+            return None, None
+        
+        plot = plot - 8192
+        plot *= 0.30517578125
+        return x, plot
+    
     # Refresh data
     def refresh(self):
         self.l = [0] * self.NUM_SENSORS
-        self.dataWidth = int((self.timeWidth + 2)*self.fs)
-        self.data.refresh(self.dataWidth)
-        self.msg_end = bytearray([0])      
+        self.data.refresh(self.dataWidth, self.historyWidth)
+        if self.pyramid is not None: self.pyramid.reset()
+        if self.dspWorker is not None: self.dspWorker.reset()
+        self.msg_end = [bytearray([0])]*self.dongles
         self.ms_len =  [0]*self.NUM_SENSORS
+        self.streamEvents = [] # Times of pending events refer to the previous start
         self.MSG_NUM_0 = [0]*self.NUM_SENSORS
-        self.slider.setValue(0)
         self.sliderpos = 0
+        self.playbackClock = None
+        self.showPlaybackPosition()
         self.TIMER = 0
-        self.FFT = np.zeros((self.NUM_SENSORS, 500), dtype=np.float32) 
+        self.FFT.fill(0)
+        self.spectrogram.reset()
+        self.featureHistory.reset()
+        self.featureDue = 0
         
         self.pll_initialized = [False] * self.NUM_SENSORS
         self.v_time = [0.0] * self.NUM_SENSORS
+        self.timeCorrection = [0.0] * self.NUM_SENSORS
         
         for i in range(self.NUM_SENSORS):
             self.NumberEMG[i].setValue(0)
@@ -570,8 +963,15 @@ class GUI(QtWidgets.QMainWindow):
             self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
             self.recordingFile_TXT = open(self.recordingFileName_TXT, "a") # Data file creation
             self.recordingFile_TXT.write(datetime.now().strftime("Date: %Y.%m.%d\rTime: %H:%M:%S") + "\r\n") # Data file name
-            self.recordingFile_TXT.write("File format: \r\n8 sensors data in mkV and timestamp\r\n") # Data file format
+            self.recordingFile_TXT.write(f"File format: \r\n{self.NUM_SENSORS} sensors data in mkV and timestamp\r\n") # Data file format
             self.recordingFile_BIN = open(self.recordingFileName_BIN, 'ab')
+            self.recordingFile_EVENTS = open(os.path.join(self.REC_DIR, timestamp + "_events.csv"), "a")
+            self.recordingFile_EVENTS.write("sample,time_s,marker\n")
+            self.recordingFile_FEATURES = open(os.path.join(self.REC_DIR, timestamp + "_features.csv"), "a")
+            self.recordingFile_FEATURES.write("time_s," + ",".join(f"{name}{i+1}" for i in range(int(self.sensorsNumber.value())) for name in FEATURES) + "\n")
+            self.startColumnarRecording(os.path.join(self.REC_DIR, timestamp))
+            self.recordedSamples = 0
+            self.markers.cursor = self.markers.count # Markers set before the recording are not written
             self.is_recording = True
         else:
             if not self.PlaybackAction.isChecked():
@@ -583,10 +983,100 @@ class GUI(QtWidgets.QMainWindow):
             if getattr(self, 'recordingFile_BIN', None) is not None:
                 self.recordingFile_BIN.close()
                 self.recordingFile_BIN = None
+            if self.recordingFile_EVENTS is not None:
+                self.recordingFile_EVENTS.close()
+                self.recordingFile_EVENTS = None
+            if self.recordingFile_FEATURES is not None:
+                self.recordingFile_FEATURES.close()
+                self.recordingFile_FEATURES = None
+            self.stopColumnarRecording()
             self.sensorsNumber.setDisabled(False)
             self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "recording stopped. Result file: \"" + os.getcwd() + self.recordingFileName_TXT + "\"\n")
             self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
                 
+    # Columnar copy and journal of the recording, written in chunks by background
+    # threads. The journal commits 1 s chunks.
+    def startColumnarRecording(self, path):
+        metadata = {'created': datetime.now().isoformat(timespec='seconds'),
+                    'application': self.windowTitle(),
+                    'sample_rate_hz': self.fs,
+                    'sensors': self.NUM_SENSORS,
+                    'bandstop_filter': self.notchActiontypeBox.currentText() if self.bandstopAction.isChecked() else None,
+                    'bandpass_filter_hz': [self.passLowFreq.value(), self.passHighFreq.value()] if self.bandpassAction.isChecked() else None,
+                    'units': {'row_time': 's', 'time': 's', 'raw': 'ADC code', 'filtered': 'mkV', 'marker': 'ASCII code'}}
+        if self.columnarFormat is not None:
+            try:
+                self.recorders.append(ColumnarRecorder(path + FORMATS[self.columnarFormat], self.columnarFormat, metadata, self.columnarChunkRows))
+            except ImportError as e:
+                self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + f"{self.columnarFormat} recording needs the {e.name} library\n")
+            except OSError as e:
+                self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + f"columnar recording was not started: {e}\n")
+        if self.journalSync is not None:
+            try:
+                self.recorders.append(ColumnarRecorder(path + FORMATS['myob'], 'myob', metadata, self.fs,
+                                                       sync=self.journalSync, syncInterval=self.journalSyncInterval))
+            except OSError as e:
+                self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + f"recording journal was not started: {e}\n")
+    
+    def stopColumnarRecording(self):
+        for recorder in self.recorders:
+            recorder.close()
+            if recorder.error is not None:
+                self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + f"recording to \"{recorder.path}\" failed: {recorder.error}\n")
+        self.recorders = []
+    
+    # Records lo..hi of the playback file as [NUM_SENSORS, hi - lo] ADC counts,
+    # sensors missing in the file are at zero signal (8192)
+    def loadRecords(self, lo, hi):
+        block = np.full((self.NUM_SENSORS, hi - lo), 8192, dtype=SIGNAL_DTYPE)
+        channels = min(self.loadChannels, self.NUM_SENSORS)
+        block[:channels] = self.loadData[lo:hi, :channels].T
+        return block
+    
+    # Jump the playback to a sample of the file. The ring buffers are filled
+    # with the history ending there and the next frame computes the envelope and
+    # RMS of the whole window, so the plots are complete at once.
+    def seek(self, position):
+        if not self.PlaybackAction.isChecked() or self.loadDataLen < 2: return
+        position = min(max(int(position), 0), self.loadDataLen - 2)
+        n = min(position, self.historyWidth)
+        self.data.raw.fill(0)
+        self.data.time.fill(0)
+        self.data.raw[:, :n] = self.loadRecords(position - n, position)
+        self.data.time[:, :n] = np.arange(position - n + 1, position + 1) / self.fs
+        self.l = [n] * self.NUM_SENSORS
+        self.ms_len = [min(n, self.dataWidth)] * self.NUM_SENSORS
+        self.sliderpos = position
+        self.playbackClock = None
+        
+        # Envelope and RMS start from zero state, like after refresh
+        self.data.envelope.fill(0)
+        self.data.RMS.fill(0)
+        self.dsp.envelope.reset()
+        if self.dspWorker is not None: self.dspWorker.reset()
+        self.FFT.fill(0)
+        self.spectrogram.reset()
+        self.featureHistory.reset()
+        self.featureDue = 0
+        for i in range(self.NUM_SENSORS):
+            self.FlagEMG[i] = 0
+            self.num[i] = 0
+        if self.pyramid is not None:
+            self.pyramid.reset()
+            for i in range(self.NUM_SENSORS):
+                self.pyramid.append(i, self.data.raw[i][:n], self.data.time[i][:n])
+        self.showPlaybackPosition()
+    
+    # Playback position on the slider (without seeking) and as time
+    def showPlaybackPosition(self):
+        if not self.slider.isSliderDown():
+            self.slider.blockSignals(True)
+            self.slider.setValue(self.sliderpos)
+            self.slider.blockSignals(False)
+        if self.PlaybackAction.isChecked():
+            position, length = self.sliderpos // self.fs, self.loadDataLen // self.fs
+            self.playbackTime.setText(f" {position // 60}:{position % 60:02d} / {length // 60}:{length % 60:02d} ")
+    
     # Selecting playback file
     def dataLoad(self):
         if self.liveFromSerialAction.isChecked():
@@ -613,22 +1103,31 @@ class GUI(QtWidgets.QMainWindow):
             if self.liveFromSerialAction.isChecked():
                 self.liveFromSerialAction.setChecked(False)
             self.refresh()
-            self.serialMonitor.serialDisconnection()
+            self.serialDisconnection()
             self.dataRecordingAction.setDisabled(False)  
             self.refreshAction.setDisabled(True) 
             self.pauseAction.setDisabled(False)  
-            self.COMports.setDisabled(False)
+            for box in self.COMports: box.setDisabled(False)
             self.sensorsNumber.setDisabled(False)
-            self.loadFile = open(self.loadFileName, 'rb')
             self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "playback from: " + self.loadFileName + "\n")
             self.textWindow.verticalScrollBar().setValue(self.textWindow.verticalScrollBar().maximum()-2)
-            self.loadData = self.loadFile.read()
-            self.loadDataLen = int(len(self.loadData)/16)
-            self.loadFile.close()
+            self.loadChannels = recordingChannels(self.loadFileName)
+            self.loadDataLen = os.path.getsize(self.loadFileName) // (2*self.loadChannels)
+            if self.loadDataLen > 0:
+                self.loadData = np.memmap(self.loadFileName, dtype='<u2', mode='r', shape=(self.loadDataLen, self.loadChannels))
+            else:
+                self.loadData = np.zeros((0, self.loadChannels), dtype=np.uint16)
+            self.slider.blockSignals(True)
+            self.slider.setRange(0, max(self.loadDataLen - 1, 0))
+            self.slider.setSingleStep(self.fs)
+            self.slider.setPageStep(10*self.fs)
+            self.slider.blockSignals(False)
+            self.showPlaybackPosition()
             
         else:
             self.slider.setDisabled(True)
             self.slider.setFixedWidth(40)
+            self.playbackTime.setText('')
             self.refresh()
             self.dataRecordingAction.setDisabled(True)
             self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + "playback stopped \n")
@@ -640,22 +1139,41 @@ class GUI(QtWidgets.QMainWindow):
         
         if digit_char and digit_char.isdigit() and len(digit_char) == 1 and digit_char != '0':
             exercise_start_timestamp = time.perf_counter() - self.TIMER
-            self.markers_list.append((digit_char, exercise_start_timestamp))
+            self.markers.add(digit_char, exercise_start_timestamp)
+            self.streamEvent(ALL_SENSORS, exercise_start_timestamp, EVENT_MARKER, digit_char)
+            self.markerView = None
             
             if hasattr(self, 'pw'):
-                for pw in self.pw:
-                    marker_line = pg.InfiniteLine(
-                        pos=exercise_start_timestamp, 
-                        pen=pg.mkPen(color='w', width=1, style=QtCore.Qt.DashLine),
-                        label=f"Ex {digit_char}",
-                        labelOpts={'position': 0.9, 'color': 'w'}
-                    )
-                    
-                    pw.addItem(marker_line)
+                self.updateMarkers()
                     
         super().keyPressEvent(event)        
     
     
+    # Plot the selected EMG feature of the shown sensors
+    def showFeatures(self):
+        feature = (1, 0, 2, 3, 4)[self.featureBox.currentIndex()] # Median frequency first in the list
+        times, values = self.featureHistory.series(feature)
+        num_sensors = int(self.sensorsNumber.value())
+        for i, curve in enumerate(self.featureCurves):
+            if i < num_sensors: curve.setData(x=times, y=values[:, i])
+            else: curve.clear()
+    
+    # Draw the markers inside the visible range. Nothing is redrawn while the range
+    # and the markers stay the same.
+    def updateMarkers(self):
+        x0, x1 = self.timeView.viewRange()[0]
+        y0, y1 = self.timeView.viewRange()[1]
+        lo, hi = self.markers.range(x0, x1)
+        view = (x0, x1, y1, lo, hi)
+        if view == self.markerView: return
+        self.markerView = view
+        
+        lo = max(lo, hi - self.maxMarkerLines)
+        times = self.markers.times[lo:hi]
+        keys = self.markers.keys[lo:hi]
+        for overlay in self.markerOverlay:
+            overlay.setMarkers(times, keys, y0 + 0.95*(y1 - y0))
+    
     def pollData(self):
         if (self.PlaybackAction.isChecked() and self.loadFileName != ''):
             self.readFromFile()
@@ -665,47 +1183,9 @@ class GUI(QtWidgets.QMainWindow):
     # Update
     def updateListening(self):  
         
-        raw_enabled = self.rawSignalAction.isChecked()
-        rect_enabled = self.rectificationSignalAction.isChecked()
-        env_enabled = self.EnvelopeSignalAction.isChecked()
-        rms_enabled = self.RMSsignalAction.isChecked()
-        bandstop_enabled = self.bandstopAction.isChecked()
-        bandpass_enabled = self.bandpassAction.isChecked()
-        notch_type = self.notchActiontypeBox.currentText()
         num_sensors = int(self.sensorsNumber.value())
-        rms_interval = self.RMSinterval.value()
-        
-        self.cfg.set('APPLICATION', 'EnvelopeSmoothingCoefficient', str(self.envelopeSmoothingCoefficient.value()))
-        self.cfg.set('APPLICATION', 'RMSinterval', str(rms_interval))
-        self.cfg.set("APPLICATION", "BandPassFilterLF", str(self.passLowFreq.value()))
-        self.cfg.set("APPLICATION", "BandPassFilterHF", str(self.passHighFreq.value()))
-        
-        if (not self.liveFromSerialAction.isChecked()):
-            self.serialMonitor.updatePorts()
-                   
-            ports = [self.COMports.itemText(i) for i in range(self.COMports.count())]
-            
-            for i in range(self.COMports.count()):
-                if self.COMports.itemText(i) not in self.serialMonitor.ports:
-                    self.COMports.removeItem(i)
-                    
-            for i in range(len(self.serialMonitor.ports)):
-                if self.serialMonitor.ports[i] not in ports:
-                    self.COMports.addItem(self.serialMonitor.ports[i])
-            
-            if self.serialMonitor.COM != self.COMports.currentText():
-                self.serialMonitor.COM = self.COMports.currentText()
-                self.serialMonitor.connect = False
         
         if self.passLowFreq.value() > self.passHighFreq.value(): self.passLowFreq.setValue(self.passHighFreq.value())
-        
-        # Read data from File               
-        if (self.PlaybackAction.isChecked() and self.loadFileName != ''):
-            self.readFromFile()
-        
-        # Read data from serial          
-        if (self.liveFromSerialAction.isChecked()):
-            self.readFromSerial()
 
         while self.sensorSelectedActionBox.count() < num_sensors: 
             self.sensorSelectedActionBox.addItem(str(self.sensorSelectedActionBox.count() + 1))
@@ -716,243 +1196,312 @@ class GUI(QtWidgets.QMainWindow):
         max_time = max(self.data.time[i][self.l[i] - 1] for i in range(num_sensors))
         start = self.timeWidth * (max_time // self.timeWidth)
         end = start + self.timeWidth
-        n = int(rms_interval * 1000 / 2)
     
         if not self.pauseAction.isChecked():
-            self.pw[0].setXRange(start, end)   
+            self.timeView.setXRange(start, end)   
             
         if (self.PlaybackAction.isChecked() and self.loadFileName != '') or (self.liveFromSerialAction.isChecked()):  
-            max_time = 0
+            if self.dspWorker is not None:
+                self.processInWorker(num_sensors)
+            else:
+                frame = self.takeFrame(num_sensors)
+                spectrum = self.dsp.process(frame.raw, frame.dt, frame.msLen, frame.settings, self.data)
+                self.showFrame(frame, spectrum)
+        else:
+            self.ms_len = [0]*self.NUM_SENSORS
+    
+    # Pass the frame to the DSP process and show the previous frame, which was
+    # processed while the GUI was drawing
+    def processInWorker(self, num_sensors):
+        # The previous frame is still processed, new samples are left for the next frame
+        if self.dspWorker.busy(): return
+        
+        frame = self.takeFrame(num_sensors)
+        try:
+            done = self.dspWorker.collect()
+            self.dspWorker.submit(frame)
+        except (EOFError, OSError) as e:
+            self.dspWorker.close()
+            self.dspWorker = None
+            self.textWindow.insertPlainText(datetime.now().strftime("[%H:%M:%S] ") + f"DSP process stopped ({e!r}), processing continues in the GUI process\n")
+            spectrum = self.dsp.process(frame.raw, frame.dt, frame.msLen, frame.settings, self.data)
+            self.showFrame(frame, spectrum)
+            return
+        
+        if done is not None:
+            previous, blocks = done
+            blocks.copyTo(self.data)
+            self.showFrame(previous, blocks.fft)
+    
+    # Raw and time windows of the active sensors and the new samples count since
+    # the previous frame, passed to the signal processing
+    def takeFrame(self, num_sensors):
+        # Two frame buffers, the DSP process shows the previous frame while the next one is taken
+        self.frameSlot ^= 1
+        raw, times = self.frameBuffers[self.frameSlot]
+        for i in range(num_sensors):
+            self.data.latest(self.data.raw, i, self.l[i], self.dataWidth, out=raw[i])
+            self.data.latest(self.data.time, i, self.l[i], self.dataWidth, out=times[i])
+        raw[num_sensors:].fill(0)
+        times[num_sensors:].fill(0)
+        
+        settings = DSPSettings(sensors=num_sensors,
+                               bandstop=self.bandstopAction.isChecked(),
+                               notch=self.notchActiontypeBox.currentText(),
+                               bandpass=self.bandpassAction.isChecked(),
+                               lowFreq=self.passLowFreq.value(),
+                               highFreq=self.passHighFreq.value(),
+                               rmsInterval=self.RMSinterval.value(),
+                               smoothing=self.envelopeSmoothing.value(),
+                               gain=self.envelopeGain,
+                               fftSensor=min(max(self.sensorSelectedActionBox.currentIndex(), 0), num_sensors - 1))
+        frame = DSPFrame(raw, times, list(self.ms_len), list(self.dt), settings)
+        self.ms_len = [0]*self.NUM_SENSORS
+        return frame
+    
+    # Plot, trigger detection, streaming and recording of a processed frame.
+    # self.data holds the processed signals of the frame.
+    def showFrame(self, frame, spectrum):
+        raw_enabled = self.rawSignalAction.isChecked()
+        rect_enabled = self.rectificationSignalAction.isChecked()
+        env_enabled = self.EnvelopeSignalAction.isChecked()
+        rms_enabled = self.RMSsignalAction.isChecked()
+        num_sensors = frame.settings.sensors
+        
+        if not hasattr(self, '_fft_frame_counter'):
+            self._fft_frame_counter = 0
+        self._fft_frame_counter += 1
             
-            if not hasattr(self, '_fft_frame_counter'):
-                self._fft_frame_counter = 0
-            self._fft_frame_counter += 1
-                
-            v_time_max = max(self.v_time)
-            threshold = v_time_max - 0.250
-            max_search_depth = 300
+        v_time_max = max(self.v_time)
+        threshold = v_time_max - 0.250
+        max_search_depth = 300
+        
+        max_ms_len = max(frame.msLen)
+        streamBlocks = []
+        for i in range( num_sensors ):
+            pw = self.pw[i]
+            ms_len = frame.msLen[i]
             
+            timePlot = frame.time[i]
+            target_index = next(
+                (idx for idx in range(len(timePlot) - 1, len(timePlot) - 1 - max_search_depth, -1) 
+                 if timePlot[idx] < threshold), 
+                len(timePlot) - 1)
             
-            max_ms_len = max(self.ms_len)
-            for i in range( num_sensors ):
-                self.cfg.set(f"SENSOR{i+1}", "dt_(s)", str(self.dt[i]))
-                self.cfg.set(f"SENSOR{i+1}", "Trigger_value", str(self.TriggerValue[i].value()))
+            if not self.pauseAction.isChecked():
+                end_pos = target_index + 1
                 
-                pw = self.pw[i]
-                dt = self.dt[i]
-                ms_len = self.ms_len[i]
-                
-                timePlot = np.concatenate((self.data.time[i][self.l[i]:], self.data.time[i][:self.l[i]]))
-                target_index = next(
-                    (idx for idx in range(len(timePlot) - 1, len(timePlot) - 1 - max_search_depth, -1) 
-                     if timePlot[idx] < threshold), 
-                    len(timePlot) - 1)
-            
-                plot = np.concatenate((self.data.raw[i][self.l[i]:], self.data.raw[i][:self.l[i]]))
-                plot -= 8192
-                plot *= 0.30517578125  # Precomputed constant (2.5 / 16384.0 * 2000)
-            
-                if  bandstop_enabled:
-                    if (notch_type == "50 Hz"): plot = self.bandstop_filter_50Hz.apply(plot, 1/dt)
-                    if (notch_type == "60 Hz"): plot = self.bandstop_filter_60Hz.apply(plot, 1/dt)
-                                
-                if bandpass_enabled: 
-                    plot = self.bandpass_filter.apply(plot, self.passLowFreq.value(), self.passHighFreq.value(), 1/dt)
-                    self.data.rectification[i] = abs(plot)
-                else: self.data.rectification[i] = abs(self.HP_filter.apply(plot, 1, 1/dt))
+                # Plot raw data or rectification
+                if raw_enabled: pw.p.setData(y=self.data.plot[i][:end_pos], x=timePlot[:end_pos])
+                elif rect_enabled:  pw.p.setData(y=self.data.rectification[i][:end_pos], x=timePlot[:end_pos])
+                elif not raw_enabled:  pw.p.clear()
                 
-                if  bandstop_enabled or bandpass_enabled: plot[0:int(1.5*self.fs)] = 0
-                self.data.rectification[i][0:int(1.5*self.fs)] = 0
-                self.data.envelope[i][0:int(1.5*self.fs)] = 0
-                self.data.RMS[i][0:int(1.5*self.fs)] = 0
+                # Plot envelope data
+                if  env_enabled: pw.pe.setData(y=self.data.envelope[i][:end_pos], x=timePlot[:end_pos])
+                else: pw.pe.clear()     
                 
-                if not self.pauseAction.isChecked():
-                    end_pos = target_index + 1
-                    
-                    # Plot raw data or rectification
-                    if raw_enabled: pw.p.setData(y=plot[:end_pos], x=timePlot[:end_pos])
-                    elif rect_enabled:  pw.p.setData(y=self.data.rectification[i][:end_pos], x=timePlot[:end_pos])
-                    elif not raw_enabled:  pw.p.clear()
-                    
-                    # Plot envelope data
-                    if  env_enabled: pw.pe.setData(y=self.data.envelope[i][:end_pos], x=timePlot[:end_pos])
-                    else: pw.pe.clear()     
-                    
-                    # Plot RMS data
-                    if  rms_enabled: pw.pi.setData(y=self.data.RMS[i][:end_pos], x=timePlot[:end_pos])
-                    else: pw.pi.clear()
-                    
-                    # Plot histogram
-                    self.pb[i].setOpts(height=2*self.data.RMS[i][-1])
-                    
-                self.data.plot[i] = plot
-                self.data.timePlot[i] = timePlot
-   
-                if ms_len > 0:
-                    self.data.envelope[i] = np.concatenate((self.data.envelope[i][ms_len:], self.data.envelope[i][:ms_len]))
-                    self.data.RMS[i] = np.concatenate((self.data.RMS[i][ms_len:], self.data.RMS[i][:ms_len]))
-
-                    trigger_val = self.TriggerValue[i].value()
-                    emg_counter = self.NumberEMG[i].value()
-                    current_flag = self.FlagEMG[i]
-    
-                    for j in range (self.dataWidth - ms_len, self.dataWidth):
-                        self.data.envelope[i][j] = self.MovingAverage.movingAverage(i, self.data.rectification[i][j])
-                        
-                        if j >= n + 1:
-                            I1 = (self.data.envelope[i][j-n]**2 + self.data.envelope[i][j-n-1]**2)*dt*0.5
-                            I2 = (self.data.envelope[i][j]**2 + self.data.envelope[i][j-1]**2)*dt*0.5
-                            self.data.RMS[i][j] = abs((self.data.RMS[i][j-1]**2 + (I2 - I1)/rms_interval))**0.5
-                        else:
-                            self.data.RMS[i][j] = 0
-                            
-                        if (current_flag == 0) & (self.data.RMS[i][j] >= trigger_val):
-                            current_flag = 1
-                            self.NumberEMG[i].setValue(emg_counter + 1)
-                        
-                        if (current_flag == 1) & (self.data.RMS[i][j] < trigger_val):
-                            current_flag = 0
-            
-            # Plot FFT data
-            i = self.sensorSelectedActionBox.currentIndex()
-            data_segment = self.data.plot[i][-500:]
-            Y = np.abs(fft(data_segment)) / 500
-            self.FFT[i] = 0.5 * self.FFT[i] + 0.5 * Y
-            
-            if not self.pauseAction.isChecked() and (self._fft_frame_counter % 2 == 0):
-                X = np.linspace(0, 1 / dt, 500)
-                half = 250
-                self.pFFT.setData(x=X[2:half], y=self.FFT[i][2:half])
-
-            if not self.pauseAction.isChecked() and hasattr(self, 'pw') and len(self.pw) > 0:
-                left_view_limit = start 
+                # Plot RMS data
+                if  rms_enabled: pw.pi.setData(y=self.data.RMS[i][:end_pos], x=timePlot[:end_pos])
+                else: pw.pi.clear()
                 
-                for widget in self.pw:
-                    for item in list(widget.plotItem.items):
-                        if isinstance(item, pg.InfiniteLine):
-                            if item.value() < left_view_limit:
-                                widget.removeItem(item)
-
-            if (self.dataRecordingAction.isChecked()):
-                DataRec = np.zeros((self.NUM_SENSORS, max_ms_len), dtype=np.float32)
-                DataRecBin = np.zeros((self.NUM_SENSORS, max_ms_len), dtype=np.float32)
-                TimeRec = np.zeros((self.NUM_SENSORS, max_ms_len), dtype=np.float64)
-                flag = 0
+                # Plot histogram
+                self.pb[i].setOpts(height=2*self.data.RMS[i][-1])
                 
-                Data = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-                Time = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float64)
+            self.data.timePlot[i] = timePlot
+
+            if ms_len > 0:
+                # Trigger: RMS crossing the trigger value upwards
+                rising, self.FlagEMG[i] = triggerEdges(self.data.RMS[i][-ms_len:], self.TriggerValue[i].value(), self.FlagEMG[i])
+                if len(rising):
+                    self.NumberEMG[i].setValue(self.NumberEMG[i].value() + len(rising))
+                    for j in rising:
+                        self.streamEvent(i, float(timePlot[self.dataWidth - ms_len + j]), EVENT_TRIGGER, 'T')
                 
-                for i in range( num_sensors ): 
-                    Data[i] = np.roll(self.data.raw[i], -self.l[i])
-                    Time[i] = np.roll(self.data.time[i], -self.l[i])
-                
-                for i in range(self.NUM_SENSORS): 
-                    if self.num[i] == 0: self.num[i] = self.dataWidth
-                    if self.num[i] > self.ms_len[i]: self.num[i] -= self.ms_len[i]                 
-            
-                maxTime = np.max(list(map(max, self.data.timePlot)))
-                for i in range(self.NUM_SENSORS):
-                    if self.num[i] < 0 and self.ms_len[i] > 0: self.num[i] = max(self.num)
-                    if (maxTime > self.data.timePlot[i][self.dataWidth - 1] + 2): self.num[i] = -1
-                        
-                if (max(self.num) > 0.8*self.dataWidth): self.Fl = 0
-                if (max(self.num) < 0.6*self.dataWidth):  self.Fl = 1
-                
-                for i in range(self.NUM_SENSORS):                        
-                    if (self.num[i] >= 0 ) and (self.num[i] <= self.dataWidth - max_ms_len) and self.Fl == 1:
-                        DataRec[i] = self.data.plot[i][self.num[i]: self.num[i] + max_ms_len]   
-                        DataRecBin[i] = Data[i][self.num[i]: self.num[i] + max_ms_len] 
-                        TimeRec[i] = Time[i][self.num[i]: self.num[i] + max_ms_len] 
-                        self.num[i] += max_ms_len 
-                        flag = 1
-                        
-                if flag == 1:
-                    for i in range(max_ms_len):
-                        max_time_at_i = max(TimeRec[sensor_idx][i] for sensor_idx in range(self.NUM_SENSORS))
-                        marker_key_char = '0'
-                        
-                        for marker in self.markers_list[:]:
-                            key_char, marker_time = marker
-                            time_differences = abs(max_time_at_i - marker_time)
-
-                            if time_differences < 0.001:
-                                marker_key_char = key_char
-                                self.markers_list.remove(marker)
-                        
-                        sensors_data = str(round(DataRec[0][i]))
-                        for j in range(1, self.NUM_SENSORS): sensors_data += (" " + str(round(DataRec[j][i])))
-                        sensors_data += " " + marker_key_char + '\n'
-                        self.recordingFile_TXT.write(sensors_data)
-                        
-                        bin_data = struct.pack("H H H H H H H H", int(DataRecBin[0][i]), int(DataRecBin[1][i]), int(DataRecBin[2][i]), int(DataRecBin[3][i]), 
-                                               int(DataRecBin[4][i]), int(DataRecBin[5][i]), int(DataRecBin[6][i]), int(DataRecBin[7][i]))             
-                        self.recordingFile_BIN.write(bin_data)             
+                streamBlocks.append((i, timePlot[-ms_len:], self.data.plot[i][-ms_len:], self.data.envelope[i][-ms_len:], self.data.RMS[i][-ms_len:]))
+        
+        self.publishFrame(streamBlocks)
+        
+        # Plot FFT data
+        i = frame.settings.fftSensor
+        self.FFT[i] += spectrum
+        self.FFT[i] *= 0.5
+        
+        if not self.pauseAction.isChecked() and (self._fft_frame_counter % 2 == 0):
+            X = np.multiply(self.fftAxisUnit, 1 / frame.dt[i], out=self.fftAxis)
+            half = FFT_POINTS // 2
+            self.pFFT.setData(x=X[2:half], y=self.FFT[i][2:half])
+        
+        # Spectrogram columns of the new samples
+        if i != self.spectrogramSensor:
+            self.spectrogram.reset()
+            self.spectrogramSensor = i
+        if frame.msLen[i] > 0:
+            self.spectrogram.push(self.data.plot[i][-frame.msLen[i]:], frame.time[i][-1])
+        if not self.pauseAction.isChecked() and self.frequencyTabs.currentWidget() is self.pwSpec:
+            self.specImage.setImage(self.spectrogram.view(), autoLevels=False)
+            span = self.spectrogram.span
+            self.specImage.setRect(QtCore.QRectF(self.spectrogram.time - span, 0, span, self.fs / 2))
+        
+        # EMG features of all sensors every featureStep seconds
+        now = float(frame.time[:num_sensors, -1].max()) if num_sensors else 0
+        if max_ms_len > 0 and now >= self.featureDue:
+            self.featureDue = now + self.featureStep
+            features = self.features.compute(self.data.plot[:num_sensors])
+            self.featureHistory.append(now, features)
+            if self.recordingFile_FEATURES is not None:
+                self.recordingFile_FEATURES.write(f"{now:.4f}," + ",".join(f"{v:.6g}" for v in features.ravel()) + "\n")
+            if not self.pauseAction.isChecked() and self.frequencyTabs.currentWidget() is self.featuresTab:
+                self.showFeatures()
+
+        self.updateMarkers()
 
-        self.ms_len = [0]*self.NUM_SENSORS
-        
-    # Read data from File   
-    def readFromFile(self): 
-        j = 0        
-        while j < 20:
-            j += 1
+        if (self.dataRecordingAction.isChecked()):
+            DataRec, DataRecBin, TimeRec = (buffer[:, :max_ms_len] for buffer in self.recordBuffers)
+            for buffer in (DataRec, DataRecBin, TimeRec): buffer.fill(0)
+            flag = 0
+            
+            Data = frame.raw
+            Time = frame.time
             
-            if ( self.sliderpos > self.loadDataLen - 2):
-                self.refresh()
-                self.sliderpos = 0
-                self.slider.setValue(0) 
-                        
-            unpeck_b = struct.unpack("H H H H H H H H", self.loadData[self.sliderpos*16:(self.sliderpos+1)*16])
             for i in range(self.NUM_SENSORS): 
-                if ( self.l[i] == self.dataWidth):
-                    self.l[i] = 0
-                self.data.raw[i][self.l[i]] = unpeck_b[i]
-                self.data.time[i][self.l[i]] = self.data.time[i][self.l[i]-1] + 1/self.fs
-                self.l[i] = self.l[i] + 1
-                if (self.ms_len[i] < self.dataWidth): self.ms_len[i] += 1 
+                if self.num[i] == 0: self.num[i] = self.dataWidth
+                if self.num[i] > frame.msLen[i]: self.num[i] -= frame.msLen[i]                 
+        
+            maxTime = np.max(list(map(max, self.data.timePlot)))
+            for i in range(self.NUM_SENSORS):
+                if self.num[i] < 0 and frame.msLen[i] > 0: self.num[i] = max(self.num)
+                if (maxTime > self.data.timePlot[i][self.dataWidth - 1] + 2): self.num[i] = -1
+                    
+            if (max(self.num) > 0.8*self.dataWidth): self.Fl = 0
+            if (max(self.num) < 0.6*self.dataWidth):  self.Fl = 1
             
-            if ((self.slider.value() != int(self.sliderpos/self.loadDataLen*100))):
-                self.sliderpos += int(self.slider.value()*self.loadDataLen/100 - self.sliderpos)
-                temp = self.l
-                temp_sliderpos = self.sliderpos
-                self.refresh()
-                self.l = temp
-                self.sliderpos = temp_sliderpos
-                for i in range(self.NUM_SENSORS): self.data.time[i][self.l[i]-1] = self.sliderpos*(1/self.fs)
-                     
-            self.sliderpos += 1
-            self.slider.setValue(int(self.sliderpos/self.loadDataLen*100))
+            for i in range(self.NUM_SENSORS):                        
+                if (self.num[i] >= 0 ) and (self.num[i] <= self.dataWidth - max_ms_len) and self.Fl == 1:
+                    DataRec[i] = self.data.plot[i][self.num[i]: self.num[i] + max_ms_len]   
+                    DataRecBin[i] = Data[i][self.num[i]: self.num[i] + max_ms_len] 
+                    TimeRec[i] = Time[i][self.num[i]: self.num[i] + max_ms_len] 
+                    self.num[i] += max_ms_len 
+                    flag = 1
+                    
+            if flag == 1:
+                marker_keys = ['0'] * max_ms_len
+                marker_codes = np.zeros(max_ms_len, dtype=np.uint8)
+                row_time = TimeRec.max(axis=0)
+                for row, key_char, marker_time in self.markers.take(row_time):
+                    marker_keys[row] = key_char
+                    marker_codes[row] = ord(key_char)
+                    self.recordingFile_EVENTS.write(f"{self.recordedSamples + row},{marker_time:.4f},{key_char}\n")
+                self.recordedSamples += max_ms_len
+                
+                for i in range(max_ms_len):
+                    sensors_data = str(round(DataRec[0][i]))
+                    for j in range(1, self.NUM_SENSORS): sensors_data += (" " + str(round(DataRec[j][i])))
+                    sensors_data += " " + marker_keys[i] + '\n'
+                    self.recordingFile_TXT.write(sensors_data)
+                    
+                
+                # One record of NUM_SENSORS uint16 values per sample
+                self.recordingFile_BIN.write(DataRecBin.T.astype('<u2').tobytes())
+                # Copies, the recorders keep the rows until their chunk is written
+                columns = {'row_time': row_time, 'time': TimeRec.copy(), 'raw': DataRecBin.astype(np.uint16),
+                           'filtered': DataRec.copy(), 'marker': marker_codes}
+                for recorder in self.recorders: recorder.append(columns)
+        
+    # Read data from File: the samples due since the previous poll, of all
+    # sensors as one block, so playback runs in realtime however often the poll fires
+    def readFromFile(self): 
+        if self.loadDataLen < 2: return
+        if self.sliderpos > self.loadDataLen - 2:
+            self.refresh() # Playback starts again from the beginning
+        now = time.perf_counter()
+        if self.playbackClock is None: self.playbackClock = now - self.pollDelay
+        maxCount = int(self.PLAYBACK_MAX_POLL * self.fs)
+        count = min(int((now - self.playbackClock) * self.fs), maxCount, self.loadDataLen - 1 - self.sliderpos)
+        if count <= 0: return
+        self.playbackClock += count / self.fs
+        # After a long stall playback goes on from now instead of catching up
+        if now - self.playbackClock > self.PLAYBACK_MAX_POLL: self.playbackClock = now
+        block = self.loadRecords(self.sliderpos, self.sliderpos + count)
+        times = np.arange(self.sliderpos + 1, self.sliderpos + count + 1) / self.fs
+        
+        # All sensors are at the same ring position during playback
+        start = self.l[0] % self.historyWidth
+        rows = (start + np.arange(count)) % self.historyWidth
+        self.data.raw[:, rows] = block
+        self.data.time[:, rows] = times
+        self.l = [int(rows[-1]) + 1] * self.NUM_SENSORS
+        self.ms_len = [min(ms_len + count, self.dataWidth) for ms_len in self.ms_len]
+        self.sliderpos += count
+        self.showPlaybackPosition()
+        
+        for i in range(self.NUM_SENSORS):
+            self.publishSamples(i, block[i], times)
+    
+    # Event for the stream clients, sent with the next frame. Events are kept
+    # only while frames are streamed (live or playback), at most MAX_STREAM_EVENTS.
+    def streamEvent(self, sensor, t, kind, code):
+        if self.streamServer is None and self.lslOutlet is None: return
+        if not ((self.PlaybackAction.isChecked() and self.loadFileName != '') or self.liveFromSerialAction.isChecked()): return
+        self.streamEvents.append((sensor, t, kind, code))
+        if len(self.streamEvents) > self.MAX_STREAM_EVENTS: del self.streamEvents[0]
+    
+    # Send the new processed samples and events of this frame to stream clients
+    def publishFrame(self, blocks):
+        events = self.streamEvents
+        self.streamEvents = []
+        if self.streamServer is not None:
+            self.streamServer.publish(time.perf_counter() - self.TIMER, blocks, events)
+        if self.lslOutlet is not None:
+            clockOffset = None
+            if self.TIMER != 0: clockOffset = self.lslOutlet.localClock() - time.perf_counter() + self.TIMER
+            self.lslOutlet.publish(blocks, events, clockOffset)
+    
+    # New decoded samples of sensor i, passed to the history pyramid and to the shared stream
+    def publishSamples(self, i, values, times):
+        if self.pyramid is not None:
+            self.pyramid.append(i, values, times)
+        if self.sharedStream is not None:
+            self.sharedStream.write(i, values, times)
 
     # Read data from serial                  
     def readFromSerial(self): 
-        msg = self.serialMonitor.serialRead() 
-        TIME = time.perf_counter()
+        for d, monitor in enumerate(self.serialMonitors):
+            if monitor.connect:
+                self.readFromSource(d, monitor)
+    
+    # Parse data received from dongle d. Sensor numbers of the dongle are
+    # shifted into the global sensor numbering.
+    def readFromSource(self, d, monitor): 
+        msg = monitor.serialRead() 
+        TIME = monitor.readTime if len(msg) > 0 else time.perf_counter()
+        offset = d * self.SENSORS_PER_DONGLE
         
         # Parsing data from serial buffer
         if (len(msg) > 7):
-            if (len(self.msg_end) > 1):
-                msg =  self.msg_end + msg
-                self.msg_end = bytearray([0])
+            if (len(self.msg_end[d]) > 1):
+                msg =  self.msg_end[d] + msg
+                self.msg_end[d] = bytearray([0])
             
             if (len(msg) % (246) != 0):
                 if(len(msg)>250):
-                    for i in range(len(msg) - 250, len(msg)-1, 1):
-                       if (msg[i] == 0xFF) and (msg[i+1] == 0xFF):
-                           self.msg_end = msg[i:]
-                           msg = msg[0:i]
-                           break
+                    i = findSync(msg, len(msg) - 250, len(msg) - 1)
+                    if i >= 0:
+                        self.msg_end[d] = msg[i:]
+                        msg = msg[0:i]
             
             if (len(msg) % 246 == 0):
                 burst_counters_0 = [0] * self.NUM_SENSORS
                 burst_counters = [0] * self.NUM_SENSORS
                 for burst_i in range(0, len(msg), 246):
                     s_num = int(msg[burst_i+2])-1
-                    if 0 <= s_num < self.NUM_SENSORS:
-                        burst_counters[s_num] += 1
+                    if 0 <= s_num < self.SENSORS_PER_DONGLE:
+                        burst_counters[s_num + offset] += 1
                 
                 burst_counters_0 = burst_counters        
                 for msg_i in range(0, len(msg), 246):
                     sensorNum = int(msg[msg_i+2])-1 
-                    if not 0 <= sensorNum <= 7: break
+                    if not 0 <= sensorNum < self.SENSORS_PER_DONGLE: break
+                    sensorNum += offset
                     MSG_NUM = int(msg[msg_i+3] | msg[msg_i+4] << 8 | msg[msg_i+5] << 16)
                     
                     if self.MSG_NUM_0[sensorNum] == 0: 
@@ -983,15 +1532,15 @@ class GUI(QtWidgets.QMainWindow):
                         self.sensor_uptime[sensorNum] = self.v_time[sensorNum]
 
                     self.VDD[sensorNum] = round(int(msg[msg_i+6] | msg[msg_i+7] << 8)/16384*0.6*6*2, 2)
-                    string = "BATTERY: " + str(self.VDD[int(msg[msg_i+2])-1]) + " V"
+                    string = "BATTERY: " + str(self.VDD[sensorNum]) + " V"
                     while len(string) < 13:
                         string += "0"
-                    self.ChargeLabel[int(msg[msg_i+2])-1].setText(string)
+                    self.ChargeLabel[sensorNum].setText(string)
                    
-                    if (self.VDD[int(msg[msg_i+2])-1]) > 2.5:
-                        self.ChargeLabel[int(msg[msg_i+2])-1].setStyleSheet("color: green; background-color: transparent; font-weight: bold;")
+                    if (self.VDD[sensorNum]) > 2.5:
+                        self.ChargeLabel[sensorNum].setStyleSheet("color: green; background-color: transparent; font-weight: bold;")
                     else:
-                        self.ChargeLabel[int(msg[msg_i+2])-1].setStyleSheet("color: red; background-color: transparent; font-weight: bold;")
+                        self.ChargeLabel[sensorNum].setStyleSheet("color: red; background-color: transparent; font-weight: bold;")
 
                     if TIME > self.TIMER:                        
                         time_pc = TIME - self.TIMER
@@ -1009,71 +1558,74 @@ class GUI(QtWidgets.QMainWindow):
                             if self.dt[sensorNum] < 0.000985:  self.dt[sensorNum] = 0.000985
 
                         idx = self.l[sensorNum]
-                        width = self.dataWidth
+                        width = self.historyWidth
                         dt_val = self.dt[sensorNum]
                         
                         msg_chunk = msg[msg_i+8 : msg_i+246]
                         incoming_data = np.frombuffer(msg_chunk, dtype=np.uint16)
                         num_elements = len(incoming_data)
 
+                        t_prev = self.data.time[sensorNum][idx - 1] if idx > 0 else self.data.time[sensorNum][width - 1]
+                        t_prev += self.timeCorrection[sensorNum]
+                        incoming_time = t_prev + np.arange(1, num_elements + 1) * dt_val
+                        if self.timeCorrection[sensorNum] != 0:
+                            # Stored and published samples keep their times, the step is announced to the stream clients
+                            self.streamEvent(sensorNum, float(incoming_time[0]), EVENT_CLOCK, 'C')
+                            self.timeCorrection[sensorNum] = 0.0
+                        
                         if idx + num_elements > width:
                             space_left = width - idx
                             
                             self.data.raw[sensorNum][idx:width] = incoming_data[:space_left]
                             
-                            if self.dataRecordingAction.isChecked():
-                                self.recordingFile_BIN.close()
-                                self.recordingFile_TXT.close()
-                                self.recordingFile_BIN = open(self.recordingFileName_BIN, 'ab')
-                                self.recordingFile_TXT = open(self.recordingFileName_TXT, "a")
-                            
                             rem = num_elements - space_left
                             self.data.raw[sensorNum][0:rem] = incoming_data[space_left:]
                             
-                            t_prev = self.data.time[sensorNum][idx - 1] if idx > 0 else self.data.time[sensorNum][width - 1]
-                            self.data.time[sensorNum][idx:width] = t_prev + np.arange(1, space_left + 1) * dt_val
-                            
-                            t_prev_rem = self.data.time[sensorNum][width - 1]
-                            self.data.time[sensorNum][0:rem] = t_prev_rem + np.arange(1, rem + 1) * dt_val
+                            self.data.time[sensorNum][idx:width] = incoming_time[:space_left]
+                            self.data.time[sensorNum][0:rem] = incoming_time[space_left:]
                             
                             idx = rem
                         else:
                             end_idx = idx + num_elements
                             self.data.raw[sensorNum][idx:end_idx] = incoming_data
-                            
-                            t_prev = self.data.time[sensorNum][idx - 1] if idx > 0 else self.data.time[sensorNum][width - 1]
-                            self.data.time[sensorNum][idx:end_idx] = t_prev + np.arange(1, num_elements + 1) * dt_val
+                            self.data.time[sensorNum][idx:end_idx] = incoming_time
                             
                             idx = end_idx
+                        
+                        self.publishSamples(sensorNum, incoming_data, incoming_time)
 
                         self.l[sensorNum] = idx
-                        self.ms_len[sensorNum] = min(width, self.ms_len[sensorNum] + num_elements)
+                        self.ms_len[sensorNum] = min(self.dataWidth, self.ms_len[sensorNum] + num_elements)
 
                         accuracy = 0
                         if self.v_time[sensorNum] - self.sensor_uptime[sensorNum] < 5.0: accuracy = 0.1
                         elif self.v_time[sensorNum] - self.sensor_uptime[sensorNum] < 10.0: accuracy = 0.05
                         elif self.v_time[sensorNum] - self.sensor_uptime[sensorNum] < 15.0: accuracy = 0.002
                         
+                        # Times of the next samples are corrected towards the PLL time
                         timeDifference = self.v_time[sensorNum] - self.data.time[sensorNum][self.l[sensorNum]-1]
                         if self.v_time[sensorNum] - self.sensor_uptime[sensorNum] < 15:
-                            if abs (timeDifference) > accuracy: self.data.time[sensorNum][:] += timeDifference
+                            if abs (timeDifference) > accuracy: self.timeCorrection[sensorNum] = timeDifference
 
     def setSensorsNumber(self, num):
         
         self.cfg.set('APPLICATION', 'SensorsNumber', str(int(num)))
-        with open(os.path.join(self.BASE_DIR, "config.ini"), "w", encoding="utf-8") as f:
-            self.cfg.write(f)
         
         if self.liveFromSerialAction.isChecked():
             self.refresh()
         
         for i in range(self.NUM_SENSORS):
             self.row[i].hide()
-            self.pw[i].getAxis('bottom').setStyle(showValues=False)
-            self.pw[i].showLabel('bottom', 0)
-            self.pw[i].getAxis('bottom').setStyle(showValues=False)
         
-        self.pw[int(num)-1].getAxis('bottom').setStyle(showValues=True)
+        if self.layoutMode == 'stacked':
+            self.canvas.showSensors(int(num))
+        else:
+            for i in range(self.NUM_SENSORS):
+                self.pw[i].getAxis('bottom').setStyle(showValues=False)
+                self.pw[i].showLabel('bottom', 0)
+                self.pw[i].getAxis('bottom').setStyle(showValues=False)
+            
+            self.pw[int(num)-1].getAxis('bottom').setStyle(showValues=True)
         
         self.pbar.clear()
         for i in range(int(num)):  
@@ -1082,8 +1634,8 @@ class GUI(QtWidgets.QMainWindow):
    
     # Exit event
     def closeEvent(self, event):
-            with open(os.path.join(self.BASE_DIR, "config.ini"), "w", encoding="utf-8") as f:
-                self.cfg.write(f)
+            self.storeSensorTiming()
+            self.cfg.save()
                 
             if hasattr(self, 'is_recording') and self.is_recording:
                 self.is_recording = False
@@ -1101,133 +1653,312 @@ class GUI(QtWidgets.QMainWindow):
                         self.recordingFile_BIN.close()
                     except Exception:
                         pass
+                        
+                if self.recordingFile_EVENTS is not None:
+                    try:
+                        self.recordingFile_EVENTS.close()
+                    except Exception:
+                        pass
+                        
+                if self.recordingFile_FEATURES is not None:
+                    try:
+                        self.recordingFile_FEATURES.close()
+                    except Exception:
+                        pass
+                        
+                self.stopColumnarRecording()
     
-            self.mainrun.running = False
+            self.frameScheduler.stop()
             self.serialPoll.stop()
-            self.serialMonitor.serialDisconnection()
+            self.portWatcher.stop()
+            if self.pyramid is not None: self.pyramid.close()
+            if self.sharedStream is not None: self.sharedStream.close()
+            if self.streamServer is not None: self.streamServer.close()
+            if self.dspWorker is not None: self.dspWorker.close()
+            self.serialDisconnection()
             event.accept()
 
+# Application settings. Changed values mark the settings dirty and are written
+# to disk on a timer, through a temporary file and an atomic rename.
+class Settings(ConfigParser):
+    def __init__(self, path, saveDelay=2.0):
+        super().__init__()
+        self.optionxform = str
+        self.path = path
+        self.saveDelay = saveDelay # Maximum delay between a change and the write, s
+        self.dirty = False
+        self.timer = None
+        self.read(path)
+    
+    def set(self, section, option, value=None):
+        if not self.has_section(section):
+            self.add_section(section)
+        elif self.get(section, option, raw=True, fallback=None) == value:
+            return
+        super().set(section, option, value)
+        self.dirty = True
+        self.scheduleSave()
+        
+    def scheduleSave(self):
+        if self.timer is None:
+            self.timer = QtCore.QTimer()
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self.save)
+        if not self.timer.isActive():
+            self.timer.start(int(self.saveDelay * 1000))
+    
+    def save(self):
+        if self.timer is not None: self.timer.stop()
+        if not self.dirty: return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                self.write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(">>> Settings were not saved:", e)
+
+# Signal buffers. raw and time are ring buffers holding the whole history,
+# the other arrays hold the processed plot window.
 class Data:
-    def __init__(self, NUM_SENSORS, dataWidth):
-        self.dataWidth = dataWidth
+    def __init__(self, NUM_SENSORS, dataWidth, historyWidth=None):
         self.NUM_SENSORS = NUM_SENSORS
-        self.raw = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32) 
-        self.plot = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-        self.envelope = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-        self.RMS = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-        self.rectification = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-        self.time = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32) 
-        self.timePlot = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-    def refresh(self, dataWidth):
+        self.allocate(dataWidth, historyWidth)
+    
+    # Reset the buffers. They are zeroed in place and only reallocated when
+    # the widths change.
+    def refresh(self, dataWidth, historyWidth=None):
+        if historyWidth is None: historyWidth = dataWidth
+        if dataWidth != self.dataWidth or historyWidth != self.historyWidth:
+            self.allocate(dataWidth, historyWidth)
+            return
+        for buffer in (self.raw, self.plot, self.envelope, self.RMS, self.rectification, self.time, self.timePlot):
+            buffer.fill(0)
+    
+    def allocate(self, dataWidth, historyWidth=None):
         self.dataWidth = dataWidth
-        self.raw = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32) 
-        self.plot = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-        self.envelope = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32) 
-        self.RMS = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-        self.rectification = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=np.float32)
-        self.time = np.zeros((self.NUM_SENSORS, self.dataWidth)) 
-        self.timePlot = np.zeros((self.NUM_SENSORS, self.dataWidth))
-
-# Butterworth bandpass filter
-class bandpass_filter:
-    def __init__(self, lowcut, highcut, fs):
-        self.order = 4
-        self.fs = fs
-        self.lowcut_hz = lowcut
-        self.highcut_hz = highcut
-        nyq_low = lowcut / (0.5 * fs)
-        nyq_high = highcut / (0.5 * fs)
-        self.b, self.a = butter(self.order, [nyq_low, nyq_high], btype='bandpass')
-        
-    def apply(self, data, lowcut, highcut, fs):
-        if self.lowcut_hz != lowcut or self.highcut_hz != highcut or self.fs != fs:
-            self.fs = fs
-            self.lowcut_hz = lowcut
-            self.highcut_hz = highcut
-            nyq_low = lowcut / (0.5 * fs)
-            nyq_high = highcut / (0.5 * fs)
-            self.b, self.a = butter(self.order, [nyq_low, nyq_high], btype='bandpass')
-        return lfilter(self.b, self.a, data)
-
-# Butterworth bandstop filter
-class bandstop_filter_50Hz:
-    def __init__(self, fs):
-        self.order = 4
-        self.fs = fs
-        self.b = [None] * 4
-        self.a = [None] * 4
-        self._compute_coefficients()
-            
-    def _compute_coefficients(self):
-        nyq = 0.5 * self.fs
-        for i in range(4):
-            lowcut = (48 + 50 * i) / nyq
-            highcut = (52 + 50 * i) / nyq
-            self.b[i], self.a[i] = butter(self.order, [lowcut, highcut], btype='bandstop')
-
-    def apply(self, data, fs):
-        if self.fs != fs:
-            self.fs = fs
-            self._compute_coefficients()
-        for i in range(4):
-            data = lfilter(self.b[i], self.a[i], data)
-        return data
-
-# Butterworth bandstop filter
-class bandstop_filter_60Hz:
-    def __init__(self, fs):
-        self.order = 4
-        self.fs = fs
-        self.b = [None] * 4
-        self.a = [None] * 4
-        self._compute_coefficients()
-            
-    def _compute_coefficients(self):
-        nyq = 0.5 * self.fs
-        for i in range(4):
-            lowcut = (58 + 60 * i) / nyq
-            highcut = (62 + 60 * i) / nyq
-            self.b[i], self.a[i] = butter(self.order, [lowcut, highcut], btype='bandstop')
-
-    def apply(self, data, fs):
-        if self.fs != fs:
-            self.fs = fs
-            self._compute_coefficients()
-        for i in range(4):
-            data = lfilter(self.b[i], self.a[i], data)
-        return data
-
-# Butterworth bandpass filter
-class HP_filter:
-    def __init__ (self, lowcut, fs):
-        self.order = 4
-        self.fs = fs
-        self.lowcut_hz = lowcut
-        self.nyq_lowcut = lowcut / (0.5 * fs)
-        self.b, self.a = butter(self.order, self.nyq_lowcut, btype='highpass')
-        
-    def apply(self, data, lowcut, fs):
-        if self.lowcut_hz != lowcut or self.fs != fs:
-            self.fs = fs
-            self.lowcut_hz = lowcut
-            self.nyq_lowcut = lowcut / (0.5 * fs)
-            self.b, self.a = butter(self.order, self.nyq_lowcut, btype='highpass')
-        return lfilter(self.b, self.a, data)
-
-# Moving average class
-class MovingAverage:
-    # Custom constructor
-    def __init__(self, fs):
-        self.MA = np.zeros((8, 3)) 
-        self.MA_alpha = 0.95
-        self.fs = fs
+        self.historyWidth = historyWidth if historyWidth is not None else dataWidth
+        self.raw = np.zeros((self.NUM_SENSORS, self.historyWidth), dtype=SIGNAL_DTYPE) # ADC counts
+        self.plot = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=SIGNAL_DTYPE)
+        self.envelope = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=SIGNAL_DTYPE) 
+        self.RMS = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=SIGNAL_DTYPE)
+        self.rectification = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=SIGNAL_DTYPE)
+        self.time = np.zeros((self.NUM_SENSORS, self.historyWidth), dtype=TIME_DTYPE) 
+        self.timePlot = np.zeros((self.NUM_SENSORS, self.dataWidth), dtype=TIME_DTYPE)
     
-    def movingAverage(self, i, data):
-        self.MA[i][0] = (1 - self.MA_alpha)*data + self.MA_alpha*self.MA[i][0];
-        self.MA[i][1] = (1 - self.MA_alpha)*(self.MA[i][0]) + self.MA_alpha*self.MA[i][1];
-        self.MA[i][2] = (1 - self.MA_alpha)*(self.MA[i][1]) + self.MA_alpha*self.MA[i][2];
-        return self.MA[i][2]*2
-
+    # Last n samples of ring buffer row i written up to position l, oldest first.
+    # Written into out when it is given.
+    def latest(self, buffer, i, l, n, out=None):
+        if out is None:
+            if n <= l:
+                return buffer[i][l - n:l].copy()
+            return np.concatenate((buffer[i][self.historyWidth - (n - l):], buffer[i][:l]))
+        if n <= l:
+            np.copyto(out, buffer[i][l - n:l])
+        else:
+            np.copyto(out[:n - l], buffer[i][self.historyWidth - (n - l):])
+            np.copyto(out[n - l:], buffer[i][:l])
+        return out
+    
+    # Memory used by the buffers in bytes
+    @staticmethod
+    def footprint(NUM_SENSORS, dataWidth, historyWidth):
+        return NUM_SENSORS * (historyWidth * (4 + 8) + dataWidth * (4 * 4 + 8))
+
+# One level of the history pyramid: min/max/mean buckets of a fixed count of
+# samples, kept in a ring buffer per sensor and optionally spilled to disk
+class PyramidLevel:
+    dtype = np.dtype([('time', '<f8'), ('min', '<f4'), ('max', '<f4'), ('mean', '<f4')])
+    
+    def __init__(self, NUM_SENSORS, factor, ratio, capacity, spillDir=None):
+        self.factor = factor # Samples per bucket
+        self.ratio = ratio # Buckets of the previous level per bucket
+        self.capacity = capacity
+        self.buckets = np.zeros((NUM_SENSORS, capacity), dtype=self.dtype)
+        self.count = [0]*NUM_SENSORS # Count of buckets written since reset
+        self.pending = [np.zeros(0, dtype=self.dtype) for i in range(NUM_SENSORS)]
+        self.spill = None
+        if spillDir is not None:
+            self.spillNames = [os.path.join(spillDir, f"level{factor}_sensor{i+1}.bin") for i in range(NUM_SENSORS)]
+            self.spill = [open(name, "w+b", buffering=0) for name in self.spillNames]
+    
+    # Merge records of the previous level into buckets, returns the completed buckets
+    def append(self, i, records):
+        if len(self.pending[i]):
+            records = np.concatenate((self.pending[i], records))
+        n = len(records) // self.ratio * self.ratio
+        self.pending[i] = records[n:].copy()
+        if n == 0:
+            return records[:0]
+        
+        blocks = records[:n].reshape(-1, self.ratio)
+        out = np.empty(len(blocks), dtype=self.dtype)
+        out['time'] = blocks['time'][:, 0]
+        out['min'] = blocks['min'].min(axis=1)
+        out['max'] = blocks['max'].max(axis=1)
+        out['mean'] = blocks['mean'].mean(axis=1)
+        
+        index = (self.count[i] + np.arange(len(out))) % self.capacity
+        self.buckets[i][index] = out
+        self.count[i] += len(out)
+        if self.spill is not None:
+            self.spill[i].write(out.tobytes())
+        return out
+    
+    # All stored buckets of sensor i, oldest first
+    def read(self, i):
+        if self.spill is not None and self.count[i] > 0:
+            return np.memmap(self.spillNames[i], dtype=self.dtype, mode='r', shape=(self.count[i],))
+        count = self.count[i]
+        if count <= self.capacity:
+            return self.buckets[i][:count]
+        head = count % self.capacity
+        return np.concatenate((self.buckets[i][head:], self.buckets[i][:head]))
+    
+    def reset(self):
+        self.count = [0]*len(self.count)
+        self.pending = [np.zeros(0, dtype=self.dtype) for i in range(len(self.count))]
+        if self.spill is not None:
+            for f in self.spill:
+                f.seek(0)
+                f.truncate()
+    
+    def close(self):
+        if self.spill is not None:
+            for f in self.spill: f.close()
+            self.spill = None
+
+# Multi-resolution history of the raw signal in mkV. Every level is updated
+# incrementally from the completed buckets of the previous one, so the cost of
+# an update is proportional to the count of new samples.
+class HistoryPyramid:
+    def __init__(self, NUM_SENSORS, capacity, factors=(10, 100, 1000), spillDir=None):
+        self.spillDir = spillDir
+        self.levels = []
+        previous = 1
+        for factor in factors:
+            self.levels.append(PyramidLevel(NUM_SENSORS, factor, factor // previous, capacity, spillDir))
+            previous = factor
+    
+    # Append raw sensor values (ADC counts) with their timestamps
+    def append(self, i, values, times):
+        records = np.empty(len(values), dtype=PyramidLevel.dtype)
+        records['time'] = times
+        records['min'] = (np.asarray(values, dtype=np.float32) - 8192) * 0.30517578125
+        records['max'] = records['min']
+        records['mean'] = records['min']
+        for level in self.levels:
+            records = level.append(i, records)
+            if len(records) == 0: break
+    
+    # Interleaved min/max points between t0 and t1 from the finest level that
+    # gives no more than maxPoints points
+    def query(self, i, t0, t1, maxPoints, fs):
+        for level in self.levels:
+            if (t1 - t0) * fs / level.factor <= maxPoints / 2: break
+        buckets = level.read(i)
+        if len(buckets) == 0:
+            return None, None
+        lo = max(np.searchsorted(buckets['time'], t0) - 1, 0)
+        hi = np.searchsorted(buckets['time'], t1) + 1
+        buckets = buckets[lo:hi]
+        x = np.repeat(buckets['time'], 2)
+        y = np.empty(2*len(buckets), dtype=np.float32)
+        y[0::2] = buckets['min']
+        y[1::2] = buckets['max']
+        return x, y
+    
+    def reset(self):
+        for level in self.levels: level.reset()
+    
+    def close(self):
+        for level in self.levels: level.close()
+        if self.spillDir is not None:
+            shutil.rmtree(self.spillDir, ignore_errors=True)
+    
+    # Memory used by the in-memory levels in bytes
+    @staticmethod
+    def footprint(NUM_SENSORS, capacity, levels=3):
+        return levels * NUM_SENSORS * capacity * PyramidLevel.dtype.itemsize
+
+# Marker store. Marker times and keys are kept sorted in arrays, so the markers
+# of a time range are found by binary search.
+class MarkerStore:
+    def __init__(self, capacity=1024):
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.keys = np.zeros(capacity, dtype='U1')
+        self.count = 0
+        self.cursor = 0 # First marker that was not written to the recording
+    
+    def add(self, key, t):
+        if self.count == len(self.times):
+            self.times = np.concatenate((self.times, np.zeros_like(self.times)))
+            self.keys = np.concatenate((self.keys, np.zeros_like(self.keys)))
+        pos = np.searchsorted(self.times[:self.count], t, side='right')
+        self.times[pos + 1:self.count + 1] = self.times[pos:self.count]
+        self.keys[pos + 1:self.count + 1] = self.keys[pos:self.count]
+        self.times[pos] = t
+        self.keys[pos] = key
+        self.count += 1
+        if pos < self.cursor: self.cursor += 1
+    
+    # Index range of markers between t0 and t1
+    def range(self, t0, t1):
+        times = self.times[:self.count]
+        return int(np.searchsorted(times, t0)), int(np.searchsorted(times, t1, side='right'))
+    
+    # Assign the markers not yet recorded up to the end of a block of recorded rows
+    # to the nearest row, returns (row, key, time) of markers within tolerance
+    def take(self, rowTimes, tolerance=0.001):
+        end = int(np.searchsorted(self.times[:self.count], rowTimes[-1] + tolerance))
+        events = []
+        for m in range(self.cursor, end):
+            row = min(int(np.searchsorted(rowTimes, self.times[m])), len(rowTimes) - 1)
+            if row > 0 and self.times[m] - rowTimes[row - 1] < rowTimes[row] - self.times[m]: row -= 1
+            if abs(rowTimes[row] - self.times[m]) < tolerance:
+                events.append((row, str(self.keys[m]), float(self.times[m])))
+        self.cursor = max(self.cursor, end)
+        return events
+
+# Markers of one plot, drawn as line pairs by a single curve item with a
+# limited pool of labels
+class MarkerOverlay:
+    def __init__(self, plotWidget, maxLabels=16):
+        self.plotWidget = plotWidget
+        self.maxLabels = maxLabels
+        self.curve = pg.PlotDataItem(pen=pg.mkPen(color='w', width=1, style=QtCore.Qt.DashLine), connect='pairs', skipFiniteCheck=True)
+        plotWidget.addItem(self.curve, ignoreBounds=True)
+        self.labels = []
+        self.x = np.zeros(0) # Two points of every marker line
+        # Lines span the visible y range with a margin, whatever the lanes of the plot
+        plotWidget.getViewBox().sigYRangeChanged.connect(self.updateSpan)
+    
+    def span(self, yRange):
+        low, high = yRange
+        return np.array([low - (high - low), high + (high - low)])
+    
+    def updateSpan(self, viewBox, yRange):
+        if len(self.x): self.curve.setData(x=self.x, y=np.tile(self.span(yRange), len(self.x) // 2))
+    
+    def setMarkers(self, times, keys, labelY):
+        self.x = np.repeat(times, 2)
+        self.curve.setData(x=self.x, y=np.tile(self.span(self.plotWidget.getViewBox().viewRange()[1]), len(times)))
+        
+        shown = min(len(times), self.maxLabels)
+        while len(self.labels) < shown:
+            label = pg.TextItem(color='w', anchor=(0, 0))
+            self.plotWidget.addItem(label, ignoreBounds=True)
+            self.labels.append(label)
+        for k, label in enumerate(self.labels):
+            if k < shown:
+                label.setText(f"Ex {keys[len(times) - shown + k]}")
+                label.setPos(times[len(times) - shown + k], labelY)
+                label.show()
+            else:
+                label.hide()
 
 class TimeAxisItem(pg.AxisItem):
     def __init__(self, *args, **kwargs):
@@ -1361,7 +2092,7 @@ class LiveYAxisItem(pg.AxisItem):
 class CustomPlotWidget(pg.PlotWidget):
     mouse_moved_signal = pyqtSignal(int, float, str)
     
-    def __init__(self, parent=None, sensors_spinbox=None, **kwargs):
+    def __init__(self, parent=None, sensors_spinbox=None, renderer='raster', **kwargs):
         sensors_spinbox = kwargs.pop('sensors_spinbox', sensors_spinbox)
         
         if 'axisItems' not in kwargs:
@@ -1391,12 +2122,27 @@ class CustomPlotWidget(pg.PlotWidget):
         self.pe.setClipToView(True)
         self.pi.setClipToView(True)
         
+        for curve in (self.p, self.pe, self.pi):
+            curve.setDownsampling(auto=True, method='peak')
+        
         self.proxy = pg.SignalProxy(self.scene().sigMouseMoved, rateLimit=10, slot=self.onMouseMove)
-            
-        self.setViewportUpdateMode(QtWidgets.QGraphicsView.MinimalViewportUpdate)
-       
-        self.setCacheMode(QtWidgets.QGraphicsView.CacheBackground)
-        self.plotItem.vb.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+        self.setRenderer(renderer)
+    
+    # 'raster': QPainter on the CPU with cached background and minimal updates.
+    # 'opengl': QOpenGLWidget viewport, which is always redrawn as a whole, so
+    # item caches only cost memory there.
+    def setRenderer(self, renderer):
+        self.renderer = renderer
+        if renderer == 'opengl':
+            self.useOpenGL(True)
+            self.setViewportUpdateMode(QtWidgets.QGraphicsView.FullViewportUpdate)
+            self.setCacheMode(QtWidgets.QGraphicsView.CacheNone)
+            self.plotItem.vb.setCacheMode(QtWidgets.QGraphicsItem.NoCache)
+        else:
+            self.useOpenGL(False)
+            self.setViewportUpdateMode(QtWidgets.QGraphicsView.MinimalViewportUpdate)
+            self.setCacheMode(QtWidgets.QGraphicsView.CacheBackground)
+            self.plotItem.vb.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
 
     def onMouseMove(self, evt):
         
@@ -1442,7 +2188,7 @@ class CustomPlotWidget(pg.PlotWidget):
                     
                     self.getAxis('left').setMouseValue(mp.y())
                     
-                    for i in range(0, 8):
+                    for i in range(len(main_win.pw)):
                         last_widget = main_win.pw[i]
                         last_widget.getAxis('bottom').setMouseValue(mp.x())
                     
@@ -1452,6 +2198,83 @@ class CustomPlotWidget(pg.PlotWidget):
                         main_win.h_lines[idx].hide()
                     widget.getAxis('left').setMouseValue(None)
 
+# Curves of one sensor in the stacked plot, shifted to the lane of the sensor
+class PlotLane:
+    def __init__(self, plotWidget, offset):
+        self.offset = offset # Zero line of the sensor in the plot, mkV
+        self.p = plotWidget.plot(skipFiniteCheck=True)
+        self.pe = plotWidget.plot(skipFiniteCheck=True)
+        self.pi = plotWidget.plot(skipFiniteCheck=True)
+        
+        self.p.setPen(color=(100, 255, 255), width=1)
+        self.pe.setPen(color=(255, 0, 0), width=1)
+        self.pi.setPen(color=(0, 255, 0), width=1)
+        
+        for curve in (self.p, self.pe, self.pi):
+            curve.setPos(0, offset)
+            curve.setClipToView(True)
+            curve.setDownsampling(auto=True, method='peak')
+    
+    def setVisible(self, visible):
+        for curve in (self.p, self.pe, self.pi):
+            curve.setVisible(visible)
+
+# All sensors in one plot with a shared time axis, sensor i drawn around
+# -i*laneHeight. One scene, one set of axes and one mouse handler for all sensors.
+class StackedPlotWidget(pg.PlotWidget):
+    laneHeight = 4000 # mkV between the zero lines of neighbouring sensors
+    
+    def __init__(self, NUM_SENSORS, parent=None, renderer='raster'):
+        super().__init__(parent, axisItems={'bottom': TimeAxisItem(orientation='bottom')})
+        self.plotItem.setMenuEnabled(False)
+        self.plotItem.disableAutoRange(pg.ViewBox.YAxis)
+        self.plotItem.setMouseEnabled(y=False)
+        
+        self.setBackground(background=(21, 21, 21, 255))
+        self.getAxis('left').setWidth(40)
+        self.getAxis('left').setTicks([[(-i*self.laneHeight, str(i+1)) for i in range(NUM_SENSORS)], []])
+        self.showGrid(x=True, y=True, alpha=0.3)
+        
+        self.lanes = [PlotLane(self, -i*self.laneHeight) for i in range(NUM_SENSORS)]
+        
+        # Crosshair with the value of the sensor under the mouse
+        pen = pg.mkPen(color=(230, 230, 230, 120), width=1)
+        self.vLine = pg.InfiniteLine(angle=90, movable=False, pen=pen)
+        self.hLine = pg.InfiniteLine(angle=0, movable=False, pen=pen)
+        self.cursorLabel = pg.TextItem(color=(230, 230, 230), anchor=(0, 1))
+        for item in (self.vLine, self.hLine, self.cursorLabel):
+            self.addItem(item, ignoreBounds=True)
+            item.hide()
+        
+        self.proxy = pg.SignalProxy(self.scene().sigMouseMoved, rateLimit=30, slot=self.onMouseMove)
+        self.setRenderer(renderer)
+        self.showSensors(NUM_SENSORS)
+    
+    setRenderer = CustomPlotWidget.setRenderer
+    
+    def showSensors(self, num):
+        for i, lane in enumerate(self.lanes):
+            lane.setVisible(i < num)
+        self.setYRange(-(num - 0.5)*self.laneHeight, 0.5*self.laneHeight, padding=0)
+    
+    def onMouseMove(self, evt):
+        pos = evt[0]
+        if not self.plotItem.vb.sceneBoundingRect().contains(pos):
+            for item in (self.vLine, self.hLine, self.cursorLabel): item.hide()
+            self.getAxis('bottom').setMouseValue(None)
+            return
+        
+        mp = self.plotItem.vb.mapSceneToView(pos)
+        lane = min(max(int(round(-mp.y() / self.laneHeight)), 0), len(self.lanes) - 1)
+        value = mp.y() - self.lanes[lane].offset
+        
+        self.vLine.setPos(mp.x())
+        self.hLine.setPos(mp.y())
+        self.cursorLabel.setText(f"{lane + 1}: {value:.0f} mkV")
+        self.cursorLabel.setPos(mp.x(), mp.y())
+        for item in (self.vLine, self.hLine, self.cursorLabel): item.show()
+        self.getAxis('bottom').setMouseValue(mp.x())
+
 class ClampedSpinBox(QtWidgets.QSpinBox):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -1478,23 +2301,26 @@ class ClampedSpinBox(QtWidgets.QSpinBox):
 # Serial monitor class
 class SerialMonitor:
     # Custom constructor
-    def __init__(self, delay):
+    def __init__(self, delay, pollDelay=0.005):
         self.running = False
         self.connect = False
         self.baudRate = 1000000
         self.playFile = 0
         self.delay = delay      
-        self.ports = [p[0] for p in serial.tools.list_ports.comports(include_links=False) ]
+        self.pollDelay = pollDelay # Idle time of the acquisition thread
+        self.ports = [] # Set from the port watcher
         self.COM = ''
         self.ser = serial.Serial()
-        if len(self.ports) > 0:
-            self.COM = self.ports[0]
         
-    def updatePorts(self):
-        self.ports = [p[0] for p in serial.tools.list_ports.comports(include_links=False) ]
-    
+        # Received bytes are collected by the acquisition thread
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+        self.readTime = 0 # Time when the last bytes were received
+        self.reader = None
+        self.reading = False
+        self.discardUntil = 0
+        
     def serialConnect(self):
-        self.updatePorts()
         if not self.connect:
             if self.COM != '':
                 try:
@@ -1508,15 +2334,43 @@ class SerialMonitor:
                     self.ser.rts = True
                     self.ser.dtr = True
                     self.connect = True             
-                    QtCore.QTimer.singleShot(500, self.ser.flushInput)
+                    self.discardUntil = time.perf_counter() + 0.5 # Bytes left from the previous session are dropped
+                    with self.lock: self.buffer.clear()
+                    self.reading = True
+                    self.reader = threading.Thread(target=self._readLoop, daemon=True)
+                    self.reader.start()
                 except SerialException :
                     self.connect = False
                     
     def serialDisconnection(self):
+        self.reading = False
+        if self.reader is not None:
+            self.reader.join(1)
+            self.reader = None
         self.ser.close()
         self.connect = False
+    
+    # Bytes received since the previous call
+    def serialRead(self):
+        with self.lock:
+            msg = bytes(self.buffer)
+            self.buffer.clear()
+        return msg
+    
+    # Acquisition thread
+    def _readLoop(self):
+        while self.reading:
+            msg = self._read()
+            if len(msg) > 0:
+                now = time.perf_counter()
+                if now < self.discardUntil: continue
+                with self.lock:
+                    self.buffer += msg
+                    self.readTime = now
+            else:
+                time.sleep(self.pollDelay)
         
-    def serialRead(self):  
+    def _read(self):  
         if not self.ser or not self.ser.is_open:
             return bytes(0)
 
@@ -1536,33 +2390,162 @@ class SerialMonitor:
         return msg
 
 
-# Serial monitor class
-class MainRun(QtCore.QThread):
-    bufferUpdated = QtCore.pyqtSignal()
-    # Custom constructor
-    def __init__(self, delay):
-        QtCore.QThread.__init__(self)
+# True when an OpenGL context can be created and made current. False on
+# systems without a GL driver, e.g. headless machines without Mesa.
+def openGLAvailable():
+    context = QtGui.QOpenGLContext()
+    if not context.create(): return False
+    surface = QtGui.QOffscreenSurface()
+    surface.create()
+    current = surface.isValid() and context.makeCurrent(surface)
+    if current: context.doneCurrent()
+    return current
+
+# List available serial port names
+def listPorts():
+    return [p[0] for p in serial.tools.list_ports.comports(include_links=False)]
+
+# Background serial port watcher. On Linux and macOS the /dev directory is watched
+# (inotify/kqueue through QFileSystemWatcher) and ports are only enumerated after
+# a change; elsewhere the port list is polled slowly. The signal is emitted after
+# the first scan and then only when the set of ports changes.
+class PortWatcher(QtCore.QObject):
+    portsChanged = pyqtSignal(list)
+    
+    def __init__(self, ports=None, pollInterval=2.0, fallbackInterval=10.0, debounce=0.3):
+        super().__init__()
+        self.ports = list(ports) if ports is not None else []
+        self.scanned = False # The first scan reports the ports even when none are found
+        self.pollInterval = pollInterval # Poll interval without file system events, s
+        self.fallbackInterval = fallbackInterval # Safety poll interval with file system events, s
+        self.debounce = debounce # Delay between a /dev event and enumeration, s
+        self.thread = QtCore.QThread()
+        self.moveToThread(self.thread)
+        self.thread.started.connect(self._run)
+        
+    def start(self):
+        self.thread.start()
+        
+    def stop(self):
+        if self.thread.isRunning():
+            QtCore.QMetaObject.invokeMethod(self, "_stop", QtCore.Qt.ConnectionType.BlockingQueuedConnection)
+            self.thread.quit()
+            self.thread.wait(1000)
+    
+    # Timers have to be stopped from the thread that owns them
+    @QtCore.pyqtSlot()
+    def _stop(self):
+        if not hasattr(self, 'pollTimer'):
+            return
+        self.pollTimer.stop()
+        self.debounceTimer.stop()
+        if self.fsWatcher is not None:
+            self.fsWatcher.deleteLater()
+            self.fsWatcher = None
+    
+    # Executed in the watcher thread
+    def _run(self):
+        self.debounceTimer = QtCore.QTimer(self)
+        self.debounceTimer.setSingleShot(True)
+        self.debounceTimer.setInterval(int(self.debounce * 1000))
+        self.debounceTimer.timeout.connect(self.scan)
+        
+        self.fsWatcher = None
+        interval = self.pollInterval
+        if sys.platform != 'win32' and os.path.isdir('/dev'):
+            self.fsWatcher = QtCore.QFileSystemWatcher(['/dev'], self)
+            if self.fsWatcher.directories():
+                self.fsWatcher.directoryChanged.connect(lambda path: self.debounceTimer.start())
+                interval = self.fallbackInterval
+            
+        self.pollTimer = QtCore.QTimer(self)
+        self.pollTimer.setInterval(int(interval * 1000))
+        self.pollTimer.timeout.connect(self.scan)
+        self.pollTimer.start()
+        self.scan()
+        
+    def scan(self):
+        try:
+            ports = listPorts()
+        except OSError:
+            return
+        if not self.scanned or sorted(ports) != sorted(self.ports):
+            self.scanned = True
+            self.ports = ports
+            self.portsChanged.emit(list(ports))
+
+# Frame pacing of the graphics update. The single shot timer is started again
+# after every frame, so updates never queue up behind a slow frame. The frame
+# cost is the update time plus the time the timer fired late, which covers
+# painting and acquisition in the event loop. Frames are spaced so that they
+# take at most "load" of the GUI thread: maxFps while they are cheap, fewer
+# frames per second (down to minFps) when they get expensive.
+class FrameScheduler(QtCore.QObject):
+    frame = pyqtSignal()
+    
+    def __init__(self, parent=None, maxFps=30, minFps=4, load=0.5):
+        super().__init__(parent)
+        self.minInterval = 1 / maxFps
+        self.maxInterval = 1 / minFps
+        self.load = load
+        self.cost = 0.0 # Smoothed frame cost, s
+        self.interval = self.minInterval # Current time between frames, s
+        self.frames = 0
+        self.due = 0.0 # Time the next frame was scheduled for
         self.running = False
-        self.playFile = 0
-        self.delay = delay      
-
-    # Listening port
-    def run(self):
-        while self.running is True:
-            self.bufferUpdated.emit()
-            time.sleep(self.delay) 
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._frame)
+    
+    @property
+    def fps(self):
+        return 1 / self.interval
+    
+    def start(self):
+        self.running = True
+        self.due = time.perf_counter()
+        self.timer.start(0)
+        
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+    
+    def _frame(self):
+        t0 = time.perf_counter()
+        late = max(t0 - self.due, 0)
+        self.frame.emit()
+        t1 = time.perf_counter()
+        
+        # Single slow frames (first use of SciPy, window resize) are clipped
+        cost = min(t1 - t0 + late, self.maxInterval * self.load)
+        self.cost = 0.8 * self.cost + 0.2 * cost
+        self.frames += 1
+        self.interval = min(max(self.cost / self.load, self.minInterval), self.maxInterval)
+        
+        if self.running:
+            wait = max(self.interval - (t1 - t0), 0)
+            self.due = t1 + wait
+            self.timer.start(int(wait * 1000))
          
 # Starting program       
 if __name__ == '__main__':
     app = QtCore.QCoreApplication.instance()
     if app is None:
         app = QtWidgets.QApplication(sys.argv)
+    startupProfile.mark("QApplication")
     window = GUI()
     window.show()
+    startupProfile.mark("main window")
     
     window.raise_()  
     window.activateWindow()
     window.setFocus()
     
     window.start()
+    if startupProfile.enabled:
+        def firstEvent():
+            startupProfile.mark("first event loop pass")
+            startupProfile.report()
+        QtCore.QTimer.singleShot(0, firstEvent)
     sys.exit(app.exec())
@@ -0,0 +1,341 @@
+# Benchmarks of the MYOblue_GUI signal path
+# 2026-10-19 by ELEMYO https://github.com/ELEMYO/MYOblue-GUI
+#
+# Code is placed under the MIT license
+# Copyright (c) 2021 ELEMYO
+# ===============================================
+#
+# Usage:
+#     python myoblue_benchmark.py            # all benchmarks
+#     python myoblue_benchmark.py dsp        # selected benchmarks
+#
+# Benchmarks with a parity check exit with status 1 when a result differs from
+# the reference implementation by more than the tolerance.
+#
+# The paint benchmark needs a display. Headless, raster painting works with
+# QT_QPA_PLATFORM=offscreen; OpenGL needs a GL capable platform, for example
+#     LIBGL_ALWAYS_SOFTWARE=1 xvfb-run python myoblue_benchmark.py paint
+# for Mesa software rendering (--software-gl sets the variables).
+#
+# Frames are synthetic: 1000 Hz sensors, 12 s plot window and 120 new samples
+# per sensor every frame, like MYOblue_GUI with the default config.ini.
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import myoblue_kernels
+from myoblue_kernels import relativeError
+import myoblue_record
+from myoblue_dsp import FLOAT32_ERROR, DSPChain, DSPWorker, DSPBlocks, DSPFrame, DSPSettings, butter, sosfilt, bandpass_filter, bandstop_filter_50Hz
+
+FS = 1000
+WIDTH = 12 * FS
+FRAME_SAMPLES = 120
+
+def syntheticFrames(NUM_SENSORS, frames, seed=1):
+    rng = np.random.default_rng(seed)
+    t = np.arange(WIDTH + frames * FRAME_SAMPLES) / FS
+    burst = 1 + 4 * (np.sin(2*np.pi*0.3*t) > 0.5)
+    signal = 8192 + 300 * burst * rng.standard_normal((NUM_SENSORS, len(t)))
+    signal = np.clip(signal, 0, 16383).astype(np.float32)
+    settings = DSPSettings(sensors=NUM_SENSORS, bandstop=True, notch="50 Hz", bandpass=True,
+                           lowFreq=2, highFreq=480, rmsInterval=0.5, smoothing=19.5, gain=2, fftSensor=0)
+    for k in range(frames):
+        end = WIDTH + k * FRAME_SAMPLES
+        yield DSPFrame(signal[:, end - WIDTH:end], np.tile(t[end - WIDTH:end], (NUM_SENSORS, 1)),
+                       [FRAME_SAMPLES] * NUM_SENSORS, [1 / FS] * NUM_SENSORS, settings)
+
+# Work of the GUI thread besides DSP (plotting, recording), as numpy load
+def render(milliseconds):
+    end = time.perf_counter() + milliseconds / 1000
+    x = np.zeros(4096)
+    while time.perf_counter() < end:
+        np.sin(x, out=x)
+
+# Best time of a call in s
+def timeit(function, repeat=20):
+    best = float('inf')
+    for k in range(repeat):
+        t0 = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def stats(samples):
+    samples = np.asarray(samples) * 1000
+    return f"{np.median(samples):8.1f} {np.percentile(samples, 95):8.1f}"
+
+# DSP in the GUI process against the DSPWorker process. "GUI thread" is the time
+# the GUI thread spends per frame (DSP + rendering), "result" is the time from
+# taking the frame to the processed blocks being available.
+def benchDSP(args):
+    print(f"DSP frame latency, ms (render {args.render} ms per frame)")
+    print(f"{'sensors':>8} {'mode':>8} {'GUI thread':>17} {'result':>17}")
+    print(f"{'':>8} {'':>8} {'median':>8} {'p95':>8} {'median':>8} {'p95':>8}")
+    for sensors in (8, 16):
+        chain = DSPChain(FS, sensors)
+        out = DSPBlocks(sensors, WIDTH)
+        thread, result = [], []
+        for k, frame in enumerate(syntheticFrames(sensors, args.frames + args.warmup)):
+            t0 = time.perf_counter()
+            chain.process(frame.raw, frame.dt, frame.msLen, frame.settings, out)
+            t1 = time.perf_counter()
+            render(args.render)
+            if k >= args.warmup:
+                thread.append(time.perf_counter() - t0)
+                result.append(t1 - t0)
+        print(f"{sensors:8d} {'single':>8} {stats(thread)} {stats(result)}")
+
+        worker = DSPWorker(sensors, WIDTH, FS)
+        try:
+            thread, result = [], []
+            submitted = {}
+            for k, frame in enumerate(syntheticFrames(sensors, args.frames + args.warmup)):
+                t0 = time.perf_counter()
+                done = worker.collect()
+                if done is not None and k > args.warmup:
+                    result.append(time.perf_counter() - submitted[k - 1])
+                worker.submit(frame)
+                submitted[k] = t0
+                render(args.render)
+                if k >= args.warmup:
+                    thread.append(time.perf_counter() - t0)
+            worker.collect()
+        finally:
+            worker.close()
+        print(f"{sensors:8d} {'process':>8} {stats(thread)} {stats(result)}")
+
+# Parity of the NumPy and Numba kernels with the reference Python loops (the
+# cases of myoblue_kernels.parityCases over the plot window) and the time per
+# call of each implementation
+def benchKernels(args):
+    backends = ['numpy'] + (['numba'] if myoblue_kernels.numbaAvailable() else [])
+    print("Kernels, best time per call, ms" + ("" if 'numba' in backends else " (Numba is not installed)"))
+    print(f"{'kernel':>14} {'python':>9}" + "".join(f" {b:>9} {'error':>9}" for b in backends))
+    cases = myoblue_kernels.parityCases(WIDTH)
+    lines = [f"{name:>14} {timeit(reference, 3)*1000:9.3f}" for name, tolerance, reference, call in cases]
+    failed = False
+    for backend in backends:
+        try:
+            myoblue_kernels.useNumba(backend == 'numba') # Compiles and checks the Numba kernels
+        except Exception as e:
+            print(f"{backend} kernels: {e}")
+            failed = True
+            continue
+        for k, (name, error, tolerance) in enumerate(myoblue_kernels.parityErrors(WIDTH)):
+            ok = error <= tolerance
+            failed |= not ok
+            lines[k] += f" {timeit(cases[k][3])*1000:9.3f} {error:9.1e}" + ("" if ok else " FAILED")
+    print("\n".join(lines))
+    myoblue_kernels.useNumba()
+    return not failed
+
+# Paint time of one sensor plot (3 curves of the whole window) per frame with
+# the raster and the OpenGL renderer of CustomPlotWidget
+def benchPaint(args):
+    if args.software_gl:
+        os.environ['LIBGL_ALWAYS_SOFTWARE'] = '1' # Mesa llvmpipe
+        os.environ['QT_OPENGL'] = 'software' # Qt software OpenGL on Windows
+    from PyQt5 import QtWidgets
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([sys.argv[0]])
+    import MYOblue_GUI as gui
+
+    renderers = ['raster'] + (['opengl'] if gui.openGLAvailable() else [])
+    print("Paint time per frame, ms" + ("" if 'opengl' in renderers else " (OpenGL is not available)"))
+    print(f"{'renderer':>9} {'median':>8} {'p95':>8}")
+    spinbox = QtWidgets.QSpinBox()
+    spinbox.setValue(1)
+    rng = np.random.default_rng(3)
+    signal = (rng.standard_normal(WIDTH + args.frames * FRAME_SAMPLES) * 300).astype(np.float32)
+    t = np.arange(len(signal)) / FS
+    for renderer in renderers:
+        widget = gui.CustomPlotWidget(sensors_spinbox=spinbox, renderer=renderer)
+        widget.resize(1400, 160)
+        widget.show()
+        widget.setXRange(0, WIDTH / FS)
+        app.processEvents()
+        times = []
+        for k in range(args.frames + args.warmup):
+            end = WIDTH + k * FRAME_SAMPLES
+            x, y = t[end - WIDTH:end] - t[end - WIDTH], signal[end - WIDTH:end]
+            t0 = time.perf_counter()
+            widget.p.setData(x=x, y=y)
+            widget.pe.setData(x=x, y=np.abs(y) * 0.5)
+            widget.pi.setData(x=x, y=np.abs(y) * 0.3)
+            widget.viewport().repaint()
+            app.processEvents()
+            if k >= args.warmup: times.append(time.perf_counter() - t0)
+        print(f"{renderer:>9} {stats(times)}")
+        widget.close()
+
+# Commit time of the journal chunks with every sync policy (1 s chunks of 8
+# sensors), then the recovery of a journal cut in the middle of a chunk. The
+# chunks are written back to back, so "interval" shows no fsync here; with
+# real time it costs one "chunk" commit every syncInterval.
+def benchJournal(args):
+    sensors, rows = 8, FS
+    rng = np.random.default_rng(4)
+    print(f"Journal chunk commit, ms ({sensors} sensors, {rows} rows per chunk)")
+    print(f"{'sync':>9} {'median':>8} {'p95':>8}")
+    passed = True
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for sync in myoblue_record.SYNC:
+            path = os.path.join(directory, sync + ".myob")
+            writer = myoblue_record._JournalWriter(path, {'sensors': sensors, 'sample_rate_hz': FS}, sync, syncInterval=5)
+            times = []
+            for k in range(args.frames + args.warmup):
+                rowTime = (k * rows + np.arange(rows)) / FS
+                columns = {'row_time': rowTime, 'raw': rng.integers(0, 16384, (sensors, rows), dtype=np.uint16),
+                           'marker': np.zeros(rows, dtype=np.uint8)}
+                t0 = time.perf_counter()
+                writer.write(k, columns)
+                if k >= args.warmup: times.append(time.perf_counter() - t0)
+            writer.close(None)
+            times = np.asarray(times) * 1000
+            print(f"{sync:>9} {np.median(times):8.3f} {np.percentile(times, 95):8.3f}")
+
+        # A crash in the middle of a chunk: the complete chunks are recovered
+        size = os.path.getsize(path)
+        chunks = args.frames + args.warmup
+        chunkSize = myoblue_record._CHUNK.size + myoblue_record._CRC.size + rows * (8 + 2 * sensors + 1)
+        with open(path, 'r+b') as f:
+            f.truncate(size - chunks * myoblue_record._INDEX.size - myoblue_record._TRAILER.size - chunkSize // 2)
+        t0 = time.perf_counter()
+        recovered, dropped = myoblue_record.recoverJournal(path)
+        elapsed = time.perf_counter() - t0
+        reader = myoblue_record.openRecording(path)
+        ok = reader.complete and recovered == chunks - 1 and len(reader.read()['row_time']) == (chunks - 1) * rows
+        reader.close()
+        passed &= ok
+        print(f"recovery of {chunks} chunks cut inside the last one: {recovered} chunks, {elapsed*1000:.1f} ms" + ("" if ok else " FAILED"))
+    return passed
+
+# Python heap allocations of the DSP chain per frame (NumPy reports its buffers
+# to tracemalloc): "retained" is the growth of the heap over the frame, "peak"
+# the largest temporary allocation above the heap before the frame. The
+# filters run in the scratch block of the chain in spans of SOSFILT_SPAN samples
+# (about 50 kB of temporaries each), the peak of about 98 kB is the RMS stage.
+def benchAlloc(args):
+    print("DSP chain allocations per frame, bytes (8 sensors)")
+    print(f"{'filters':>8} {'retained':>9} {'peak':>9}")
+    for filters in (False, True):
+        chain = DSPChain(FS, 8)
+        out = DSPBlocks(8, WIDTH)
+        retained, peak = [], []
+        tracemalloc.start()
+        for k, frame in enumerate(syntheticFrames(8, args.frames + args.warmup)):
+            settings = frame.settings._replace(bandstop=filters, bandpass=filters)
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            chain.process(frame.raw, frame.dt, frame.msLen, settings, out)
+            current, top = tracemalloc.get_traced_memory()
+            if k >= args.warmup:
+                retained.append(current - before)
+                peak.append(top - before)
+        tracemalloc.stop()
+        print(f"{'on' if filters else 'off':>8} {int(np.median(retained)):9d} {int(np.median(peak)):9d}")
+
+# Error of the float32 chain against the same chain computed in float64, per
+# processed signal and filter setting, and the time per frame of both.
+# The error is relative to the largest absolute value of the float64 signal.
+def benchDtype(args):
+    cases = [('bandpass 2-480 Hz, 50 Hz notch', dict()),
+             ('bandpass 20-450 Hz, 60 Hz notch', dict(lowFreq=20, highFreq=450, notch="60 Hz")),
+             ('no filters', dict(bandstop=False, bandpass=False))]
+    tolerance = FLOAT32_ERROR
+    print(f"float32 against float64 chain, relative error (tolerance {tolerance:g}), time per frame, ms")
+    print(f"{'filters':>32}" + "".join(f" {name:>13}" for name in DSPBlocks.names) + f" {'float32':>8} {'float64':>8}")
+    passed = True
+    for label, change in cases:
+        chains = {dtype: (DSPChain(FS, 8, dtype), DSPBlocks(8, WIDTH, dtype=dtype)) for dtype in (np.float32, np.float64)}
+        times = {dtype: [] for dtype in chains}
+        for k, frame in enumerate(syntheticFrames(8, args.frames + args.warmup)):
+            settings = frame.settings._replace(**change)
+            for dtype, (chain, out) in chains.items():
+                t0 = time.perf_counter()
+                chain.process(frame.raw.astype(dtype), frame.dt, frame.msLen, settings, out)
+                if k >= args.warmup: times[dtype].append(time.perf_counter() - t0)
+        line = f"{label:>32}"
+        for name in DSPBlocks.names:
+            error = relativeError(getattr(chains[np.float32][1], name), getattr(chains[np.float64][1], name))
+            passed &= error <= tolerance
+            line += f" {error:13.1e}" + ("" if error <= tolerance else " FAILED")
+        print(line + "".join(f" {np.median(times[dtype])*1000:8.2f}" for dtype in chains))
+    if not passed:
+        print(f"float32 chain error is over the {tolerance:g} bound of the dtype policy")
+    return passed
+
+# Bandpass and notch of 8 sensors filtered row by row with the exact sample
+# rate of every sensor (two sosfilt calls per sensor, the sections designed
+# again when the rate differs from the previous row, like the filters did
+# before batching) against the batched filters, which group the sensors by
+# their sample rate rounded to FS_RESOLUTION. Rounding the drifting rates of
+# the PLL moves the notch edges by up to 0.05 Hz, hence the larger tolerance
+# of that case. The error is relative to the largest absolute value of the
+# row by row result.
+def benchFilters(args):
+    rng = np.random.default_rng(3)
+    data = (300 * rng.standard_normal((8, WIDTH))).astype(np.float32)
+    cases = [('same dt', np.full(8, 1 / FS), 1e-6),
+             ('PLL drift', 1 / (FS + rng.uniform(-0.04, 0.04, 8)), 5e-3),
+             ('two sample rates', 1 / np.repeat([FS, 2 * FS], 4), 1e-6)]
+    sections = {}
+
+    def design(fs):
+        if fs not in sections:
+            sections.clear()
+            nyq = 0.5 * fs
+            bands = [butter(4, [2 / nyq, 480 / nyq], btype='bandpass', output='sos')]
+            bands += [butter(4, [(48 + 50 * k) / nyq, (52 + 50 * k) / nyq], btype='bandstop', output='sos') for k in range(4)]
+            sections[fs] = (bands[0].astype(np.float32), np.vstack(bands[1:]).astype(np.float32))
+        return sections[fs]
+
+    def rowByRow(dt):
+        out = np.empty_like(data)
+        for i in range(len(data)):
+            bandpass, notch = design(1 / dt[i])
+            out[i] = sosfilt(notch, sosfilt(bandpass, data[i]))
+        return out
+
+    print("Bandpass 2-480 Hz and 50 Hz notch, 8 sensors, relative error, ms")
+    print(f"{'sensors dt':>20} {'error':>9} {'tolerance':>9} {'rows':>8} {'batched':>8}")
+    passed = True
+    for label, dt, tolerance in cases:
+        bandpass, notch = bandpass_filter(2, 480, FS), bandstop_filter_50Hz(FS)
+        batched = lambda: notch.apply(bandpass.apply(data, 2, 480, 1 / dt), 1 / dt)
+        error = relativeError(batched(), rowByRow(dt))
+        passed &= error <= tolerance
+        print(f"{label:>20} {error:9.1e} {tolerance:9.0e} {timeit(lambda: rowByRow(dt), 5)*1000:8.2f} {timeit(batched, 5)*1000:8.2f}"
+              + ("" if error <= tolerance else " FAILED"))
+    return passed
+
+BENCHMARKS = {
+    'dsp': benchDSP,
+    'kernels': benchKernels,
+    'paint': benchPaint,
+    'journal': benchJournal,
+    'alloc': benchAlloc,
+    'dtype': benchDtype,
+    'filters': benchFilters,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="MYOblue_GUI benchmarks")
+    parser.add_argument('names', nargs='*', help="benchmarks to run: " + ", ".join(BENCHMARKS) + " (all by default)")
+    parser.add_argument('--frames', type=int, default=50, help="measured frames")
+    parser.add_argument('--warmup', type=int, default=5, help="frames before measuring")
+    parser.add_argument('--software-gl', action='store_true', help="Mesa/Qt software OpenGL for the paint benchmark")
+    parser.add_argument('--dir', help="directory of the journal benchmark files (the temporary directory by default)")
+    parser.add_argument('--render', type=float, default=40, help="simulated rendering time per frame, ms")
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS: parser.error(f"unknown benchmark {name}")
+    passed = True
+    for name in args.names or BENCHMARKS:
+        passed &= BENCHMARKS[name](args) is not False
+        print()
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,634 @@
+# Signal processing of the MYOblue plot window
+# 2026-10-19 by ELEMYO https://github.com/ELEMYO/MYOblue-GUI
+#
+# Code is placed under the MIT license
+# Copyright (c) 2021 ELEMYO
+# ===============================================
+#
+# DSPChain filters the latest window of every sensor and updates the envelope
+# and RMS signals with the new samples of the frame. It does not depend on Qt,
+# so it can run in the GUI process or in a separate DSP process.
+#
+# With "DSPProcess = True" in config.ini MYOblue_GUI runs the chain in a DSPWorker
+# process. The raw window of a frame is copied into shared memory, the worker
+# writes the filtered, rectified, envelope, RMS and spectrum blocks into one of
+# two output slots. The GUI collects the result of frame k while the worker
+# processes frame k+1, so the processed signals are shown one frame later.
+#
+# Shared memory layout (float32):
+#   raw:   [sensors, width], ADC counts of the frame window
+#   slot:  plot, rectification, envelope, RMS [sensors, width] and spectrum
+#          [FFT_POINTS], two slots
+#
+# Dtype policy: samples and every signal derived from them are float32 (ADC
+# counts are exact in float32), from the raw buffers through the filters to
+# the plotted arrays. The filters are Butterworth second order sections in
+# float32, which stay stable where the transfer function form would not. Times
+# are float64 (float32 loses milliseconds after a few hours). The envelope
+# and RMS recurrences keep float64 state and accumulate in float64 over the
+# new samples of a frame, their float32 outputs are written with out=. The
+# error of the float32 chain against the same chain in float64 stays below
+# FLOAT32_ERROR of the largest value of every signal, "python
+# myoblue_benchmark.py dtype" fails when it does not.
+
+import multiprocessing
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+import myoblue_kernels
+from myoblue_kernels import cascadeEMA, rmsRecurrence
+
+FFT_POINTS = 500
+SIGNAL_DTYPE = np.float32
+TIME_DTYPE = np.float64
+FLOAT32_ERROR = 2e-4 # Relative error bound of the float32 signal path
+
+# Settings of the chain, taken from the GUI for every frame. smoothing is the
+# time constant of the envelope in ms, gain its gain.
+DSPSettings = namedtuple('DSPSettings', 'sensors bandstop notch bandpass lowFreq highFreq rmsInterval smoothing gain fftSensor')
+
+# Input of one frame: raw and time windows [sensors, width], count of new
+# samples and time between samples of every sensor
+DSPFrame = namedtuple('DSPFrame', 'raw time msLen dt settings')
+
+# SciPy is imported on first use of a filter or of the FFT
+def butter(*args, **kwargs):
+    from scipy.signal import butter
+    return butter(*args, **kwargs)
+
+def sosfilt(*args, **kwargs):
+    from scipy.signal import sosfilt
+    return sosfilt(*args, **kwargs)
+
+# sosfilt of the rows of x [rows, samples] in place. zi [sections, rows, 2] is
+# the initial state, as the public sosfilt takes it, and is updated. sosfilt
+# returns a new array, so the rows are filtered in spans of SOSFILT_SPAN samples
+# with the state carried over, which bounds the temporary arrays to one span.
+SOSFILT_SPAN = 512
+
+def sosfiltInPlace(sos, x, zi):
+    for start in range(0, x.shape[-1], SOSFILT_SPAN):
+        span = x[:, start:start + SOSFILT_SPAN]
+        y, zf = sosfilt(sos, span, axis=-1, zi=zi)
+        np.copyto(span, y)
+        np.copyto(zi, zf)
+
+def fft(*args, **kwargs):
+    from scipy.fftpack import fft
+    return fft(*args, **kwargs)
+
+# Sample rates are rounded to FS_RESOLUTION Hz for the filter coefficients, so
+# sensors whose PLL adjusted rates differ by less share one set of sections
+FS_RESOLUTION = 0.1
+
+# Butterworth filter in second order sections over blocks [sensors, samples].
+# fs is the sample rate of every row. Neighbouring rows with the same rounded
+# sample rate are filtered with one sosfilt call along the samples, in place in
+# out (a new array when it is not given). The sections of every rate are cached
+# until the cutoffs change, the filter state block is kept between calls.
+class _SOSFilter(ABC):
+    def __init__(self, fs, dtype=SIGNAL_DTYPE):
+        self.order = 4
+        self.fs = fs
+        self.dtype = dtype
+        self.sections = {} # Sections of a rounded sample rate, computed on first use
+        self.zi = None # State of the rows [sections, rows, 2], zeroed for every block
+
+    # Sections of the filter at the sample rate fs, float64
+    @abstractmethod
+    def _design(self, fs):
+        pass
+
+    def coefficients(self, fs):
+        key = round(float(fs) / FS_RESOLUTION) * FS_RESOLUTION
+        sos = self.sections.get(key)
+        if sos is None:
+            if len(self.sections) >= 32: self.sections.clear() # Drifting rates
+            sos = self.sections[key] = self._design(key).astype(self.dtype)
+        return sos
+
+    def filter(self, data, fs, out=None):
+        data = np.asarray(data)
+        if data.ndim == 1:
+            return sosfilt(self.coefficients(fs), data)
+        if out is None:
+            out = np.empty(data.shape, dtype=self.dtype)
+        if out is not data:
+            np.copyto(out, data)
+        keys = np.round(np.broadcast_to(np.asarray(fs, dtype=np.float64), data.shape[:1]) / FS_RESOLUTION)
+        bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(keys)]))):
+            sos = self.coefficients(keys[start] * FS_RESOLUTION)
+            if self.zi is None or self.zi.shape[1] < end - start or self.zi.shape[0] != len(sos):
+                self.zi = np.zeros((len(sos), len(keys), 2), dtype=self.dtype)
+            zi = self.zi[:, :end - start]
+            zi.fill(0)
+            sosfiltInPlace(sos, out[start:end], zi)
+        return out
+
+# Butterworth bandpass filter
+class bandpass_filter(_SOSFilter):
+    def __init__(self, lowcut, highcut, fs, dtype=SIGNAL_DTYPE):
+        super().__init__(fs, dtype)
+        self.lowcut_hz = lowcut
+        self.highcut_hz = highcut
+
+    def _design(self, fs):
+        nyq_low = self.lowcut_hz / (0.5 * fs)
+        nyq_high = self.highcut_hz / (0.5 * fs)
+        return butter(self.order, [nyq_low, nyq_high], btype='bandpass', output='sos')
+
+    def apply(self, data, lowcut, highcut, fs, out=None):
+        if self.lowcut_hz != lowcut or self.highcut_hz != highcut:
+            self.lowcut_hz = lowcut
+            self.highcut_hz = highcut
+            self.sections.clear()
+        return self.filter(data, fs, out)
+
+# Butterworth bandstop filter of the mains frequency and three harmonics, the
+# sections of the four bands are stacked into one cascade
+class _mains_filter(_SOSFilter):
+    frequency = 50
+
+    def _design(self, fs):
+        nyq = 0.5 * fs
+        sections = []
+        for i in range(4):
+            lowcut = (self.frequency - 2 + self.frequency * i) / nyq
+            highcut = (self.frequency + 2 + self.frequency * i) / nyq
+            sections.append(butter(self.order, [lowcut, highcut], btype='bandstop', output='sos'))
+        return np.vstack(sections)
+
+    def apply(self, data, fs, out=None):
+        return self.filter(data, fs, out)
+
+class bandstop_filter_50Hz(_mains_filter):
+    frequency = 50
+
+class bandstop_filter_60Hz(_mains_filter):
+    frequency = 60
+
+# Butterworth highpass filter
+class HP_filter(_SOSFilter):
+    def __init__ (self, lowcut, fs, dtype=SIGNAL_DTYPE):
+        super().__init__(fs, dtype)
+        self.lowcut_hz = lowcut
+
+    def _design(self, fs):
+        return butter(self.order, self.lowcut_hz / (0.5 * fs), btype='highpass', output='sos')
+
+    def apply(self, data, lowcut, fs, out=None):
+        if self.lowcut_hz != lowcut:
+            self.lowcut_hz = lowcut
+            self.sections.clear()
+        return self.filter(data, fs, out)
+
+# Envelope of the rectified signals: cascade of three exponential averages with
+# the time constant smoothing (ms), times gain. The averaging coefficient
+# alpha = exp(-dt/tau) of every sensor is computed from its sample rate rounded
+# to FS_RESOLUTION and cached, so sensors with PLL adjusted dt have the same
+# time constant and sensors with the same rounded rate share one filter call.
+class Envelope:
+    def __init__(self, NUM_SENSORS=8, smoothing=19.5, gain=2):
+        self.state = np.zeros((NUM_SENSORS, 3)) # Three averages of every sensor, float64
+        self.smoothing = smoothing
+        self.gain = gain
+        self.alphas = None
+        self.key = None # Rounded sample rates and smoothing of the cached alphas
+
+    def reset(self):
+        self.state.fill(0)
+
+    # Averaging coefficients of the sensors with sample rates fs
+    def coefficients(self, fs):
+        fs = np.round(np.asarray(fs, dtype=np.float64) / FS_RESOLUTION) * FS_RESOLUTION
+        if self.key is None or self.key[1] != self.smoothing or not np.array_equal(fs, self.key[0]):
+            self.alphas = np.exp(-1000 / (fs * max(self.smoothing, 1e-3)))
+            self.key = (fs, self.smoothing)
+        return self.alphas
+
+    # Continue the envelopes of the rows of x [sensors, width] with their last
+    # counts[i] samples, written into the same samples of out. fs is the sample
+    # rate of every row. The averages run in float64, out may be float32.
+    def block(self, x, counts, fs, out):
+        cascadeEMA(x, counts, self.state, self.coefficients(fs), self.gain, out)
+
+# Processed signals of the plot window, in own arrays or in a shared buffer
+class DSPBlocks:
+    names = ('plot', 'rectification', 'envelope', 'RMS')
+
+    def __init__(self, NUM_SENSORS, width, buffer=None, offset=0, dtype=SIGNAL_DTYPE):
+        for k, name in enumerate(self.names):
+            if buffer is None:
+                setattr(self, name, np.zeros((NUM_SENSORS, width), dtype=dtype))
+            else:
+                setattr(self, name, np.ndarray((NUM_SENSORS, width), dtype=np.float32, buffer=buffer, offset=offset + k*NUM_SENSORS*width*4))
+        if buffer is None:
+            self.fft = np.zeros(FFT_POINTS, dtype=dtype)
+        else:
+            self.fft = np.ndarray((FFT_POINTS,), dtype=np.float32, buffer=buffer, offset=offset + len(self.names)*NUM_SENSORS*width*4)
+
+    # Size of the blocks in a shared buffer, bytes
+    @staticmethod
+    def size(NUM_SENSORS, width):
+        return (len(DSPBlocks.names)*NUM_SENSORS*width + FFT_POINTS) * 4
+
+    def copyTo(self, other):
+        for name in self.names:
+            np.copyto(getattr(other, name), getattr(self, name))
+
+    def fill(self, value):
+        for name in self.names:
+            getattr(self, name).fill(value)
+        self.fft.fill(value)
+
+# Stages of the processing pipeline. A stage takes the block [sensors, width]
+# of all active sensors, processes it as a whole and returns the block for the
+# next stage. Sinks write their block into the output of the frame.
+# frame holds dt, sample rate and new samples count of every sensor, the output
+# blocks, the settings and the two scratch blocks of the chain.
+StageFrame = namedtuple('StageFrame', 'dt fs msLen out settings work shift')
+
+class Stage:
+    name = 'stage'
+
+    def process(self, x, frame):
+        return x
+
+    def __repr__(self):
+        return self.name
+
+# Source: ADC counts to mkV
+class ScaleStage(Stage):
+    name = 'scale'
+
+    def process(self, x, frame):
+        work = np.subtract(x, 8192, out=frame.work)
+        work *= 0.30517578125  # Precomputed constant (2.5 / 16384.0 * 2000)
+        return work
+
+# Mains notch, 50 or 60 Hz and three harmonics
+class NotchStage(Stage):
+    def __init__(self, frequency, fs, dtype=SIGNAL_DTYPE):
+        self.name = f'notch {frequency} Hz'
+        self.filter = bandstop_filter_50Hz(fs, dtype) if frequency == 50 else bandstop_filter_60Hz(fs, dtype)
+
+    def process(self, x, frame):
+        return self.filter.apply(x, frame.fs, out=x)
+
+class BandpassStage(Stage):
+    def __init__(self, lowFreq, highFreq, fs, dtype=SIGNAL_DTYPE):
+        self.name = f'bandpass {lowFreq:g}-{highFreq:g} Hz'
+        self.lowFreq = lowFreq
+        self.highFreq = highFreq
+        self.filter = bandpass_filter(lowFreq, highFreq, fs, dtype)
+
+    def process(self, x, frame):
+        return self.filter.apply(x, self.lowFreq, self.highFreq, frame.fs, out=x)
+
+# Sink of the plotted signal, the filter transient at the window start is cleared
+class PlotSink(Stage):
+    name = 'plot'
+
+    def __init__(self, warmup, filtered):
+        self.warmup = warmup if filtered else 0
+
+    def process(self, x, frame):
+        x[:, :self.warmup] = 0
+        plot = frame.out.plot[:len(x)]
+        np.copyto(plot, x)
+        return plot
+
+# Rectification, of the 1 Hz highpass of the signal when it is not bandpass filtered
+class RectifyStage(Stage):
+    def __init__(self, warmup, fs=None, dtype=SIGNAL_DTYPE):
+        self.name = 'rectify' if fs is None else 'highpass 1 Hz, rectify'
+        self.warmup = warmup
+        self.filter = None if fs is None else HP_filter(1, fs, dtype)
+
+    def process(self, x, frame):
+        rectification = frame.out.rectification[:len(x)]
+        # The scratch block is free once the plot sink copied it
+        np.abs(x if self.filter is None else self.filter.apply(x, 1, frame.fs, out=frame.work), out=rectification)
+        rectification[:, :self.warmup] = 0
+        return rectification
+
+# Move every row of block left by its counts[i] new samples, the last
+# counts[i] samples are left to be computed. Rows with the same count are moved
+# together through scratch [rows, width].
+def _shiftRows(block, counts, scratch):
+    width = block.shape[1]
+    for count in np.unique(counts[counts > 0]):
+        keep = width - count
+        rows = np.flatnonzero(counts == count)
+        if len(rows) == len(block):
+            np.copyto(scratch[:, :keep], block[:, count:])
+            np.copyto(block[:, :keep], scratch[:, :keep])
+        else:
+            np.take(block[:, count:], rows, axis=0, out=scratch[:len(rows), :keep], mode='clip')
+            block[rows, :keep] = scratch[:len(rows), :keep]
+
+# Envelope sink, continued with the new samples of every sensor
+class EnvelopeStage(Stage):
+    def __init__(self, envelope, smoothing, gain, warmup):
+        self.name = f'envelope {smoothing:g} ms'
+        self.envelope = envelope
+        self.smoothing = smoothing
+        self.gain = gain
+        self.warmup = warmup
+
+    def process(self, x, frame):
+        self.envelope.smoothing = self.smoothing
+        self.envelope.gain = self.gain
+        envelope = frame.out.envelope[:len(x)]
+        envelope[:, :self.warmup] = 0
+        counts = np.minimum(frame.msLen[:len(x)], x.shape[1])
+        _shiftRows(envelope, counts, frame.shift)
+        self.envelope.block(x, counts, frame.fs, envelope)
+        return envelope
+
+# RMS sink of the envelope over interval seconds
+class RMSStage(Stage):
+    def __init__(self, interval, warmup):
+        self.name = f'RMS {interval:g} s'
+        self.interval = interval
+        self.n = int(interval * 1000 / 2)
+        self.warmup = warmup
+
+    def process(self, x, frame):
+        RMS = frame.out.RMS[:len(x)]
+        RMS[:, :self.warmup] = 0
+        counts = np.minimum(frame.msLen[:len(x)], x.shape[1])
+        _shiftRows(RMS, counts, frame.shift)
+        rmsRecurrence(x, RMS, x.shape[1] - counts, self.n, frame.dt[:len(x)], self.interval)
+        return RMS
+
+# Spectrum sink of the latest FFT_POINTS plotted samples of settings.fftSensor
+class SpectrumSink(Stage):
+    name = 'spectrum'
+
+    def __init__(self, spectrum):
+        self.spectrum = spectrum
+
+    def process(self, x, frame):
+        np.abs(fft(frame.out.plot[frame.settings.fftSensor][-FFT_POINTS:]), out=self.spectrum)
+        self.spectrum /= FFT_POINTS
+        return x
+
+# Filtering, rectification, envelope, RMS and spectrum of all sensors as a
+# pipeline of stages. The stages are built from the settings of the first frame
+# (the filter and signal settings of config.ini) and rebuilt only when the
+# settings change. dtype is the signal dtype, float64 only for reference
+# computations.
+class DSPChain:
+    def __init__(self, fs, NUM_SENSORS=8, dtype=SIGNAL_DTYPE):
+        self.fs = fs
+        self.NUM_SENSORS = NUM_SENSORS
+        self.dtype = dtype
+        self.envelope = Envelope(NUM_SENSORS) # Envelope state, kept when the stages are rebuilt
+        self.work = None # Two scratch blocks of the window width, allocated on first use
+        self.spectrum = np.zeros(FFT_POINTS, dtype=dtype) # Returned by process(), overwritten by the next frame
+        self.stages = []
+        self.key = None # Settings the stages are built for
+
+    # Stages of the settings: source, filters, sinks of the processed signals
+    def build(self, settings):
+        warmup = int(1.5*self.fs) # Filter transient at the window start
+        stages = [ScaleStage()]
+        if settings.bandstop and settings.notch in ("50 Hz", "60 Hz"):
+            stages.append(NotchStage(int(settings.notch[:2]), self.fs, self.dtype))
+        if settings.bandpass:
+            stages.append(BandpassStage(settings.lowFreq, settings.highFreq, self.fs, self.dtype))
+        stages.append(PlotSink(warmup, settings.bandstop or settings.bandpass))
+        stages.append(RectifyStage(warmup, None if settings.bandpass else self.fs, self.dtype))
+        stages.append(EnvelopeStage(self.envelope, settings.smoothing, settings.gain, warmup))
+        stages.append(RMSStage(settings.rmsInterval, warmup))
+        stages.append(SpectrumSink(self.spectrum))
+        return stages
+
+    # Rebuild the stages if the settings changed, the sensors count and the FFT
+    # sensor are read from the frame
+    def configure(self, settings):
+        key = settings._replace(sensors=0, fftSensor=0)
+        if key != self.key:
+            self.stages = self.build(settings)
+            self.key = key
+        return self.stages
+
+    def _scratch(self, width):
+        if self.work is None or self.work.shape[2] != width:
+            self.work = np.empty((2, self.NUM_SENSORS, width), dtype=self.dtype)
+        return self.work
+
+    # Process the raw windows [sensors, width] into out (plot, rectification,
+    # envelope and RMS arrays). Envelope and RMS of out are continued with the
+    # last msLen[i] samples. Returns the spectrum of the settings.fftSensor window.
+    # Apart from the FFT the chain works in preallocated buffers, the filters
+    # run in place in the scratch block.
+    def process(self, raw, dt, msLen, settings, out):
+        stages = self.configure(settings)
+        work, shift = self._scratch(raw.shape[1])
+        fs = 1 / np.asarray(dt[:settings.sensors], dtype=np.float64)
+        frame = StageFrame(dt, fs, msLen, out, settings, work[:settings.sensors], shift[:settings.sensors])
+        x = raw[:settings.sensors]
+        for stage in stages:
+            x = stage.process(x, frame)
+        return self.spectrum
+
+# Short time Fourier transform, computed column by column as samples arrive.
+# The columns are kept in a ring image of double width: column k is written at
+# rows k and k + columns, so the latest columns are always one contiguous view
+# and a frame only costs the FFTs of its new columns.
+class IncrementalSTFT:
+    floor = -20 # dB of an empty column
+
+    def __init__(self, fs, seconds=20, nfft=256, hop=64):
+        self.fs = fs
+        self.nfft = nfft
+        self.hop = hop
+        self.window = np.hanning(nfft).astype(np.float32)
+        self.scale = 2 / self.window.sum() # Amplitude of a sine in mkV
+        self.columns = max(int(seconds * fs / hop), 1)
+        self.bins = nfft // 2 + 1
+        self.image = np.empty((2 * self.columns, self.bins), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.image.fill(self.floor)
+        self.pos = 0 # Row of the next column, the oldest column of the view
+        self.tail = np.zeros(0, dtype=np.float32) # Samples not used by a full column yet
+        self.time = 0.0 # Centre time of the newest column, s
+
+    # Add new samples, lastTime is the time of the last sample
+    def push(self, samples, lastTime):
+        data = np.concatenate((self.tail, np.asarray(samples, dtype=np.float32)))
+        count = (len(data) - self.nfft) // self.hop + 1 if len(data) >= self.nfft else 0
+        if count > 0:
+            frames = np.lib.stride_tricks.sliding_window_view(data, self.nfft)[::self.hop][:count]
+            columns = np.abs(np.fft.rfft(frames * self.window, axis=1)) * self.scale
+            columns = 20 * np.log10(columns + 1e-3, dtype=np.float32)
+            if count > self.columns: columns = columns[-self.columns:]
+            rows = (self.pos + np.arange(len(columns))) % self.columns
+            self.image[rows] = columns
+            self.image[rows + self.columns] = columns
+            self.pos = (self.pos + len(columns)) % self.columns
+            end = (count - 1) * self.hop + self.nfft # End of the newest column in data
+            self.time = lastTime - (len(data) - end + self.nfft / 2) / self.fs
+            data = data[count * self.hop:]
+        self.tail = data
+
+    # Columns oldest first [columns, bins], a view of the ring image
+    def view(self):
+        return self.image[self.pos:self.pos + self.columns]
+
+    # Time covered by the view, s
+    @property
+    def span(self):
+        return self.columns * self.hop / self.fs
+
+# EMG features of the latest window of every sensor, all sensors in one batch:
+# mean and median power frequency (Hz), zero crossing rate (crossings per s),
+# waveform length (mkV per window) and mean absolute value (mkV)
+FEATURES = ('MNF', 'MDF', 'ZCR', 'WL', 'MAV')
+
+class FeatureExtractor:
+    def __init__(self, fs, seconds=1.0):
+        self.fs = fs
+        self.n = max(int(seconds * fs), 16) # Window length in samples
+        self.window = np.hanning(self.n).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(self.n, 1 / fs)
+
+    # signals [sensors, samples >= n] -> features [sensors, len(FEATURES)]
+    def compute(self, signals):
+        x = np.asarray(signals, dtype=np.float32)[:, -self.n:]
+        x = x - x.mean(axis=1, keepdims=True)
+        power = np.abs(np.fft.rfft(x * self.window, axis=1))**2
+        cumulative = np.cumsum(power, axis=1)
+        total = cumulative[:, -1]
+        silent = total <= 0
+        total[silent] = 1
+        features = np.empty((len(x), len(FEATURES)), dtype=np.float32)
+        features[:, 0] = power @ self.freqs / total
+        features[:, 1] = self.freqs[np.argmax(cumulative >= 0.5 * total[:, None], axis=1)]
+        features[silent, :2] = 0
+        signs = np.signbit(x)
+        features[:, 2] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) * self.fs / self.n
+        features[:, 3] = np.abs(np.diff(x, axis=1)).sum(axis=1)
+        features[:, 4] = np.abs(x).mean(axis=1)
+        return features
+
+# Ring of feature rows with their times
+class FeatureHistory:
+    def __init__(self, capacity, NUM_SENSORS):
+        self.capacity = max(int(capacity), 2)
+        self.times = np.zeros(self.capacity)
+        self.values = np.zeros((self.capacity, NUM_SENSORS, len(FEATURES)), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.pos = 0 # Row of the next entry
+        self.count = 0
+
+    def append(self, time, features):
+        self.times[self.pos] = time
+        self.values[self.pos, :len(features)] = features
+        self.values[self.pos, len(features):] = 0
+        self.pos = (self.pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    # Times [count] and values [count, sensors] of one feature, oldest first
+    def series(self, feature):
+        rows = (self.pos - self.count + np.arange(self.count)) % self.capacity
+        return self.times[rows], self.values[rows, :, feature]
+
+# Main loop of the DSP process
+def _workerMain(conn, name, NUM_SENSORS, width, fs, useNumba):
+    try:
+        myoblue_kernels.useNumba(useNumba)
+    except Exception:
+        pass # The NumPy kernels are kept, the GUI reports the failed check
+    shm = shared_memory.SharedMemory(name=name)
+    raw = np.ndarray((NUM_SENSORS, width), dtype=np.float32, buffer=shm.buf)
+    slotSize = DSPBlocks.size(NUM_SENSORS, width)
+    slots = [DSPBlocks(NUM_SENSORS, width, shm.buf, raw.nbytes + k*slotSize) for k in range(2)]
+    chain = DSPChain(fs, NUM_SENSORS)
+    state = DSPBlocks(NUM_SENSORS, width) # Envelope and RMS are continued from frame to frame
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'stop':
+                break
+            if message[0] == 'reset':
+                state.fill(0)
+                chain.envelope.reset()
+                continue
+            slot, dt, msLen, settings = message[1:]
+            spectrum = chain.process(raw, dt, msLen, settings, state)
+            state.copyTo(slots[slot])
+            slots[slot].fft[:] = spectrum
+            conn.send(slot)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        # Views have to be released before the block can be closed
+        raw = slots = None
+        shm.close()
+
+# DSPChain running in a separate process. submit() passes a frame to the worker,
+# collect() returns the previously submitted frame with its processed blocks.
+class DSPWorker:
+    def __init__(self, NUM_SENSORS, width, fs, useNumba=True):
+        self.NUM_SENSORS = NUM_SENSORS
+        self.width = width
+        slotSize = DSPBlocks.size(NUM_SENSORS, width)
+        rawSize = NUM_SENSORS * width * 4
+        self.shm = shared_memory.SharedMemory(create=True, size=rawSize + 2*slotSize)
+        self.raw = np.ndarray((NUM_SENSORS, width), dtype=np.float32, buffer=self.shm.buf)
+        self.slots = [DSPBlocks(NUM_SENSORS, width, self.shm.buf, rawSize + k*slotSize) for k in range(2)]
+
+        # Spawned, so the Qt state of the GUI process is not copied into the worker
+        context = multiprocessing.get_context('spawn')
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_workerMain, args=(child, self.shm.name, NUM_SENSORS, width, fs, useNumba),
+                                       name="MYOblue DSP", daemon=True)
+        self.process.start()
+        child.close()
+        self.slot = 0 # Output slot of the next frame
+        self.pending = None # Frame being processed
+
+    # True while the submitted frame is not processed yet
+    def busy(self):
+        return self.pending is not None and not self.conn.poll()
+
+    # (frame, blocks) of the submitted frame, waits for the worker if necessary.
+    # The blocks stay valid until the frame after the next one is submitted.
+    def collect(self):
+        if self.pending is None:
+            return None
+        slot = self.conn.recv()
+        frame, self.pending = self.pending, None
+        return frame, self.slots[slot]
+
+    def submit(self, frame):
+        self.raw[:] = frame.raw
+        self.conn.send(('frame', self.slot, frame.dt, frame.msLen, frame.settings))
+        self.pending = frame
+        self.slot ^= 1
+
+    # Drop the frame in progress and the envelope and RMS history
+    def reset(self):
+        self.collect()
+        self.conn.send(('reset',))
+
+    def close(self):
+        try:
+            self.conn.send(('stop',))
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive(): self.process.terminate()
+        self.conn.close()
+        self.raw = self.slots = None
+        self.shm.close()
+        self.shm.unlink()
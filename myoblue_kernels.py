@@ -0,0 +1,272 @@
+# Kernels of the per-sample loops of the MYOblue signal path
+# 2026-10-19 by ELEMYO https://github.com/ELEMYO/MYOblue-GUI
+#
+# Code is placed under the MIT license
+# Copyright (c) 2021 ELEMYO
+# ===============================================
+#
+# The envelope (cascade of three exponential averages), the RMS recurrence,
+# the trigger detection and the sync bytes search are stateful loops over the
+# samples. useNumba() compiles them with Numba when it is installed, otherwise
+# and until then the NumPy/SciPy implementations are used. Numba is imported
+# only by useNumba(), so importing this module stays cheap.
+#
+# Both implementations give the results of the reference Python loops up to
+# the float rounding. checkParity() asserts it for the selected kernels,
+# useNumba() runs it after compiling and keeps the NumPy kernels when the
+# compiled ones differ. "python myoblue_kernels.py" checks both backends.
+
+import importlib.util
+import numpy as np
+
+# Reference loops. These are the compiled kernels when Numba is available.
+
+def _emaLoop(x, counts, state, alphas, gain, out):
+    width = x.shape[1]
+    for i in range(x.shape[0]):
+        alpha = alphas[i]
+        s0, s1, s2 = state[i, 0], state[i, 1], state[i, 2]
+        for j in range(width - counts[i], width):
+            s0 = (1 - alpha)*x[i, j] + alpha*s0
+            s1 = (1 - alpha)*s0 + alpha*s1
+            s2 = (1 - alpha)*s1 + alpha*s2
+            out[i, j] = s2*gain
+        state[i, 0], state[i, 1], state[i, 2] = s0, s1, s2
+
+def _rmsLoop(envelope, RMS, starts, n, dt, interval):
+    width = envelope.shape[1]
+    for i in range(envelope.shape[0]):
+        for j in range(starts[i], width):
+            if j >= n + 1:
+                I1 = (envelope[i, j-n]**2 + envelope[i, j-n-1]**2)*dt[i]*0.5
+                I2 = (envelope[i, j]**2 + envelope[i, j-1]**2)*dt[i]*0.5
+                RMS[i, j] = abs(RMS[i, j-1]**2 + (I2 - I1)/interval)**0.5
+            else:
+                RMS[i, j] = 0
+
+def _edgesLoop(values, on, off, flag):
+    edges = np.empty(len(values), dtype=np.int64)
+    count = 0
+    for j in range(len(values)):
+        if flag == 0 and values[j] >= on:
+            flag = 1
+            edges[count] = j
+            count += 1
+        elif flag == 1 and values[j] < off:
+            flag = 0
+    return edges[:count], flag
+
+def _syncLoop(msg, start, stop):
+    for i in range(start, stop):
+        if msg[i] == 0xFF and msg[i+1] == 0xFF:
+            return i
+    return -1
+
+# NumPy implementations
+
+def _emaNumpy(x, counts, state, alphas, gain, out):
+    from scipy.signal import lfilter
+    width = x.shape[1]
+    # Rows with the same coefficient and new samples count are one lfilter call per average
+    groups = {}
+    for i in range(x.shape[0]):
+        if counts[i] > 0: groups.setdefault((alphas[i], counts[i]), []).append(i)
+    for (alpha, count), rows in groups.items():
+        rows = np.array(rows)
+        y = x[rows, width - count:].astype(np.float64)
+        for k in range(3):
+            y, zf = lfilter([1 - alpha], [1, -alpha], y, axis=-1, zi=alpha*state[rows, k:k+1])
+            state[rows, k] = y[:, -1]
+        out[rows, width - count:] = y*gain
+
+def _rmsNumpy(envelope, RMS, starts, n, dt, interval):
+    width = envelope.shape[1]
+    # Rows with the same start are one block
+    for start in np.unique(starts[starts < width]):
+        rows = np.flatnonzero(starts == start)
+        first = max(start, n + 1)
+        RMS[rows, start:first] = 0
+        if first >= width: continue
+        # RMS² is the running sum of the trapezoid differences
+        e2 = np.square(envelope[rows, first - n - 1:], dtype=np.float64)
+        pairs = e2[:, 1:] + e2[:, :-1] # pairs[k] = e²[j] + e²[j-1] with j = first - n + k
+        d = (pairs[:, n:] - pairs[:, :pairs.shape[1] - n]) * (dt[rows, None]*0.5/interval)
+        previous = RMS[rows, first-1].astype(np.float64)
+        total = previous[:, None]**2 + np.cumsum(d, axis=1)
+        RMS[rows, first:] = np.sqrt(np.abs(total))
+        # The loop continues from |RMS²| where RMS² falls below zero, which the
+        # running sum does not follow. Such rows are computed by the reference loop.
+        flipped = rows[(total < 0).any(axis=1)]
+        if len(flipped):
+            block = RMS[flipped]
+            _rmsLoop(envelope[flipped], block, np.full(len(flipped), first), n, dt[flipped], interval)
+            RMS[flipped] = block
+
+def _edgesNumpy(values, on, off, flag):
+    values = np.asarray(values)
+    if len(values) == 0: return np.zeros(0, dtype=np.int64), flag
+    set_ = values >= on
+    change = set_ | (values < off)
+    # State of every sample is given by the last set or reset sample before it
+    last = np.maximum.accumulate(np.where(change, np.arange(len(values)), -1))
+    state = np.where(last >= 0, set_[np.maximum(last, 0)], bool(flag))
+    previous = np.concatenate(([bool(flag)], state[:-1]))
+    return np.flatnonzero(state & ~previous), int(state[-1])
+
+def _syncNumpy(msg, start, stop):
+    segment = np.frombuffer(msg, dtype=np.uint8)[start:stop + 1]
+    hits = np.flatnonzero((segment[:-1] == 0xFF) & (segment[1:] == 0xFF))
+    return start + int(hits[0]) if hits.size else -1
+
+_numpy = {'ema': _emaNumpy, 'rms': _rmsNumpy, 'edges': _edgesNumpy, 'sync': _syncNumpy}
+_kernels = dict(_numpy)
+BACKEND = 'numpy'
+
+# True when Numba is installed, without importing it
+def numbaAvailable():
+    return importlib.util.find_spec('numba') is not None
+
+# Select the Numba kernels (compiled on first call and cached on disk) or the NumPy ones
+def useNumba(enabled=True):
+    global BACKEND
+    if enabled and numbaAvailable():
+        import numba
+        jit = numba.njit(cache=True, nogil=True)
+        _kernels.update(ema=jit(_emaLoop), rms=jit(_rmsLoop), edges=jit(_edgesLoop), sync=jit(_syncLoop))
+        BACKEND = 'numba'
+        try:
+            checkParity() # Compiles the kernels
+        except Exception:
+            useNumba(False)
+            raise
+    else:
+        _kernels.update(_numpy)
+        BACKEND = 'numpy'
+    return BACKEND
+
+# Cascade of three exponential averages of the last counts[i] samples of every
+# row of x [rows, width], times gain, written into the same samples of out.
+# state [rows, 3] holds the three averages of every row and is updated in
+# place, alphas are the averaging coefficients of the rows.
+def cascadeEMA(x, counts, state, alphas, gain, out):
+    counts = np.minimum(np.asarray(counts, dtype=np.int64), x.shape[1])
+    _kernels['ema'](x, counts, state, np.asarray(alphas, dtype=np.float64), float(gain), out)
+
+# Continue the trapezoid RMS of every row of envelope [rows, width] over a
+# window of n samples from sample starts[i] to the end, dt is the time between
+# samples of every row. RMS [rows, width] is updated in place.
+def rmsRecurrence(envelope, RMS, starts, n, dt, interval):
+    starts = np.asarray(starts, dtype=np.int64)
+    dt = np.asarray(dt, dtype=np.float64)
+    _kernels['rms'](envelope, RMS, starts, int(n), dt, float(interval))
+
+# Indices where values rise to on or above, while the flag is 0. The flag is
+# set there and cleared when values fall below off (on by default).
+# Returns the indices and the flag after the last value.
+def triggerEdges(values, on, flag, off=None):
+    if off is None: off = on
+    edges, flag = _kernels['edges'](np.asarray(values), float(on), float(off), int(flag))
+    return edges, int(flag)
+
+# First i in [start, stop) with msg[i] and msg[i+1] equal to 0xFF, -1 if none
+def findSync(msg, start, stop):
+    start = max(int(start), 0)
+    stop = min(int(stop), len(msg) - 1)
+    if stop <= start: return -1
+    if BACKEND == 'numba':
+        msg = np.frombuffer(msg, dtype=np.uint8)
+    return _kernels['sync'](msg, start, stop)
+
+# Largest difference of a and b relative to the largest absolute value of b
+def relativeError(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return float(np.max(np.abs(a - b)) / max(np.max(np.abs(b)), 1e-30)) if a.size else 0.0
+
+# Cases of every kernel: (name, tolerance, reference, call with the selected
+# kernels). Rows of width samples, the calls return the outputs and the updated
+# state as comparable arrays, the inputs are copied per call.
+def parityCases(width=2000, seed=2):
+    rng = np.random.default_rng(seed)
+    frame = 120
+    x = (np.abs(rng.standard_normal((8, width))) * 200).astype(np.float32)
+    state = rng.random((8, 3)) * 100
+    counts = np.array([width, frame, frame, 0, frame - 1, frame, width * 3 // 4, frame])
+    alphas = np.array([0.95, 0.95, 0.95, 0.95, 0.951, 0.95, 0.9, 0.95])
+
+    envelope = (np.abs(rng.standard_normal((8, width))) * 200).astype(np.float32)
+    RMS = np.zeros((8, width), dtype=np.float32)
+    dt = 0.001 * (1 + rng.uniform(-0.01, 0.01, 8))
+    _rmsLoop(envelope, RMS, np.zeros(8, dtype=np.int64), 250, dt, 0.5)
+    rmsStarts = width - np.array([frame, frame, frame, 0, frame - 1, frame, width // 4, frame])
+    for i, start in enumerate(rmsStarts): RMS[i, start:] = 0
+    # RMS² falls below zero at hundreds of samples of every row: the window
+    # leaves louder samples than it takes in and the previous RMS is zero
+    quiet = envelope.copy()
+    quiet[:, :width - 250] *= 10
+    flipped = np.zeros((8, width), dtype=np.float32)
+
+    walk = np.cumsum(rng.standard_normal(4000)) * 0.2
+    msg = rng.integers(0, 256, 5000, dtype=np.uint8)
+    for i in (100, 870, 2699, 4900):
+        msg[i:i+2] = 0xFF
+    msg = bytearray(msg)
+    syncStarts = [0, 800, 2500, 4700]
+
+    def ema(kernel):
+        s = state.copy()
+        out = np.zeros(x.shape, dtype=np.float32)
+        kernel(x, counts, s, alphas, 2.0, out)
+        return np.concatenate((out.ravel(), s.ravel()))
+    def rms(kernel):
+        out = RMS.copy()
+        kernel(envelope, out, rmsStarts, 250, dt, 0.5)
+        return out[:, -(width // 4):].ravel()
+    def rmsFlips(kernel):
+        out = flipped.copy()
+        kernel(quiet, out, np.full(8, width - 250), 250, dt, 0.5)
+        return out[:, -250:].ravel()
+    def edges(kernel):
+        up, flag = kernel(walk, 1.0, 0.5, 0)
+        same, flag2 = kernel(walk, 1.0, 1.0, 1)
+        return np.concatenate((up, [flag, -1], same, [flag2]))
+    def sync(kernel):
+        return np.array([kernel(msg, start, start + 250) for start in syncStarts])
+
+    return [
+        ('cascadeEMA', 1e-6, lambda: ema(_emaLoop), lambda: ema(cascadeEMA)),
+        ('rmsRecurrence', 1e-4, lambda: rms(_rmsLoop), lambda: rms(rmsRecurrence)),
+        ('rmsRecurrence sign flips', 1e-4, lambda: rmsFlips(_rmsLoop), lambda: rmsFlips(rmsRecurrence)),
+        ('triggerEdges', 0, lambda: edges(_edgesLoop), lambda: edges(lambda v, on, off, flag: triggerEdges(v, on, flag, off))),
+        ('findSync', 0, lambda: sync(_syncLoop), lambda: sync(findSync)),
+    ]
+
+# (name, error, tolerance) of the selected kernels against the reference loops
+def parityErrors(width=2000):
+    errors = []
+    for name, tolerance, reference, call in parityCases(width):
+        expected, result = reference(), call()
+        error = relativeError(result, expected) if result.shape == expected.shape else float('inf')
+        errors.append((name, error, tolerance))
+    return errors
+
+# Raises AssertionError naming the selected kernels that differ from the
+# reference loops by more than their tolerance
+def checkParity(width=2000):
+    failed = [f"{name} error {error:.1e} over {tolerance:g}" for name, error, tolerance in parityErrors(width) if not error <= tolerance]
+    if failed:
+        raise AssertionError(f"{BACKEND} kernels differ from the reference loops: " + ", ".join(failed))
+
+if __name__ == '__main__':
+    import sys
+    passed = True
+    for backend in ('numpy', 'numba'):
+        try:
+            if useNumba(backend == 'numba') != backend:
+                print(f"{backend}: not installed")
+                continue
+            checkParity()
+            print(f"{backend}: kernels match the reference loops")
+        except Exception as e:
+            print(f"{backend}: {e}")
+            passed = False
+    sys.exit(0 if passed else 1)
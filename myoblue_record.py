@@ -0,0 +1,536 @@
+# Columnar recording of the MYOblue signals
+# 2026-10-19 by ELEMYO https://github.com/ELEMYO/MYOblue-GUI
+#
+# Code is placed under the MIT license
+# Copyright (c) 2021 ELEMYO
+# ===============================================
+#
+# With "ColumnarRecording = npz" (or hdf5, parquet) in config.ini every
+# recording also gets a compressed columnar file next to the .txt and .bin:
+#   row_time  float64[n]      time of the row (latest sensor time), s
+#   time      float64[S, n]   sample time of every sensor, s
+#   raw       uint16[S, n]    ADC codes as in the .bin file
+#   filtered  float32[S, n]   filtered EMG in mkV as in the .txt file
+#   marker    uint8[n]        ASCII code of the marker key, 0 - no marker
+# and the metadata of the recording (sample rate, sensors, filters, units).
+# Rows are buffered in the GUI thread and compressed and written in chunks of
+# ChunkRows by a background thread. Reading a time range decompresses only the
+# chunks inside it:
+#
+#     from myoblue_record import openRecording
+#     rec = openRecording("rec/2026_10_19_12_00_00.npz")
+#     columns = rec.read(10, 20) # columns of the rows with 10 <= row_time < 20
+#
+# Formats:
+#   npz      zip archive with deflated "chunkNNNNNN/<column>.npy" members, the
+#            metadata in "metadata.json" and the chunk index in "index.json"
+#            (NumPy only, readable with zipfile + numpy.load)
+#   hdf5     one gzip compressed dataset per column, chunked along the rows,
+#            the index in the "index" dataset; requires h5py
+#   parquet  one row group per chunk, 2-D columns are split into <column>_<n>
+#            per sensor (n from 1); requires pyarrow
+#   myob     crash safe journal of the row_time, raw and marker columns, see below
+#
+# Journal (.myob, little endian). Every chunk is committed with a single write
+# and is valid on its own, a crash loses at most the chunks not committed yet:
+#   header:  magic b'MYOB', version (uint16), sensors (uint16), sample rate
+#            (float64), metadata length (uint32), metadata JSON
+#   chunk:   magic b'MYOC', sequence number, rows n, payload length (uint32),
+#            first and last row time (float64), payload CRC32, header CRC32;
+#            payload row_time float64[n], raw uint16[n, sensors], marker uint8[n]
+#   trailer: written on a clean close only: index of the chunks (offset uint64,
+#            rows uint32, first and last row time float64) followed by magic
+#            b'MYOT', chunks count (uint32), index offset, total rows (uint64)
+#            and index CRC32
+# The reader uses the trailer, without it the chunks are scanned up to the first
+# damaged one. "python myoblue_record.py recover file.myob" cuts a damaged tail
+# and writes the index and the trailer of an interrupted recording.
+#
+# Sync policy after every chunk commit:
+#   flush     data is passed to the operating system: survives a crash of the
+#             application, not a power loss or a system crash
+#   interval  os.fsync() at most every syncInterval seconds
+#   chunk     os.fsync() after every chunk
+# Commit time of a 1 s chunk of 8 sensors (25 kB), median of
+# "python myoblue_benchmark.py journal" on ext4 on a virtual disk: flush
+# 0.04 ms, interval 0.04 ms plus one fsync per interval, chunk 0.26 ms.
+# fsync depends on the drive (milliseconds on many SSDs, tens of ms on hard
+# disks), run the benchmark with --dir on the recording drive. Chunks are
+# written by the background thread, so the policy does not delay the GUI, it
+# sets the data lost on a power failure: all data since the last sync.
+#
+# Existing .bin recordings are converted with
+#     python myoblue_record.py export rec/2026_10_19_12_00_00.bin --format npz
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import queue
+import struct
+import zipfile
+import argparse
+import threading
+import numpy as np
+
+FORMATS = {'npz': '.npz', 'hdf5': '.h5', 'parquet': '.parquet', 'myob': '.myob'}
+VERSION = 1
+SYNC = ('flush', 'interval', 'chunk')
+
+_FILE = struct.Struct('<4sHHdI')
+_CHUNK = struct.Struct('<4sIIIddI')
+_CRC = struct.Struct('<I')
+_INDEX = struct.Struct('<QIdd')
+_TRAILER = struct.Struct('<4sIQQI')
+
+# Chunk index entry: first row, rows count, first and last row time
+def _indexEntry(row, columns):
+    rowTime = columns['row_time']
+    return [int(row), len(rowTime), float(rowTime[0]), float(rowTime[-1])]
+
+class _NPZWriter:
+    def __init__(self, path, metadata):
+        self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6)
+        self.zip.writestr('metadata.json', json.dumps(metadata, indent=1))
+
+    def write(self, k, columns):
+        for name, values in columns.items():
+            with self.zip.open(f"chunk{k:06d}/{name}.npy", 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(values), allow_pickle=False)
+
+    def close(self, index):
+        self.zip.writestr('index.json', json.dumps(index))
+        self.zip.close()
+
+class _HDF5Writer:
+    def __init__(self, path, metadata):
+        import h5py
+        self.file = h5py.File(path, 'w')
+        self.file.attrs['metadata'] = json.dumps(metadata)
+        self.rows = 0
+
+    def write(self, k, columns):
+        n = len(columns['row_time'])
+        for name, values in columns.items():
+            if name not in self.file:
+                self.file.create_dataset(name, shape=values.shape[:-1] + (0,), maxshape=values.shape[:-1] + (None,),
+                                         dtype=values.dtype, chunks=values.shape[:-1] + (n,), compression='gzip', shuffle=True)
+            dataset = self.file[name]
+            dataset.resize(self.rows + n, axis=dataset.ndim - 1)
+            dataset[..., self.rows:] = values
+        self.rows += n
+
+    def close(self, index):
+        self.file.create_dataset('index', data=np.array(index, dtype=np.float64).reshape(-1, 4))
+        self.file.close()
+
+class _ParquetWriter:
+    def __init__(self, path, metadata):
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.path = path
+        self.metadata = {b'myoblue': json.dumps(metadata).encode()}
+        self.writer = None
+
+    def write(self, k, columns):
+        arrays, names = [], []
+        for name, values in columns.items():
+            if values.ndim == 1:
+                arrays.append(self.pa.array(values))
+                names.append(name)
+            else:
+                for i, row in enumerate(values):
+                    arrays.append(self.pa.array(row))
+                    names.append(f"{name}_{i+1}")
+        table = self.pa.Table.from_arrays(arrays, names=names).replace_schema_metadata(self.metadata)
+        if self.writer is None:
+            self.writer = self.pa.parquet.ParquetWriter(self.path, table.schema, compression='zstd')
+        self.writer.write_table(table)
+
+    def close(self, index):
+        if self.writer is not None:
+            self.writer.close()
+
+class _JournalWriter:
+    def __init__(self, path, metadata, sync='chunk', syncInterval=5):
+        if sync not in SYNC:
+            raise ValueError(f"unknown sync policy {sync}")
+        self.sync = sync
+        self.syncInterval = syncInterval
+        self.sensors = int(metadata['sensors'])
+        self.file = open(path, 'wb')
+        header = json.dumps(metadata).encode()
+        self.file.write(_FILE.pack(b'MYOB', VERSION, self.sensors, float(metadata.get('sample_rate_hz', 0)), len(header)) + header)
+        self.entries = [] # (offset, rows, first, last) of the committed chunks
+        self.synced = time.monotonic()
+        self._commit()
+
+    def write(self, k, columns):
+        rowTime = np.ascontiguousarray(columns['row_time'], dtype='<f8')
+        payload = b''.join((rowTime.tobytes(),
+                            np.ascontiguousarray(np.asarray(columns['raw']).T, dtype='<u2').tobytes(),
+                            np.ascontiguousarray(columns['marker'], dtype=np.uint8).tobytes()))
+        header = _CHUNK.pack(b'MYOC', k, len(rowTime), len(payload), rowTime[0], rowTime[-1], zlib.crc32(payload))
+        self.entries.append((self.file.tell(), len(rowTime), float(rowTime[0]), float(rowTime[-1])))
+        self.file.write(header + _CRC.pack(zlib.crc32(header)) + payload)
+        self._commit()
+
+    def _commit(self, force=False):
+        self.file.flush()
+        now = time.monotonic()
+        if force or self.sync == 'chunk' or (self.sync == 'interval' and now - self.synced >= self.syncInterval):
+            os.fsync(self.file.fileno())
+            self.synced = now
+
+    def close(self, index):
+        _writeTrailer(self.file, self.entries)
+        self._commit(force=self.sync != 'flush')
+        self.file.close()
+
+def _writeTrailer(file, entries):
+    index = b''.join(_INDEX.pack(*entry) for entry in entries)
+    offset = file.tell()
+    file.write(index + _TRAILER.pack(b'MYOT', len(entries), offset, sum(entry[1] for entry in entries), zlib.crc32(index)))
+
+_WRITERS = {'npz': _NPZWriter, 'hdf5': _HDF5Writer, 'parquet': _ParquetWriter, 'myob': _JournalWriter}
+
+# Records rows of columns. append() only buffers, chunks of exactly chunkRows
+# rows are compressed and written by the writer thread. Errors of the writer
+# are kept in "error" and stop the writing of further chunks. options are
+# passed to the writer (sync and syncInterval of the journal).
+class ColumnarRecorder:
+    def __init__(self, path, format='npz', metadata=None, chunkRows=5000, **options):
+        if format not in _WRITERS:
+            raise ValueError(f"unknown recording format {format}")
+        self.path = path
+        self.chunkRows = chunkRows
+        self.writer = _WRITERS[format](path, dict(metadata or {}, format_version=VERSION), **options)
+        self.buffer = [] # Appended blocks of the current chunk
+        self.buffered = 0
+        self.rows = 0 # Rows passed to the writer
+        self.chunks = 0
+        self.index = []
+        self.error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    # Append a block of rows, columns is a dict of arrays with the rows on the last axis
+    def append(self, columns):
+        self.buffer.append(columns)
+        self.buffered += len(columns['row_time'])
+        if self.buffered >= self.chunkRows:
+            rows = {name: np.concatenate([block[name] for block in self.buffer], axis=-1) for name in self.buffer[0]}
+            full = self.buffered - self.buffered % self.chunkRows
+            for start in range(0, full, self.chunkRows):
+                self._submit({name: values[..., start:start + self.chunkRows] for name, values in rows.items()})
+            self.buffer = [{name: values[..., full:] for name, values in rows.items()}] if full < self.buffered else []
+            self.buffered -= full
+
+    # Pass the buffered rows to the writer thread as one chunk
+    def flush(self):
+        if self.buffer:
+            self._submit({name: np.concatenate([block[name] for block in self.buffer], axis=-1) for name in self.buffer[0]})
+            self.buffer = []
+            self.buffered = 0
+
+    def _submit(self, chunk):
+        self.index.append(_indexEntry(self.rows, chunk))
+        self.queue.put((self.chunks, chunk))
+        self.rows += len(chunk['row_time'])
+        self.chunks += 1
+
+    def _write(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is None:
+                try:
+                    self.writer.write(*item)
+                except Exception as e:
+                    self.error = e
+
+    # Write the rest of the rows and the index, blocks until everything is written
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            self.writer.close(self.index)
+        except Exception as e:
+            if self.error is None: self.error = e
+
+# Rows of the chunks selected by the index, the columns limited to t0 <= row_time < t1
+def _selectRows(index, t0, t1):
+    t0 = -np.inf if t0 is None else t0
+    t1 = np.inf if t1 is None else t1
+    return [k for k, (row, rows, first, last) in enumerate(index) if last >= t0 and first < t1], t0, t1
+
+def _joinChunks(chunks, t0, t1):
+    if not chunks:
+        return {}
+    columns = {name: np.concatenate([chunk[name] for chunk in chunks], axis=-1) for name in chunks[0]}
+    keep = (columns['row_time'] >= t0) & (columns['row_time'] < t1)
+    return {name: values[..., keep] for name, values in columns.items()}
+
+class _NPZReader:
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path)
+        names = set(self.zip.namelist())
+        self.metadata = json.loads(self.zip.read('metadata.json'))
+        self.columns = sorted({name.split('/')[1][:-4] for name in names if name.startswith('chunk')})
+        if 'index.json' in names:
+            self.index = json.loads(self.zip.read('index.json'))
+        else: # Index is missing, it is rebuilt from the row times
+            self.index, row = [], 0
+            for k in range(len({name.split('/')[0] for name in names if name.startswith('chunk')})):
+                entry = _indexEntry(row, {'row_time': self._load(k, 'row_time')})
+                self.index.append(entry)
+                row += entry[1]
+
+    def _load(self, k, name):
+        return np.load(io.BytesIO(self.zip.read(f"chunk{k:06d}/{name}.npy")), allow_pickle=False)
+
+    def read(self, t0=None, t1=None, columns=None):
+        chunks, t0, t1 = _selectRows(self.index, t0, t1)
+        names = set(columns or self.columns) | {'row_time'}
+        return _joinChunks([{name: self._load(k, name) for name in names} for k in chunks], t0, t1)
+
+    def close(self):
+        self.zip.close()
+
+class _HDF5Reader:
+    def __init__(self, path):
+        import h5py
+        self.file = h5py.File(path, 'r')
+        self.metadata = json.loads(self.file.attrs['metadata'])
+        self.columns = sorted(name for name in self.file if name != 'index')
+        if 'index' in self.file:
+            self.index = [[int(r), int(n), a, b] for r, n, a, b in self.file['index'][:]]
+        else:
+            self.index = [_indexEntry(0, {'row_time': self.file['row_time'][:]})] if self.file['row_time'].shape[0] else []
+
+    def read(self, t0=None, t1=None, columns=None):
+        chunks, t0, t1 = _selectRows(self.index, t0, t1)
+        if not chunks:
+            return {}
+        start = self.index[chunks[0]][0]
+        stop = self.index[chunks[-1]][0] + self.index[chunks[-1]][1]
+        names = set(columns or self.columns) | {'row_time'}
+        return _joinChunks([{name: self.file[name][..., start:stop] for name in names}], t0, t1)
+
+    def close(self):
+        self.file.close()
+
+class _ParquetReader:
+    def __init__(self, path):
+        import pyarrow.parquet
+        self.file = pyarrow.parquet.ParquetFile(path)
+        self.metadata = json.loads(self.file.schema_arrow.metadata[b'myoblue'])
+        fields = self.file.schema_arrow.names
+        self.columns = sorted({name.rsplit('_', 1)[0] if name.rsplit('_', 1)[-1].isdigit() else name for name in fields})
+        self.fields = fields
+        self.index, row = [], 0
+        column = fields.index('row_time')
+        for k in range(self.file.num_row_groups):
+            group = self.file.metadata.row_group(k)
+            statistics = group.column(column).statistics
+            self.index.append([row, group.num_rows, statistics.min, statistics.max])
+            row += group.num_rows
+
+    def read(self, t0=None, t1=None, columns=None):
+        chunks, t0, t1 = _selectRows(self.index, t0, t1)
+        if not chunks:
+            return {}
+        names = set(columns or self.columns) | {'row_time'}
+        fields = [f for f in self.fields if f in names or f.rsplit('_', 1)[0] in names]
+        table = self.file.read_row_groups(chunks, columns=fields)
+        result = {}
+        for name in names:
+            if name in table.column_names:
+                result[name] = table.column(name).to_numpy()
+            else:
+                parts = [table.column(f).to_numpy() for f in fields if f.rsplit('_', 1)[0] == name]
+                result[name] = np.vstack(parts)
+        return _joinChunks([result], t0, t1)
+
+    def close(self):
+        pass
+
+class _JournalReader:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        magic, version, self.sensors, fs, length = _FILE.unpack(self.file.read(_FILE.size))
+        if magic != b'MYOB':
+            raise ValueError("not a MYOblue journal")
+        self.metadata = json.loads(self.file.read(length))
+        self.dataStart = self.file.tell()
+        self.columns = ['marker', 'raw', 'row_time']
+        self.entries = self._trailer()
+        self.complete = self.entries is not None # Closed cleanly
+        if self.entries is None:
+            self.entries, self.validEnd = self.scan()
+        self.index, row = [], 0
+        for offset, rows, first, last in self.entries:
+            self.index.append([row, rows, first, last])
+            row += rows
+
+    # Chunks from the trailer index, None without a valid trailer
+    def _trailer(self):
+        size = self.file.seek(0, os.SEEK_END)
+        if size < self.dataStart + _TRAILER.size:
+            return None
+        self.file.seek(size - _TRAILER.size)
+        magic, chunks, offset, rows, crc = _TRAILER.unpack(self.file.read(_TRAILER.size))
+        if magic != b'MYOT' or offset + chunks * _INDEX.size + _TRAILER.size != size:
+            return None
+        self.file.seek(offset)
+        index = self.file.read(chunks * _INDEX.size)
+        if zlib.crc32(index) != crc:
+            return None
+        self.validEnd = offset
+        return [_INDEX.unpack_from(index, k * _INDEX.size) for k in range(chunks)]
+
+    # Chunks found by reading the chunk headers up to the first damaged chunk,
+    # and the end of the last valid chunk
+    def scan(self):
+        entries, offset = [], self.dataStart
+        self.file.seek(offset)
+        while True:
+            header = self.file.read(_CHUNK.size + _CRC.size)
+            if len(header) < _CHUNK.size + _CRC.size or _CRC.unpack_from(header, _CHUNK.size)[0] != zlib.crc32(header[:_CHUNK.size]):
+                break
+            magic, k, rows, length, first, last, crc = _CHUNK.unpack_from(header)
+            if magic != b'MYOC' or length != rows * (8 + 2 * self.sensors + 1):
+                break
+            payload = self.file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            entries.append((offset, rows, first, last))
+            offset = self.file.tell()
+        return entries, offset
+
+    def _load(self, k):
+        offset, rows = self.entries[k][:2]
+        self.file.seek(offset + _CHUNK.size + _CRC.size)
+        payload = self.file.read(rows * (8 + 2 * self.sensors + 1))
+        return {'row_time': np.frombuffer(payload, '<f8', rows),
+                'raw': np.frombuffer(payload, '<u2', rows * self.sensors, 8 * rows).reshape(rows, self.sensors).T,
+                'marker': np.frombuffer(payload, np.uint8, rows, (8 + 2 * self.sensors) * rows)}
+
+    def read(self, t0=None, t1=None, columns=None):
+        chunks, t0, t1 = _selectRows(self.index, t0, t1)
+        names = set(columns or self.columns) | {'row_time'}
+        return _joinChunks([{name: values for name, values in self._load(k).items() if name in names} for k in chunks], t0, t1)
+
+    def close(self):
+        self.file.close()
+
+# Make an interrupted journal complete: the data after the last valid chunk is
+# cut and the index and the trailer are written. Returns the count of chunks
+# and the count of dropped bytes, None for a journal that was closed cleanly.
+def recoverJournal(path):
+    reader = _JournalReader(path)
+    reader.close()
+    if reader.complete:
+        return len(reader.entries), None
+    with open(path, 'r+b') as f:
+        dropped = f.seek(0, os.SEEK_END) - reader.validEnd
+        f.truncate(reader.validEnd)
+        f.seek(reader.validEnd)
+        _writeTrailer(f, reader.entries)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(reader.entries), dropped
+
+# Reader of a recording selected by the file extension
+def openRecording(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.myob':
+        return _JournalReader(path)
+    if extension == '.npz':
+        return _NPZReader(path)
+    if extension in ('.h5', '.hdf5'):
+        return _HDF5Reader(path)
+    if extension == '.parquet':
+        return _ParquetReader(path)
+    raise ValueError(f"unknown recording format {extension}")
+
+# Count of sensors in a recording, read from the header of the TXT file written
+# next to the BIN file. Recordings without it have 8 sensors.
+def recordingChannels(path):
+    try:
+        with open(os.path.splitext(path)[0] + ".txt", "r", errors="replace") as f:
+            header = f.read(256)
+        match = re.search(r"(\d+) sensors data", header)
+        if match: return int(match.group(1))
+    except OSError:
+        pass
+    return 8
+
+# Convert a .bin recording (uint16 codes, one record of all sensors per sample)
+# with its "_events.csv" marker table to a columnar file. The sensors count is
+# read from the TXT header of the recording unless it is given. The myob
+# journal keeps the row_time, raw and marker columns, not the sensor times.
+def exportBin(path, output, format='npz', sensors=None, fs=1000, chunkRows=60000):
+    if sensors is None: sensors = recordingChannels(path)
+    raw = np.memmap(path, dtype='<u2', mode='r')
+    raw = raw[:len(raw) // sensors * sensors].reshape(-1, sensors)
+    markers = np.zeros(len(raw), dtype=np.uint8)
+    events = os.path.splitext(path)[0] + "_events.csv"
+    if os.path.exists(events):
+        with open(events) as f:
+            next(f, None)
+            for line in f:
+                sample, time, key = line.strip().split(',')
+                if int(sample) < len(markers): markers[int(sample)] = ord(key)
+    metadata = {'source': os.path.basename(path), 'sample_rate_hz': fs, 'sensors': sensors,
+                'units': {'row_time': 's', 'time': 's', 'raw': 'ADC code'}}
+    recorder = ColumnarRecorder(output, format, metadata, chunkRows)
+    for start in range(0, len(raw), chunkRows):
+        block = np.array(raw[start:start + chunkRows]).T
+        rowTime = np.arange(start, start + block.shape[1]) / fs
+        recorder.append({'row_time': rowTime, 'time': np.tile(rowTime, (sensors, 1)), 'raw': block,
+                         'marker': markers[start:start + block.shape[1]]})
+    recorder.close()
+    if recorder.error is not None:
+        raise recorder.error
+    return recorder.rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="MYOblue columnar recordings")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="convert a .bin recording")
+    export.add_argument('path')
+    export.add_argument('--format', choices=FORMATS, default='npz')
+    export.add_argument('--sensors', type=int, help="sensors count (from the .txt header of the recording by default)")
+    export.add_argument('--fs', type=int, default=1000, help="sample rate, Hz")
+    export.add_argument('-o', '--output', help="output file (the .bin name with the format extension by default)")
+    info = commands.add_parser('info', help="metadata and chunks of a columnar recording")
+    info.add_argument('path')
+    recover = commands.add_parser('recover', help="rebuild the index of an interrupted .myob journal")
+    recover.add_argument('path')
+    args = parser.parse_args()
+    if args.command == 'export':
+        output = args.output or os.path.splitext(args.path)[0] + FORMATS[args.format]
+        rows = exportBin(args.path, output, args.format, args.sensors, args.fs)
+        print(f"{rows} samples written to {output}")
+    elif args.command == 'recover':
+        chunks, dropped = recoverJournal(args.path)
+        if dropped is None: print(f"{chunks} chunks, the journal is complete")
+        else: print(f"{chunks} chunks recovered, {dropped} bytes after the last complete chunk dropped")
+    else:
+        recording = openRecording(args.path)
+        print(json.dumps(recording.metadata, indent=1))
+        rows = sum(entry[1] for entry in recording.index)
+        span = f", {recording.index[0][2]:.3f} - {recording.index[-1][3]:.3f} s" if recording.index else ""
+        print(f"{len(recording.index)} chunks, {rows} rows{span}, columns: {', '.join(recording.columns)}")
+        if getattr(recording, 'complete', True) is False:
+            print("the journal was not closed, run \"recover\" to write its index")
+        recording.close()
+    sys.exit(0)
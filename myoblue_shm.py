@@ -0,0 +1,180 @@
+# Shared memory ring buffer with the live decoded MYOblue stream
+# 2026-10-19 by ELEMYO https://github.com/ELEMYO/MYOblue-GUI
+#
+# Code is placed under the MIT license
+# Copyright (c) 2021 ELEMYO
+# ===============================================
+#
+# MYOblue_GUI publishes the decoded samples of every sensor into a shared memory
+# block when "SharedMemory = True" is set in config.ini. Other local processes
+# can map the same block with SharedStreamReader without touching the COM port:
+#
+#     from myoblue_shm import SharedStreamReader
+#     reader = SharedStreamReader("myoblue")
+#     while True:
+#         for i in range(reader.NUM_SENSORS):
+#             times, values = reader.read(i)  # new samples of sensor i
+#
+# Layout (little endian):
+#   header: magic, version, sensors count, capacity, sample rate, writer PID,
+#           write cursor (uint64) and last timestamp (float64) per sensor
+#   raw:    float32 [sensors, capacity], ADC counts as in Data.raw
+#   time:   float64 [sensors, capacity], seconds as in Data.time
+# The write cursor counts all samples written to a sensor; sample k is stored
+# at index k % capacity. Every reader keeps its own cursor, so readers can run
+# at different speeds. A reader that falls behind by more than the capacity
+# skips the overwritten samples and counts them in "dropped".
+
+import os
+import sys
+import struct
+import numpy as np
+from multiprocessing import shared_memory
+
+MAGIC = b'MYOS'
+VERSION = 2
+_HEADER = struct.Struct('<4sIIIdQ')
+
+# Conversion of ADC counts to mkV
+def toMicrovolts(values):
+    return (np.asarray(values, dtype=np.float32) - 8192) * 0.30517578125
+
+def _layout(NUM_SENSORS, capacity):
+    header = _HEADER.size + NUM_SENSORS * 16
+    header = (header + 63) // 64 * 64
+    raw = NUM_SENSORS * capacity * 4
+    return header, raw, header + raw + NUM_SENSORS * capacity * 8
+
+class _SharedStream:
+    def _map(self):
+        magic, version, self.NUM_SENSORS, self.capacity, self.fs, self.pid = _HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.shm.name} is not a MYOblue stream")
+        header, raw, size = _layout(self.NUM_SENSORS, self.capacity)
+        buf = self.shm.buf
+        self.cursor = np.ndarray((self.NUM_SENSORS,), dtype='<u8', buffer=buf, offset=_HEADER.size)
+        self.lastTime = np.ndarray((self.NUM_SENSORS,), dtype='<f8', buffer=buf, offset=_HEADER.size + self.NUM_SENSORS * 8)
+        self.raw = np.ndarray((self.NUM_SENSORS, self.capacity), dtype='<f4', buffer=buf, offset=header)
+        self.time = np.ndarray((self.NUM_SENSORS, self.capacity), dtype='<f8', buffer=buf, offset=header + raw)
+
+    def _release(self):
+        # Views have to be released before the block can be closed
+        self.cursor = self.lastTime = self.raw = self.time = None
+        self.shm.close()
+
+# True if an existing block is a MYOblue stream whose writer is not running.
+# On Windows a block exists only while some process has it open, so it is never stale.
+def _stale(name):
+    if sys.platform == 'win32': return False
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        if len(shm.buf) < _HEADER.size: return False
+        magic, version, *_, pid = _HEADER.unpack_from(shm.buf, 0)
+    finally:
+        shm.close()
+        # The resource tracker of this process must not unlink a block it does not own
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except (ImportError, AttributeError):
+            pass
+    if magic != MAGIC or version != VERSION: return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError: # Running under another user
+        return False
+    return False
+
+# Writer side, owned by the acquisition process
+class SharedStream(_SharedStream):
+    def __init__(self, name, NUM_SENSORS, capacity, fs):
+        size = _layout(NUM_SENSORS, capacity)[2]
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            if not _stale(name):
+                raise FileExistsError(f"shared memory \"{name}\" is used by another process") from None
+            # Left over by a process that was killed
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, NUM_SENSORS, capacity, fs, os.getpid())
+        self._map()
+        self.cursor[:] = 0
+        self.lastTime[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # Append samples of sensor i. The data is written before the cursor is
+    # advanced, so readers never see a cursor ahead of the data.
+    def write(self, i, values, times):
+        n = len(values)
+        if n == 0: return
+        if n > self.capacity:
+            values, times = values[-self.capacity:], times[-self.capacity:]
+            skipped, n = n - self.capacity, self.capacity
+        else:
+            skipped = 0
+        start = (int(self.cursor[i]) + skipped) % self.capacity
+        first = min(n, self.capacity - start)
+        self.raw[i][start:start + first] = values[:first]
+        self.time[i][start:start + first] = times[:first]
+        if first < n:
+            self.raw[i][:n - first] = values[first:]
+            self.time[i][:n - first] = times[first:]
+        self.lastTime[i] = times[-1]
+        self.cursor[i] += skipped + n
+
+    def close(self):
+        self._release()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+# Reader side, for any local process
+class SharedStreamReader(_SharedStream):
+    def __init__(self, name, fromStart=False):
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # The resource tracker would unlink the block when this process exits
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.shm._name, 'shared_memory')
+            except (ImportError, AttributeError):
+                pass
+        self._map()
+        self.position = [0] * self.NUM_SENSORS if fromStart else [int(c) for c in self.cursor]
+        self.dropped = [0] * self.NUM_SENSORS # Samples overwritten before they were read
+
+    # Copy of the samples of sensor i written since the previous call
+    def read(self, i):
+        end = int(self.cursor[i])
+        start = max(self.position[i], end - self.capacity)
+        self.dropped[i] += start - self.position[i]
+
+        index = np.arange(start, end) % self.capacity
+        times = self.time[i][index]
+        values = self.raw[i][index]
+
+        # Samples overwritten while copying are discarded
+        valid = int(self.cursor[i]) - self.capacity
+        if valid > start:
+            self.dropped[i] += valid - start
+            times, values = times[valid - start:], values[valid - start:]
+        self.position[i] = end
+        return times, values
+
+    # Zero-copy views of the ring buffers of sensor i and its write cursor
+    def view(self, i):
+        return self.time[i], self.raw[i], int(self.cursor[i])
+
+    def close(self):
+        self._release()
@@ -0,0 +1,227 @@
+# Local streaming of the decoded MYOblue signals
+# 2026-10-19 by ELEMYO https://github.com/ELEMYO/MYOblue-GUI
+#
+# Code is placed under the MIT license
+# Copyright (c) 2021 ELEMYO
+# ===============================================
+#
+# With "StreamServer = True" in config.ini MYOblue_GUI sends one frame per
+# graphics update to every client connected to 127.0.0.1:StreamPort:
+#
+#     from myoblue_stream import StreamClient
+#     for frame in StreamClient("127.0.0.1", 5757).frames():
+#         for sensor, time, emg, envelope, rms in frame.blocks: ...
+#
+# Frame framing (little endian), preceded by its length as uint32:
+#   header: magic b'MYOF', sequence number (uint32), sender time (float64),
+#           blocks count (uint16), events count (uint16)
+#   block:  sensor (uint16), samples count n (uint32), time float64[n],
+#           filtered EMG float32[n] in mkV, envelope float32[n], RMS float32[n]
+#   event:  sensor (uint16, 0xFFFF for all sensors), time (float64),
+#           kind (uint8: 1 - marker, 2 - trigger, 3 - clock correction, the
+#           sensor's sample times step at time), code (uint8, ASCII)
+# Every client has a bounded queue. When a client does not keep up, the oldest
+# frames are dropped for that client only, acquisition is never blocked.
+
+import socket
+import struct
+import threading
+from collections import deque, namedtuple
+import numpy as np
+
+MAGIC = b'MYOF'
+_LENGTH = struct.Struct('<I')
+_HEADER = struct.Struct('<4sIdHH')
+_BLOCK = struct.Struct('<HI')
+_EVENT = struct.Struct('<HdBB')
+
+EVENT_MARKER = 1
+EVENT_TRIGGER = 2
+EVENT_CLOCK = 3
+ALL_SENSORS = 0xFFFF
+
+Frame = namedtuple('Frame', 'seq time blocks events')
+
+def encodeFrame(seq, timestamp, blocks, events):
+    parts = [b'', _HEADER.pack(MAGIC, seq, timestamp, len(blocks), len(events))]
+    for sensor, t, emg, envelope, rms in blocks:
+        parts.append(_BLOCK.pack(sensor, len(t)))
+        parts.append(np.ascontiguousarray(t, dtype='<f8').tobytes())
+        for values in (emg, envelope, rms):
+            parts.append(np.ascontiguousarray(values, dtype='<f4').tobytes())
+    for sensor, t, kind, code in events:
+        parts.append(_EVENT.pack(sensor, t, kind, ord(code) if isinstance(code, str) else code))
+    payload = b''.join(parts)
+    return _LENGTH.pack(len(payload)) + payload
+
+def decodeFrame(payload):
+    magic, seq, timestamp, nBlocks, nEvents = _HEADER.unpack_from(payload, 0)
+    if magic != MAGIC:
+        raise ValueError("not a MYOblue frame")
+    offset = _HEADER.size
+    blocks = []
+    for b in range(nBlocks):
+        sensor, n = _BLOCK.unpack_from(payload, offset)
+        offset += _BLOCK.size
+        t = np.frombuffer(payload, dtype='<f8', count=n, offset=offset)
+        offset += 8 * n
+        values = []
+        for k in range(3):
+            values.append(np.frombuffer(payload, dtype='<f4', count=n, offset=offset))
+            offset += 4 * n
+        blocks.append((sensor, t, *values))
+    events = []
+    for e in range(nEvents):
+        sensor, t, kind, code = _EVENT.unpack_from(payload, offset)
+        offset += _EVENT.size
+        events.append((sensor, t, kind, chr(code)))
+    return Frame(seq, timestamp, blocks, events)
+
+# One connected client with its own queue and sender thread
+class _Subscriber:
+    def __init__(self, conn, queueFrames):
+        self.conn = conn
+        self.queue = deque(maxlen=queueFrames)
+        self.ready = threading.Condition()
+        self.dropped = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._send, daemon=True)
+        self.thread.start()
+
+    def push(self, frame):
+        with self.ready:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(frame)
+            self.ready.notify()
+
+    def _send(self):
+        while self.running:
+            with self.ready:
+                while self.running and not self.queue:
+                    self.ready.wait(0.5)
+                if not self.running: break
+                frame = self.queue.popleft()
+            try:
+                self.conn.sendall(frame)
+            except OSError:
+                break
+        self.running = False
+        self.conn.close()
+
+    def close(self):
+        with self.ready:
+            self.running = False
+            self.ready.notify()
+
+# Thread based TCP server sending frames to all connected clients
+class StreamServer:
+    def __init__(self, host="127.0.0.1", port=5757, queueFrames=64):
+        self.queueFrames = queueFrames # Frames buffered per client before dropping
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen()
+        self.address = self.sock.getsockname()
+        self.running = True
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+
+    def _accept(self):
+        while self.running:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.subscribers.append(_Subscriber(conn, self.queueFrames))
+
+    @property
+    def clients(self):
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s.running]
+            return len(self.subscribers)
+
+    # Encode one frame and queue it for every client
+    def publish(self, timestamp, blocks, events=()):
+        if not self.clients:
+            return
+        frame = encodeFrame(self.seq, timestamp, blocks, events)
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        with self.lock:
+            for subscriber in self.subscribers:
+                subscriber.push(frame)
+
+    def close(self):
+        self.running = False
+        self.sock.close()
+        with self.lock:
+            for subscriber in self.subscribers:
+                subscriber.close()
+            self.subscribers = []
+
+# Blocking client, yields decoded frames
+class StreamClient:
+    def __init__(self, host="127.0.0.1", port=5757, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+
+    def _receive(self, n):
+        data = bytearray()
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("stream closed")
+            data += chunk
+        return bytes(data)
+
+    def frames(self):
+        try:
+            while True:
+                length, = _LENGTH.unpack(self._receive(_LENGTH.size))
+                yield decodeFrame(self._receive(length))
+        except ConnectionError:
+            return
+
+    def close(self):
+        self.sock.close()
+
+# Lab Streaming Layer outlets: one EMG stream per sensor (filtered EMG,
+# envelope and RMS channels) and one marker stream. Requires pylsl.
+# Marker stream samples: "<digit>" for exercise markers, "trigger:<sensor>" and
+# "clock:<sensor>" for triggers and clock corrections, sensors counted from 1.
+class LSLOutlet:
+    def __init__(self, NUM_SENSORS, fs, name="MYOblue"):
+        import pylsl
+        self.pylsl = pylsl
+        self.outlets = []
+        for i in range(NUM_SENSORS):
+            info = pylsl.StreamInfo(f"{name} sensor {i+1}", "EMG", 3, fs, "float32", f"{name}-sensor{i+1}")
+            channels = info.desc().append_child("channels")
+            for label in ("EMG", "Envelope", "RMS"):
+                channel = channels.append_child("channel")
+                channel.append_child_value("label", label)
+                channel.append_child_value("unit", "microvolts")
+            self.outlets.append(pylsl.StreamOutlet(info))
+        self.markers = pylsl.StreamOutlet(pylsl.StreamInfo(f"{name} markers", "Markers", 1, 0, "string", f"{name}-markers"))
+
+    # clockOffset converts sample times to LSL time, None stamps samples on arrival
+    def publish(self, blocks, events=(), clockOffset=None):
+        for sensor, t, emg, envelope, rms in blocks:
+            chunk = np.column_stack((emg, envelope, rms)).astype(np.float32)
+            if clockOffset is None:
+                self.outlets[sensor].push_chunk(chunk.tolist())
+            else:
+                self.outlets[sensor].push_chunk(chunk.tolist(), (np.asarray(t) + clockOffset).tolist())
+        for sensor, t, kind, code in events:
+            if kind == EVENT_MARKER: label = code
+            elif kind == EVENT_TRIGGER: label = f"trigger:{sensor + 1}"
+            elif kind == EVENT_CLOCK: label = f"clock:{sensor + 1}"
+            else: continue
+            self.markers.push_sample([label], t + clockOffset if clockOffset is not None else self.pylsl.local_clock())
+
+    def localClock(self):
+        return self.pylsl.local_clock()